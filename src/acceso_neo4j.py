@@ -0,0 +1,98 @@
+"""
+Lecturas en Neo4j compartidas por todas las sesiones de la app
+
+Cada consulta va en una transacción de lectura gestionada (execute_read), que
+el driver reintenta ante errores transitorios. El pool y los reintentos se
+pueden fijar con variables de entorno (todas opcionales; si no están se usan
+los valores por defecto del driver de Neo4j):
+    NEO4J_POOL_MAX      conexiones máximas del pool
+    NEO4J_ESPERA_POOL   segundos máximos esperando una conexión libre
+    NEO4J_REINTENTOS    segundos máximos reintentando una transacción
+"""
+
+import os
+import time
+
+from neo4j.exceptions import ClientError, ServiceUnavailable, SessionExpired, TransientError
+
+from metricas import REGISTRO, span
+
+
+def _numero(variable, tipo):
+    valor = os.getenv(variable)
+    return tipo(valor) if valor else None
+
+
+POOL_MAX = _numero("NEO4J_POOL_MAX", int)
+ESPERA_POOL = _numero("NEO4J_ESPERA_POOL", float)
+TIEMPO_REINTENTOS = _numero("NEO4J_REINTENTOS", float)
+
+ESPERA = REGISTRO.histograma("erasmai_neo4j_espera_segundos",
+                             "Espera hasta tener conexión del pool y la transacción abierta", ("consulta",))
+REINTENTOS = REGISTRO.contador("erasmai_neo4j_reintentos_total",
+                               "Reintentos de transacciones de lectura por errores transitorios", ("consulta",))
+
+
+class BaseDatosNoDisponible(Exception):
+    """Neo4j no ha respondido a tiempo: pool agotado, servidor caído o reintentos agotados"""
+
+
+def configuracion_driver(pool_max=None, espera_pool=None, tiempo_reintentos=None):
+    """
+    Argumentos de GraphDatabase.driver con los límites del pool y de los
+    reintentos que se hayan fijado (los demás quedan con el valor del driver)
+    """
+    argumentos = {
+        'max_connection_pool_size': pool_max or POOL_MAX,
+        'connection_acquisition_timeout': espera_pool or ESPERA_POOL,
+        'max_transaction_retry_time': tiempo_reintentos or TIEMPO_REINTENTOS,
+    }
+    return {clave: valor for clave, valor in argumentos.items() if valor is not None}
+
+
+def leer(driver, database, consulta, parametros=None, transformar=None, nombre="consulta"):
+    """
+    Ejecuta una consulta en una transacción de lectura gestionada y devuelve
+    todas sus filas (los resultados se consumen dentro de la transacción, así
+    que un reintento nunca deja filas a medias).
+
+    Args:
+        transformar: función aplicada a cada registro (por defecto, a dict)
+        nombre: etiqueta de la consulta en el span y en las métricas
+
+    Returns:
+        list con una entrada por fila
+
+    Raises:
+        BaseDatosNoDisponible: si no hay conexión libre a tiempo, el
+            servidor no responde o se agotan los reintentos
+    """
+    transformar = transformar or (lambda registro: registro.data())
+    inicio = time.perf_counter()
+    espera = None
+    intentos = 0
+
+    def transaccion(tx):
+        nonlocal espera, intentos
+        intentos += 1
+        if espera is None:
+            espera = time.perf_counter() - inicio
+        return [transformar(registro) for registro in tx.run(consulta, parametros or {})]
+
+    with span("neo4j", consulta=nombre) as s:
+        try:
+            with driver.session(database=database) as session:
+                filas = session.execute_read(transaccion)
+        except (ServiceUnavailable, SessionExpired, TransientError) as e:
+            raise BaseDatosNoDisponible(f"Neo4j no responde ({nombre}): {e}") from e
+        except ClientError as e:
+            if "failed to obtain a connection from the pool" not in str(e):
+                raise
+            raise BaseDatosNoDisponible(f"Pool de Neo4j agotado ({nombre}): {e}") from e
+        finally:
+            if espera is not None:
+                ESPERA.observar(espera, consulta=nombre)
+            if intentos > 1:
+                REINTENTOS.inc(intentos - 1, consulta=nombre)
+        s.anotar(filas=len(filas), intentos=intentos, espera_ms=round(espera * 1000, 3))
+    return filas
@@ -0,0 +1,127 @@
+"""
+Almacenes del estado de las conversaciones, para que cualquier proceso de la
+app pueda retomar una sesión
+
+El estado se guarda tras cada turno como JSON compacto comprimido con zlib
+(serializar/deserializar). Cualquier almacén clave-valor sirve si implementa
+guardar(clave, datos), cargar(clave) y borrar(clave); aquí hay uno en memoria
+(un solo proceso) y otro en SQLite (varios procesos en la misma máquina).
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+
+TTL_POR_DEFECTO = 7 * 24 * 3600
+
+
+def serializar(datos):
+    texto = json.dumps(datos, ensure_ascii=False, separators=(',', ':'))
+    return zlib.compress(texto.encode('utf-8'))
+
+
+def deserializar(blob):
+    return json.loads(zlib.decompress(blob).decode('utf-8'))
+
+
+class AlmacenMemoria:
+    """Estados en un diccionario del proceso; se pierden al reiniciarlo"""
+
+    def __init__(self, ttl=TTL_POR_DEFECTO):
+        self.ttl = ttl
+        self._estados = {}  # clave -> (actualizado, blob)
+        self._lock = threading.Lock()
+
+    def guardar(self, clave, datos):
+        blob = serializar(datos)
+        with self._lock:
+            self._estados[clave] = (time.time(), blob)
+        return len(blob)
+
+    def cargar(self, clave):
+        """Estado guardado con esa clave, o None si no existe o ha caducado"""
+        with self._lock:
+            entrada = self._estados.get(clave)
+            if entrada is None:
+                return None
+            if time.time() - entrada[0] > self.ttl:
+                del self._estados[clave]
+                return None
+        return deserializar(entrada[1])
+
+    def borrar(self, clave):
+        with self._lock:
+            self._estados.pop(clave, None)
+
+    def __len__(self):
+        return len(self._estados)
+
+    def cerrar(self):
+        pass
+
+
+class AlmacenSQLite:
+    """
+    Estados en un fichero SQLite en modo WAL, compartido por todos los
+    procesos de la máquina. Los caducados se borran al abrirlo.
+    """
+
+    def __init__(self, ruta, ttl=TTL_POR_DEFECTO):
+        self.ruta = ruta
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(ruta, check_same_thread=False, timeout=5)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS estados ("
+            "clave TEXT PRIMARY KEY, actualizado REAL, datos BLOB)"
+        )
+        self._db.execute("DELETE FROM estados WHERE actualizado < ?", (time.time() - self.ttl,))
+        self._db.commit()
+
+    def guardar(self, clave, datos):
+        blob = serializar(datos)
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO estados VALUES (?, ?, ?)", (clave, time.time(), blob))
+            self._db.commit()
+        return len(blob)
+
+    def cargar(self, clave):
+        """Estado guardado con esa clave, o None si no existe o ha caducado"""
+        with self._lock:
+            fila = self._db.execute(
+                "SELECT datos FROM estados WHERE clave = ? AND actualizado >= ?",
+                (clave, time.time() - self.ttl)
+            ).fetchone()
+        return deserializar(fila[0]) if fila else None
+
+    def borrar(self, clave):
+        with self._lock:
+            self._db.execute("DELETE FROM estados WHERE clave = ?", (clave,))
+            self._db.commit()
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM estados").fetchone()[0]
+
+    def cerrar(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+
+def desde_entorno():
+    """
+    Almacén según las variables de entorno: ERASMAI_ESTADO_RUTA (fichero
+    SQLite; sin ella, en memoria) y ERASMAI_ESTADO_TTL (segundos)
+    """
+    ttl = float(os.getenv("ERASMAI_ESTADO_TTL", str(TTL_POR_DEFECTO)))
+    ruta = os.getenv("ERASMAI_ESTADO_RUTA")
+    if ruta:
+        return AlmacenSQLite(ruta, ttl=ttl)
+    return AlmacenMemoria(ttl=ttl)
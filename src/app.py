@@ -1,113 +1,164 @@
+import uuid
+
 import streamlit as st
-import time
-from recomendadorErasmus import ErasmAIAssistant, cypher_engine, llm
+from recomendadorErasmus import ErasmAIAssistant
+from recursos import obtener_recursos
+from metricas import configurar
+
 
-st.markdown(
+@st.cache_resource
+def recursos_compartidos():
     """
-    <div style='width:100%; display:flex; flex-direction:column; align-items:flex-start; margin-top:1.5em; margin-bottom:1.2em;'>
-        <div style='display: flex; align-items: center; gap: 0.6em;'>
-            <span style="font-size:2em;">🧑‍🎓</span>
-            <span style="font-size:2.3em; font-weight:900; color:#7B44D1; line-height:1.0;">
-              Erasm<span style="color:#F6C200;">AI</span>
-            </span>
-        </div>
-        <span style="font-size:1.3em; font-weight:400; margin-left:2.7em; margin-top: -.1em; color:#FFA500;">
-            El Asistente Erasmus de la Universidad de León
-        </span>
-    </div>
-    """,
-    unsafe_allow_html=True
-)
+    Un único driver/LLM/motor por proceso, compartido por todas las sesiones.
+    Se crean y se calientan en la primera ejecución del script, no al importarlo.
+    """
+    configurar()
+    recursos = obtener_recursos()
+    recursos.calentar()
+    return recursos
 
 
-with st.sidebar:
-    st.markdown(
-       """
-       <div style='display: flex; flex-direction: column; align-items: center; justify-content: flex-start; margin-top: -24px; margin-bottom: 1.1em;'>
-           <span style="font-size:2.7em; line-height: 1;">🧑‍🎓</span>
-           <span style="font-size:2.15em; font-weight:900; margin-top: -0.12em;">
-               <span style="color:#7B44D1;">Erasm</span><span style="color:#F6C200;">AI</span>
-           </span>
-       </div>
-       """, unsafe_allow_html=True
-   )
-    
-    st.markdown("""<hr style='margin-top: 0.4em; margin-bottom: 1.2em; border: 0; border-top: 2px solid #333;'/>""", unsafe_allow_html=True)
-    
+def nueva_conversacion(recursos):
+    st.session_state.erasmai = ErasmAIAssistant(recursos.llm, recursos.motor, recursos.cache, recursos.indice)
+    bienvenida = st.session_state.erasmai.procesar_mensaje("")
+    st.session_state.messages = [
+        {"role": "assistant", "content": bienvenida}
+    ]
+
+
+def guardar_conversacion(almacen, sesion):
+    almacen.guardar(sesion, {
+        "asistente": st.session_state.erasmai.a_instantanea(),
+        "mensajes": st.session_state.messages,
+    })
+
+
+def main():
+    recursos = recursos_compartidos()
+    # Tras una recarga de los datos, los perfiles de país y la caché se vuelven a leer
+    recursos.comprobar_datos()
+    almacen = recursos.almacen
+
+    # La sesión se identifica por el parámetro ?sesion= de la URL, no por el proceso:
+    # cualquier worker con acceso al almacén puede retomarla
+    if "sesion" not in st.query_params:
+        st.query_params["sesion"] = uuid.uuid4().hex
+    sesion = st.query_params["sesion"]
+
     st.markdown(
         """
-        <div style='display: flex; align-items: center; gap: 0.6em; margin-bottom: 0.5em;'>
-            <span style="font-size: 1.5em;">⚙️</span>
-            <span style="font-size:1.08em; font-weight:bold;">Configuraciones</span>
+        <div style='width:100%; display:flex; flex-direction:column; align-items:flex-start; margin-top:1.5em; margin-bottom:1.2em;'>
+            <div style='display: flex; align-items: center; gap: 0.6em;'>
+                <span style="font-size:2em;">🧑‍🎓</span>
+                <span style="font-size:2.3em; font-weight:900; color:#7B44D1; line-height:1.0;">
+                  Erasm<span style="color:#F6C200;">AI</span>
+                </span>
+            </div>
+            <span style="font-size:1.3em; font-weight:400; margin-left:2.7em; margin-top: -.1em; color:#FFA500;">
+                El Asistente Erasmus de la Universidad de León
+            </span>
         </div>
-        """, unsafe_allow_html=True
+        """,
+        unsafe_allow_html=True
     )
-    
-    reiniciar = st.button("🔄 Reiniciar conversación", use_container_width=True, key="btn_reiniciar", help="Pulsa para empezar una nueva conversación")
-  
 
-    with st.expander("ℹ️ Ayuda rápida"):
+
+    with st.sidebar:
+        st.markdown(
+           """
+           <div style='display: flex; flex-direction: column; align-items: center; justify-content: flex-start; margin-top: -24px; margin-bottom: 1.1em;'>
+               <span style="font-size:2.7em; line-height: 1;">🧑‍🎓</span>
+               <span style="font-size:2.15em; font-weight:900; margin-top: -0.12em;">
+                   <span style="color:#7B44D1;">Erasm</span><span style="color:#F6C200;">AI</span>
+               </span>
+           </div>
+           """, unsafe_allow_html=True
+       )
+
+        st.markdown("""<hr style='margin-top: 0.4em; margin-bottom: 1.2em; border: 0; border-top: 2px solid #333;'/>""", unsafe_allow_html=True)
+
         st.markdown(
             """
-            - Pulsa arriba para reiniciar la conversación.
-            - ErasmAI te guiará paso a paso para encontrar tu destino Erasmus ideal.
-            - ¿Dudas? Pregunta en el chat.
+            <div style='display: flex; align-items: center; gap: 0.6em; margin-bottom: 0.5em;'>
+                <span style="font-size: 1.5em;">⚙️</span>
+                <span style="font-size:1.08em; font-weight:bold;">Configuraciones</span>
+            </div>
+            """, unsafe_allow_html=True
+        )
+
+        reiniciar = st.button("🔄 Reiniciar conversación", use_container_width=True, key="btn_reiniciar", help="Pulsa para empezar una nueva conversación")
+
+
+        with st.expander("ℹ️ Ayuda rápida"):
+            st.markdown(
+                """
+                - Pulsa arriba para reiniciar la conversación.
+                - ErasmAI te guiará paso a paso para encontrar tu destino Erasmus ideal.
+                - ¿Dudas? Pregunta en el chat.
+                """
+            )
+
+        st.markdown("""<hr style='margin: 1.8em 0 1.1em 0; border: 0; border-top: 1.5px solid #333;'/>""", unsafe_allow_html=True)
+
+        st.markdown(
             """
+            <div style='display: flex; align-items: center; gap: 0.5em; margin-bottom: 0.4em;'>
+                <span style="font-size: 1.35em;">📚</span>
+                <span style="font-size:1.09em; font-weight: bold;">Más información</span>
+            </div>
+            """, unsafe_allow_html=True
+        )
+        if st.button("🌐 Ver destinos Erasmus ULE", use_container_width=True, key="btn_destinos"):
+            st.markdown("[Ir a la web de destinos Erasmus de la ULE](https://www.unileon.es/internacional/estudiantes/movilidad-internacional-salientes/erasmus-estudio/plazas)", unsafe_allow_html=True)
+        st.info(
+            "Consulta todos los destinos Erasmus disponibles en la web oficial de la Universidad de León.",
+            icon="🌍"
         )
-        
-    st.markdown("""<hr style='margin: 1.8em 0 1.1em 0; border: 0; border-top: 1.5px solid #333;'/>""", unsafe_allow_html=True)
 
-    st.markdown(
-        """
-        <div style='display: flex; align-items: center; gap: 0.5em; margin-bottom: 0.4em;'>
-            <span style="font-size: 1.35em;">📚</span>
-            <span style="font-size:1.09em; font-weight: bold;">Más información</span>
-        </div>
-        """, unsafe_allow_html=True
-    )
-    if st.button("🌐 Ver destinos Erasmus ULE", use_container_width=True, key="btn_destinos"):
-        st.markdown("[Ir a la web de destinos Erasmus de la ULE](https://www.unileon.es/internacional/estudiantes/movilidad-internacional-salientes/erasmus-estudio/plazas)", unsafe_allow_html=True)
-    st.info(
-        "Consulta todos los destinos Erasmus disponibles en la web oficial de la Universidad de León.",
-        icon="🌍"
-    )
 
-    
 
 
 
-# -- Lógica de reinicio fuera del with sidebar --
-if reiniciar:
-    st.session_state.erasmai = ErasmAIAssistant(llm, cypher_engine)
-    bienvenida = st.session_state.erasmai.procesar_mensaje("")
-    st.session_state.messages = [
-        {"role": "assistant", "content": bienvenida}
-    ]
+    # -- Lógica de reinicio fuera del with sidebar --
+    if reiniciar:
+        nueva_conversacion(recursos)
+        guardar_conversacion(almacen, sesion)
 
 
+    if "erasmai" not in st.session_state:
+        guardado = almacen.cargar(sesion)
+        if guardado:
+            st.session_state.erasmai = ErasmAIAssistant.desde_instantanea(
+                guardado["asistente"], recursos.llm, recursos.motor, recursos.cache, recursos.indice
+            )
+            st.session_state.messages = guardado["mensajes"]
+        else:
+            nueva_conversacion(recursos)
+            guardar_conversacion(almacen, sesion)
+
+    for message in st.session_state.messages:
+        with st.chat_message(message["role"]):
+            st.markdown(message["content"])
+
+    prompt = st.chat_input("Escribe tu mensaje aquí...")
+
+    if prompt:
+        st.session_state.messages.append({"role": "user", "content": prompt})
+        with st.chat_message("user"):
+            st.markdown(prompt)
+        # "ErasmAI está escribiendo..." hasta que llega el primer trozo
+        with st.chat_message("assistant"):
+            placeholder = st.empty()
+            placeholder.markdown("ErasmAI está escribiendo...")
+            respuesta = ""
+            for trozo in st.session_state.erasmai.procesar_mensaje_stream(prompt):
+                respuesta += trozo
+                placeholder.markdown(respuesta + "▌")
+            placeholder.markdown(respuesta)
+        st.session_state.messages.append({"role": "assistant", "content": respuesta})
+        guardar_conversacion(almacen, sesion)
 
-if "erasmai" not in st.session_state:
-    st.session_state.erasmai = ErasmAIAssistant(llm, cypher_engine)
-    bienvenida = st.session_state.erasmai.procesar_mensaje("")
-    st.session_state.messages = [
-        {"role": "assistant", "content": bienvenida}
-    ]
 
-for message in st.session_state.messages:
-    with st.chat_message(message["role"]):
-        st.markdown(message["content"])
-
-prompt = st.chat_input("Escribe tu mensaje aquí...")
-
-if prompt:
-    st.session_state.messages.append({"role": "user", "content": prompt})
-    with st.chat_message("user"):
-        st.markdown(prompt)
-    # Simular "ErasmAI está escribiendo..."
-    with st.chat_message("assistant"):
-        placeholder = st.empty()
-        placeholder.markdown("ErasmAI está escribiendo...")
-        time.sleep(2)  # Delay visual
-        respuesta = st.session_state.erasmai.procesar_mensaje(prompt)
-        placeholder.markdown(respuesta)
-    st.session_state.messages.append({"role": "assistant", "content": respuesta})
+# streamlit run ejecuta el script como __main__; importarlo no crea ni calienta nada
+if __name__ == "__main__":
+    main()
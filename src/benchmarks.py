@@ -0,0 +1,1088 @@
+"""
+Micro-benchmarks de las piezas del pipeline de ErasmAI
+
+Uso:
+    python src/benchmarks.py intenciones
+    python src/benchmarks.py llm
+    python src/benchmarks.py importacion
+    python src/benchmarks.py consultas   (backend según ERASMAI_BACKEND)
+    python src/benchmarks.py puntuacion
+    python src/benchmarks.py etapas          (ms y KB por etapa del pipeline)
+    python src/benchmarks.py conversaciones  [--latencia-llm 0.05]
+    python src/benchmarks.py prompt          (tokens y latencia según el presupuesto)
+    python src/benchmarks.py neo4j           (sesiones concurrentes contra un Neo4j local)
+    python src/benchmarks.py estado          (tamaño de la instantánea y guardar/restaurar)
+    python src/benchmarks.py texto           (índice BM25 de atractivos: construcción y consultas)
+    python src/benchmarks.py perfiles        (bytes y memoria de la etapa 2 con perfiles de país compartidos)
+
+Las métricas de 'etapas' y 'conversaciones' (p50/p95/p99 y memoria) se
+pueden guardar como línea base y comparar en otra ejecución:
+    python src/benchmarks.py etapas conversaciones --guardar base.json
+    python src/benchmarks.py etapas conversaciones --comparar base.json
+"""
+
+import contextlib
+import io
+import json
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from intenciones_matcher import (
+    KEYWORDS_EXPERIENCIA, KEYWORDS_CULTURAL, KEYWORDS_GEOGRAFIA, KEYWORDS_CONSTRUCCION,
+    KEYWORDS_PAIS, extraer_intenciones, extraer_intenciones_lote
+)
+from perfiles_categorias import mascara_de_categorias
+
+
+DESCRIPCIONES = [
+    "Quiero un destino con mucha vida nocturna, aventuras y que sea económico",
+    "Busco un lugar tranquilo con naturaleza, historia y buena gastronomía",
+    "Me gustaría playas, castillos medievales y ambiente joven",
+]
+
+
+def _medir(funcion, repeticiones):
+    """Devuelve el tiempo medio por llamada en microsegundos"""
+    inicio = time.perf_counter()
+    for _ in range(repeticiones):
+        funcion()
+    return (time.perf_counter() - inicio) / repeticiones * 1e6
+
+
+def _extraer_intenciones_subcadenas(descripcion_usuario):
+    """Implementación anterior (una búsqueda 'in' por palabra clave), como referencia"""
+    texto_lower = descripcion_usuario.lower()
+    categorias = set()
+    for categoria, keywords in {**KEYWORDS_EXPERIENCIA, **KEYWORDS_CULTURAL,
+                                **KEYWORDS_GEOGRAFIA, **KEYWORDS_CONSTRUCCION}.items():
+        if any(kw in texto_lower for kw in keywords):
+            categorias.add(categoria)
+    return {
+        'categorias_atractivos': list(categorias),
+        'caracteristicas_pais': {
+            'coste_bajo': any(kw in texto_lower for kw in KEYWORDS_PAIS['barato']),
+            'fiesta_alta': any(kw in texto_lower for kw in KEYWORDS_PAIS['fiesta_alta']),
+            'ambiente_joven': any(kw in texto_lower for kw in KEYWORDS_PAIS['joven']),
+        }
+    }
+
+
+def bench_intenciones(repeticiones=200):
+    print("=" * 70)
+    print("extraer_intenciones: subcadenas vs autómata (µs por descripción)")
+    print("=" * 70)
+    for factor in (1, 10, 100):
+        texto = " ".join(DESCRIPCIONES) * factor
+        antes = _medir(lambda: _extraer_intenciones_subcadenas(texto), repeticiones)
+        ahora = _medir(lambda: extraer_intenciones(texto), repeticiones)
+        print(f"{len(texto):>7} car. | subcadenas {antes:9.1f} | autómata {ahora:9.1f} | x{antes / ahora:.2f}")
+
+    lote = DESCRIPCIONES * 1000
+    inicio = time.perf_counter()
+    extraer_intenciones_lote(lote)
+    print(f"Lote de {len(lote)} descripciones: {(time.perf_counter() - inicio) * 1e3:.1f} ms")
+
+
+class _ServidorHTTP(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 256
+
+
+class ServidorLLMFalso:
+    """
+    Servidor HTTP local compatible con la API de chat de OpenAI/Groq
+    (/openai/v1/chat/completions), con latencia configurable y sin red.
+    'por_token' añade un coste de lectura del prompt (segundos por token,
+    estimando 4 caracteres por token), que también se devuelve en 'usage', y
+    'pausa_trozo' una espera entre los trozos del streaming. 'trozos_enviados'
+    cuenta los trozos que han llegado a escribirse (un cliente que corta el
+    stream deja de recibirlos).
+
+    Uso:
+        with ServidorLLMFalso(latencia=0.2) as servidor:
+            llm = GroqLLM(api_key="falsa", base_url=servidor.url)
+    """
+
+    def __init__(self, latencia=0.1, respuesta="Te recomiendo este destino.", trozos=5, por_token=0.0,
+                 pausa_trozo=0.0):
+        self.latencia = latencia
+        self.por_token = por_token
+        self.respuesta = respuesta
+        self.trozos = trozos
+        self.pausa_trozo = pausa_trozo
+        self.peticiones = 0
+        self.trozos_enviados = 0
+        self._servidor = _ServidorHTTP(('127.0.0.1', 0), self._manejador())
+        self.url = f"http://127.0.0.1:{self._servidor.server_address[1]}"
+
+    def _manejador(self):
+        falso = self
+
+        class Manejador(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                peticion = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+                falso.peticiones += 1
+                peticion['tokens'] = sum(len(m['content']) for m in peticion['messages']) // 4
+                time.sleep(falso.latencia + falso.por_token * peticion['tokens'])
+                if peticion.get('stream'):
+                    self._responder_stream(peticion)
+                else:
+                    self._responder(peticion)
+
+            def _responder(self, peticion):
+                cuerpo = json.dumps({
+                    "id": "falso", "object": "chat.completion", "created": 0,
+                    "model": peticion.get('model'),
+                    "choices": [{"index": 0, "finish_reason": "stop",
+                                 "message": {"role": "assistant", "content": falso.respuesta}}],
+                    "usage": {"prompt_tokens": peticion['tokens'], "completion_tokens": 0,
+                              "total_tokens": peticion['tokens']}
+                }).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(cuerpo)))
+                self.end_headers()
+                self.wfile.write(cuerpo)
+
+            def _responder_stream(self, peticion):
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/event-stream')
+                self.send_header('Connection', 'close')
+                self.end_headers()
+                tam = max(1, len(falso.respuesta) // falso.trozos)
+                try:
+                    for i in range(0, len(falso.respuesta), tam):
+                        chunk = {
+                            "id": "falso", "object": "chat.completion.chunk", "created": 0,
+                            "model": peticion.get('model'),
+                            "choices": [{"index": 0, "finish_reason": None,
+                                         "delta": {"content": falso.respuesta[i:i + tam]}}]
+                        }
+                        if i and falso.pausa_trozo:
+                            time.sleep(falso.pausa_trozo)
+                        self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+                        self.wfile.flush()
+                        falso.trozos_enviados += 1
+                    self.wfile.write(b"data: [DONE]\n\n")
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+                self.close_connection = True
+
+        return Manejador
+
+    def __enter__(self):
+        threading.Thread(target=self._servidor.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self._servidor.shutdown()
+        self._servidor.server_close()
+
+
+def _carga_concurrente(funcion, sesiones, peticiones_por_sesion):
+    """Lanza 'sesiones' hilos que llaman a 'funcion' y devuelve (peticiones/s, latencias)"""
+    latencias = []
+
+    def sesion():
+        for _ in range(peticiones_por_sesion):
+            inicio = time.perf_counter()
+            funcion()
+            latencias.append(time.perf_counter() - inicio)
+
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=sesiones) as pool:
+        for futuro in [pool.submit(sesion) for _ in range(sesiones)]:
+            futuro.result()
+    return len(latencias) / (time.perf_counter() - inicio), latencias
+
+
+def bench_llm(sesiones=50, peticiones_por_sesion=4, latencia=0.2):
+    from groq import Groq
+    from cliente_llm import GroqLLM
+
+    print("=" * 70)
+    print(f"LLM: {sesiones} sesiones concurrentes contra servidor falso ({latencia * 1000:.0f} ms)")
+    print("=" * 70)
+    with ServidorLLMFalso(latencia=latencia) as servidor:
+        cliente_sync = Groq(api_key="falsa", base_url=servidor.url)
+
+        def sync():
+            cliente_sync.chat.completions.create(
+                model="falso", messages=[{"role": "user", "content": "hola"}]
+            )
+
+        casos = [("cliente síncrono compartido", sync)]
+        for limite in (16, None):
+            llm = GroqLLM(api_key="falsa", base_url=servidor.url, max_concurrencia=limite)
+            casos.append((f"GroqLLM asíncrono (límite {llm.max_concurrencia})", lambda llm=llm: llm.complete("hola")))
+
+        for nombre, funcion in casos:
+            rps, latencias = _carga_concurrente(funcion, sesiones, peticiones_por_sesion)
+            p95 = statistics.quantiles(latencias, n=20)[-1]
+            print(f"{nombre:<34} | {rps:7.1f} pet/s | p50 {statistics.median(latencias) * 1000:7.1f} ms "
+                  f"| p95 {p95 * 1000:7.1f} ms")
+
+
+def bench_neo4j(niveles=(1, 8, 32, 64), turnos_por_sesion=5, pool_max=None):
+    """
+    Sesiones simuladas en paralelo contra el Neo4j de .env: cada turno hace la
+    etapa 1 y la etapa 2 en transacciones de lectura. El pool es el de
+    configuracion_driver (NEO4J_POOL_MAX o el del driver) salvo que se pase
+    'pool_max'. Muestra turnos/s, latencia y la espera media por una conexión,
+    para elegir los límites del pool con datos.
+    """
+    import random
+    from neo4j import GraphDatabase
+    from acceso_neo4j import ESPERA, configuracion_driver
+    from rag_funciones import buscar_recomendacion
+    from recomendadorErasmus import (
+        CypherQueryEngine, extraer_certificados, TAMANOS_CIUDAD, REGIONES_VALIDAS, CLIMAS
+    )
+    from recursos import URI, USER, PASSWORD, DATABASE
+
+    print("=" * 70)
+    configuracion = configuracion_driver(pool_max=pool_max)
+    pool = configuracion.get('max_connection_pool_size', "por defecto del driver")
+    print(f"Neo4j: sesiones concurrentes (pool: {pool})")
+    print("=" * 70)
+    driver = GraphDatabase.driver(URI, auth=(USER, PASSWORD), **configuracion)
+    motor = CypherQueryEngine(driver, DATABASE)
+    try:
+        driver.verify_connectivity()
+        motor.perfiles_categorias()
+    except Exception as e:
+        print(f"⚠️ Neo4j no disponible: {e}")
+        driver.close()
+        return
+
+    turnos = [
+        (carrera, extraer_certificados(certs), TAMANOS_CIUDAD[tamano], REGIONES_VALIDAS[region], CLIMAS[clima],
+         extraer_intenciones(desc))
+        for carrera, certs, tamano, region, clima, desc in CONVERSACIONES
+    ]
+
+    def turno():
+        carrera, certificados, tamano, region, clima, intenciones = random.choice(turnos)
+        destinos = motor.buscar(carrera, certificados, tamano, region, clima)
+        if destinos:
+            buscar_recomendacion(motor, destinos, intenciones)
+
+    consultas = ('destinos', 'recomendacion')
+    try:
+        for sesiones in niveles:
+            esperas = sum(ESPERA.suma(consulta=c) for c in consultas)
+            lecturas = sum(ESPERA.total(consulta=c) for c in consultas)
+            with contextlib.redirect_stdout(io.StringIO()):
+                rps, latencias = _carga_concurrente(turno, sesiones, turnos_por_sesion)
+            lecturas = sum(ESPERA.total(consulta=c) for c in consultas) - lecturas
+            espera_media = (sum(ESPERA.suma(consulta=c) for c in consultas) - esperas) / max(lecturas, 1)
+            p = _percentiles(latencias)
+            print(f"{sesiones:>3} sesiones | {rps:7.1f} turnos/s | p50 {p['p50']:8.1f} ms | p95 {p['p95']:8.1f} ms "
+                  f"| espera de conexión {espera_media * 1000:7.2f} ms")
+    finally:
+        driver.close()
+
+
+# Se ejecuta en un proceso limpio: cuenta las conexiones de red abiertas y
+# los hilos creados durante el import, y mide el tiempo
+_SCRIPT_IMPORTACION = """
+import time
+inicio = time.perf_counter()
+import recomendadorErasmus
+importacion = time.perf_counter() - inicio
+inicio = time.perf_counter()
+recomendadorErasmus.obtener_recursos().calentar()
+print(importacion, time.perf_counter() - inicio)
+"""
+
+
+def bench_importacion(repeticiones=3, backend="memoria"):
+    """
+    Tiempo de importar recomendadorErasmus y de calentar() los recursos en un
+    intérprete nuevo (que importar no conecta nada lo comprueba
+    tests/test_importacion.py)
+    """
+    print("=" * 70)
+    print(f"Importación de recomendadorErasmus (backend {backend})")
+    print("=" * 70)
+    entorno = {**os.environ, 'ERASMAI_BACKEND': backend, 'GROQ_API_KEY': os.getenv('GROQ_API_KEY', 'falsa')}
+    directorio = os.path.dirname(os.path.abspath(__file__))
+    for _ in range(repeticiones):
+        salida = subprocess.run(
+            [sys.executable, '-c', _SCRIPT_IMPORTACION], cwd=directorio, env=entorno,
+            capture_output=True, text=True, check=True
+        ).stdout.split('\n')[-2]
+        importacion, calentamiento = salida.split()
+        print(f"import {float(importacion) * 1000:7.0f} ms | calentar() {float(calentamiento) * 1000:7.0f} ms")
+
+
+# ========================================
+# ETAPA 2 ANTERIOR (referencia)
+# ========================================
+
+def _buscar_destinos_por_intenciones(motor, destinos, intenciones):
+    return motor.buscar_por_intenciones([d.universidad for d in destinos], intenciones)
+
+
+def _ajustar_puntos_por_cantidad_atractivos(candidatos, intenciones, perfiles):
+    """+10 puntos por cada aparición de las categorías pedidas entre los 10 principales atractivos del país"""
+    mascara = mascara_de_categorias(intenciones['categorias_atractivos'])
+    if mascara:
+        for candidato in candidatos:
+            candidato.puntos_caracteristicas += perfiles.obtener(candidato.pais).puntos_apariciones(mascara)
+    return candidatos
+
+
+def _enriquecer_con_puntuaciones(candidatos, destinos):
+    """
+    Implementación anterior del TOP 5 (cruce universidad a universidad con la
+    etapa 1, O(n·m)), como referencia; la sustituye buscar_recomendacion
+    """
+    enriquecidos = []
+    for candidato in candidatos:
+        for destino in destinos:
+            if destino.universidad == candidato.universidad:
+                candidato.puntuacion_base = destino.puntuacion_compuesta
+                candidato.puntuacion_total = (destino.puntuacion_compuesta or 0) + candidato.puntos_caracteristicas
+                enriquecidos.append(candidato)
+                break
+    enriquecidos.sort(key=lambda c: c.puntuacion_total, reverse=True)
+    return enriquecidos[:5]
+
+
+def _dos_consultas(motor, destinos, intenciones):
+    """Etapa 2 anterior completa: candidatos por intenciones, ajuste por atractivos y TOP 5"""
+    candidatos = _buscar_destinos_por_intenciones(motor, destinos, intenciones)
+    candidatos = _ajustar_puntos_por_cantidad_atractivos(candidatos, intenciones, motor.perfiles_categorias())
+    return _enriquecer_con_puntuaciones(candidatos, destinos)
+
+
+def bench_consultas(repeticiones=30):
+    """
+    Tiempo de la etapa 2 por turno: flujo de dos consultas frente a
+    CONSULTA_RECOMENDACION. Con Neo4j separa el tiempo dentro de la base
+    (spans de acceso_neo4j.leer) y las idas y vueltas por turno.
+    """
+    from metricas import DURACION
+    from recursos import obtener_recursos
+    from rag_funciones import buscar_recomendacion
+
+    recursos = obtener_recursos()
+    print("=" * 70)
+    print(f"Etapa 2 por turno (backend {recursos.backend}, ms)")
+    print("=" * 70)
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            motor = recursos.motor
+            motor.perfiles_categorias()
+            turnos = [
+                (motor.buscar(carrera, "NO", 'grande', 'sur de europa', 'calor'), extraer_intenciones(d))
+                for carrera in ('ade', 'derecho', 'ingenieria informatica')
+                for d in DESCRIPCIONES
+            ]
+    except Exception as e:
+        print(f"⚠️ Backend no disponible: {e}")
+        return
+
+    for nombre, funcion in (("dos consultas + Python", lambda d, i: _dos_consultas(motor, d, i)),
+                            ("consulta única", lambda d, i: buscar_recomendacion(motor, d, i))):
+        tiempos = []
+        en_base = []
+        lecturas = 0
+        with contextlib.redirect_stdout(io.StringIO()):
+            for _ in range(repeticiones):
+                for destinos, intenciones in turnos:
+                    if not destinos:
+                        continue
+                    base_antes = DURACION.suma(span="neo4j")
+                    lecturas_antes = DURACION.total(span="neo4j")
+                    inicio = time.perf_counter()
+                    funcion(destinos, intenciones)
+                    tiempos.append(time.perf_counter() - inicio)
+                    en_base.append(DURACION.suma(span="neo4j") - base_antes)
+                    lecturas += DURACION.total(span="neo4j") - lecturas_antes
+        p95 = statistics.quantiles(tiempos, n=20)[-1]
+        print(f"{nombre:<24} | p50 {statistics.median(tiempos) * 1000:8.3f} | p95 {p95 * 1000:8.3f} "
+              f"| en Neo4j p50 {statistics.median(en_base) * 1000:8.3f} "
+              f"| lecturas/turno {lecturas / len(tiempos):4.1f}")
+
+
+def recomendar_python(catalogo, carrera, certificados, tamano_ciudad, region_europa, preferencia_clima,
+                       intenciones, k=5):
+    """Puntuación con bucles Python (filtro + fórmula base + puntos de país y categorías), como referencia"""
+    from catalogo_memoria import requisitos_idioma
+    from intenciones_matcher import NIVEL_MAPA, plegar_acentos
+    from perfiles_categorias import mascara_de_categorias
+
+    def acepta(cert, nivel):
+        if cert == 'NO':
+            return True
+        if cert != 'SI':
+            return False
+        return any(idioma == plegar_acentos(c.get('idioma', ''))
+                   and NIVEL_MAPA.get(c.get('nivel', '').upper(), 0) >= minimo
+                   for c in certificados for idioma, minimo in requisitos_idioma(nivel))
+
+    destinos = []
+    for uni, ciudad, pais, plazas, meses, cert, nivel in catalogo.ofertas_por_carrera.get(carrera, ()):
+        if plazas is None or plazas <= 0:
+            continue
+        if certificados == "NO" and cert != 'NO':
+            continue
+        if isinstance(certificados, list) and certificados and not acepta(cert, nivel):
+            continue
+        u = catalogo.universidades[uni]
+        p = catalogo.paises.get(pais, {})
+        poblacion = catalogo.ciudades[ciudad]['poblacion']
+        temp = p.get('temp_media_anual')
+        base = None
+        if u['ranking_uni'] is not None and u['exchange_score'] is not None:
+            base = (float(686 - u['ranking_uni']) * 0.1 + u['exchange_score'] * 0.2
+                    + (70 if poblacion is not None and (
+                        (tamano_ciudad == 'grande' and poblacion >= 156000)
+                        or (tamano_ciudad == 'pequena' and poblacion < 156000)) else 0)
+                    + (70 if region_europa and p.get('localizacion') == region_europa else 0)
+                    + (50 if temp is not None and (
+                        (preferencia_clima == 'frio' and temp < 11.4)
+                        or (preferencia_clima == 'calor' and temp >= 11.4)) else 0))
+        destinos.append((uni, base))
+    destinos.sort(key=lambda d: (d[1] is not None, d[1] or 0), reverse=True)
+
+    mascara = mascara_de_categorias(intenciones['categorias_atractivos'])
+    caracteristicas = intenciones['caracteristicas_pais']
+    bases = {}
+    for uni, base in destinos:
+        bases.setdefault(uni, base)
+    candidatos = []
+    for uni, base in bases.items():
+        for ciudad, pais in catalogo.ubicaciones[uni]:
+            p = catalogo.paises.get(pais, {})
+            perfil = catalogo.perfiles.obtener(pais)
+            puntos = (perfil.puntos_presencia(mascara) + perfil.puntos_apariciones(mascara)
+                      + (100 if caracteristicas['coste_bajo'] and p.get('coste_vida') in ('Bajo', 'Muy Bajo') else 0)
+                      + (100 if caracteristicas['fiesta_alta'] and p.get('ambiente_fiesta') in ('Alto', 'Muy Alto') else 0)
+                      + (100 if caracteristicas['ambiente_joven'] and (p.get('edad_media') or 99) < 40 else 0))
+            candidatos.append(((uni, ciudad, pais), (base or 0) + puntos))
+    candidatos.sort(key=lambda c: c[1], reverse=True)
+    return candidatos[:k]
+
+
+def _catalogo_ampliado(catalogo, factor):
+    """Copia del catálogo con cada universidad repetida 'factor' veces (mismos países y atractivos)"""
+    from catalogo_memoria import CatalogoMemoria
+
+    ampliado = CatalogoMemoria()
+    ampliado.paises = catalogo.paises
+    ampliado.ciudades = catalogo.ciudades
+    ampliado.atractivos = catalogo.atractivos
+    ampliado.atractivos_por_pais = catalogo.atractivos_por_pais
+    ampliado.perfiles = catalogo.perfiles
+    for i in range(factor):
+        for uni, datos in catalogo.universidades.items():
+            ampliado.universidades[f"{uni} #{i}"] = datos
+        for uni, ubicaciones in catalogo.ubicaciones.items():
+            ampliado.ubicaciones[f"{uni} #{i}"] = ubicaciones
+    ampliado.ofertas_por_carrera = {
+        carrera: tuple((f"{fila[0]} #{i}",) + fila[1:] for i in range(factor) for fila in filas)
+        for carrera, filas in catalogo.ofertas_por_carrera.items()
+    }
+    return ampliado
+
+
+def perfiles_aleatorios(catalogo, semilla=0):
+    """Un perfil aleatorio (argumentos de MotorPuntuacion.recomendar) por cada carrera del catálogo"""
+    import random
+    from intenciones_matcher import CATEGORIAS_ATRACTIVOS
+
+    aleatorio = random.Random(semilla)
+    return [
+        (carrera,
+         aleatorio.choice(["NO", None, [{'idioma': 'ingles', 'nivel': 'B2'}]]),
+         aleatorio.choice(['grande', 'pequena']),
+         aleatorio.choice(['norte de europa', 'sur de europa', 'este de europa', 'oeste de europa']),
+         aleatorio.choice(['frio', 'calor']),
+         {'categorias_atractivos': aleatorio.sample(list(CATEGORIAS_ATRACTIVOS), 3),
+          'caracteristicas_pais': {'coste_bajo': aleatorio.random() < 0.5, 'fiesta_alta': aleatorio.random() < 0.5,
+                                   'ambiente_joven': aleatorio.random() < 0.5}})
+        for carrera in catalogo.ofertas_por_carrera
+    ]
+
+
+def bench_puntuacion(repeticiones=20):
+    from catalogo_memoria import CatalogoMemoria
+    from motor_puntuacion import MotorPuntuacion
+
+    print("=" * 70)
+    print("Puntuación completa (etapas 1 y 2 + TOP 5): bucles Python vs NumPy (ms)")
+    print("=" * 70)
+    catalogo = CatalogoMemoria.desde_directorio()
+    perfiles = perfiles_aleatorios(catalogo)
+
+    for factor in (1, 100):
+        cat = catalogo if factor == 1 else _catalogo_ampliado(catalogo, factor)
+        inicio = time.perf_counter()
+        motor = MotorPuntuacion.desde_catalogo(cat)
+        construccion = (time.perf_counter() - inicio) * 1000
+        ofertas = sum(len(f) for f in cat.ofertas_por_carrera.values())
+        vueltas = repeticiones if factor == 1 else max(1, repeticiones // 10)
+
+        inicio = time.perf_counter()
+        for _ in range(vueltas):
+            for perfil in perfiles:
+                recomendar_python(cat, *perfil)
+        python = (time.perf_counter() - inicio) / (vueltas * len(perfiles)) * 1000
+
+        inicio = time.perf_counter()
+        for _ in range(vueltas):
+            for perfil in perfiles:
+                motor.recomendar(*perfil)
+        numpy = (time.perf_counter() - inicio) / (vueltas * len(perfiles)) * 1000
+
+        print(f"x{factor:<4} {ofertas:>7} ofertas | Python {python:8.3f} | NumPy {numpy:8.3f} "
+              f"| x{python / numpy:.1f} | construcción {construccion:.0f} ms")
+
+
+# ========================================
+# ETAPAS Y CONVERSACIONES COMPLETAS
+# ========================================
+
+# Conversaciones de referencia: carrera, certificados, ciudad, región, clima y descripción
+CONVERSACIONES = [
+    ("derecho", "NO", "grande", "sur", "calor", DESCRIPCIONES[0]),
+    ("ade", "B2 de inglés", "pequeña", "oeste", "frio", DESCRIPCIONES[1]),
+    ("ingenieria informatica", "C1 inglés y B1 italiano", "grande", "este", "calor", DESCRIPCIONES[2]),
+    ("veterinaria", "B1 de francés", "pequeña", "norte", "frio", DESCRIPCIONES[0]),
+]
+
+
+def _percentiles(tiempos):
+    """p50, p95 y p99 en milisegundos"""
+    if len(tiempos) < 2:
+        return {'p50': tiempos[0] * 1000, 'p95': tiempos[0] * 1000, 'p99': tiempos[0] * 1000}
+    cortes = statistics.quantiles(tiempos, n=100, method='inclusive')
+    return {'p50': statistics.median(tiempos) * 1000, 'p95': cortes[94] * 1000, 'p99': cortes[98] * 1000}
+
+
+def _perfilar(funcion, repeticiones, muestras_memoria=10):
+    """
+    Latencia (p50/p95/p99 en ms) y memoria reservada por llamada (pico en KB,
+    con tracemalloc). La memoria se mide en una pasada aparte para que el
+    rastreo no distorsione los tiempos.
+    """
+    with contextlib.redirect_stdout(io.StringIO()):
+        funcion()
+        tiempos = []
+        for _ in range(repeticiones):
+            inicio = time.perf_counter()
+            funcion()
+            tiempos.append(time.perf_counter() - inicio)
+
+        tracemalloc.start()
+        picos = []
+        for _ in range(min(muestras_memoria, repeticiones)):
+            tracemalloc.reset_peak()
+            antes = tracemalloc.get_traced_memory()[0]
+            funcion()
+            picos.append(tracemalloc.get_traced_memory()[1] - antes)
+        tracemalloc.stop()
+    return {**_percentiles(tiempos), 'kb': statistics.median(picos) / 1024}
+
+
+def _imprimir_resultados(resultados):
+    for nombre, r in resultados.items():
+        print(f"{nombre:<40} | p50 {r['p50']:9.3f} | p95 {r['p95']:9.3f} | p99 {r['p99']:9.3f} "
+              f"| {r['kb']:9.1f} KB")
+
+
+def bench_etapas(repeticiones=200):
+    """Cada etapa del pipeline por separado, con el backend de ERASMAI_BACKEND (ms y KB por llamada)"""
+    from types import SimpleNamespace
+    from recursos import obtener_recursos
+    from recomendadorErasmus import validar_carrera, extraer_certificados
+    from rag_funciones import filtrar_input_usuarios, buscar_recomendacion, construir_prompt_recomendacion
+
+    recursos = obtener_recursos()
+    print("=" * 70)
+    print(f"Etapas del pipeline (backend {recursos.backend}, ms)")
+    print("=" * 70)
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            motor = recursos.motor
+            perfiles = motor.perfiles_categorias()
+    except Exception as e:
+        print(f"⚠️ Backend no disponible: {e}")
+        return {}
+
+    carrera, certificados, _, _, _, descripcion = CONVERSACIONES[0]
+    # los motores leen query_bundle.query (el JSON que generaba el LLM)
+    consulta = SimpleNamespace(query=json.dumps({
+        "carrera": carrera, "certificados": "NO", "tamano_ciudad": "grande",
+        "region_europa": "sur de europa", "preferencia_clima": "calor"
+    }))
+    with contextlib.redirect_stdout(io.StringIO()):
+        destinos = motor.buscar(carrera, "NO", "grande", "sur de europa", "calor")
+        intenciones = extraer_intenciones(descripcion)
+        candidatos = _buscar_destinos_por_intenciones(motor, destinos, intenciones)
+        candidatos = _ajustar_puntos_por_cantidad_atractivos(candidatos, intenciones, perfiles)
+        top5 = buscar_recomendacion(motor, destinos, intenciones)
+
+    etapas = {
+        'validar_carrera': lambda: validar_carrera("ingeniería informática"),
+        'validar_carrera (errata)': lambda: validar_carrera("ingenieria informatca"),
+        'extraer_certificados': lambda: extraer_certificados(CONVERSACIONES[2][1]),
+        'extraer_intenciones': lambda: extraer_intenciones(descripcion),
+        'filtrar_input_usuarios': lambda: filtrar_input_usuarios(descripcion),
+        'motor._query': lambda: motor._query(consulta),
+        # etapa 2 anterior, para comparar con buscar_recomendacion
+        'buscar_destinos_por_intenciones': lambda: _buscar_destinos_por_intenciones(motor, destinos, intenciones),
+        'enriquecer_con_puntuaciones': lambda: _enriquecer_con_puntuaciones(list(candidatos), destinos),
+        'buscar_recomendacion': lambda: buscar_recomendacion(motor, destinos, intenciones),
+        'construir_prompt_recomendacion': lambda: construir_prompt_recomendacion(
+            descripcion, top5, intenciones, {'tamano_ciudad': 'grande'}),
+    }
+    resultados = {f"etapas/{nombre}": _perfilar(funcion, repeticiones) for nombre, funcion in etapas.items()}
+    _imprimir_resultados(resultados)
+    return resultados
+
+
+def bench_conversaciones(repeticiones=20, latencia=0.05):
+    """Conversaciones completas (todos los turnos) con un LLM falso de latencia fija"""
+    from cliente_llm import GroqLLM
+    from recursos import obtener_recursos
+    from recomendadorErasmus import ErasmAIAssistant
+
+    recursos = obtener_recursos()
+    print("=" * 70)
+    print(f"Conversaciones completas (backend {recursos.backend}, LLM falso {latencia * 1000:.0f} ms, ms)")
+    print("=" * 70)
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            motor = recursos.motor
+    except Exception as e:
+        print(f"⚠️ Backend no disponible: {e}")
+        return {}
+
+    with ServidorLLMFalso(latencia=latencia) as servidor:
+        llm = GroqLLM(api_key="falsa", base_url=servidor.url)
+        resultados = {}
+        for turnos in CONVERSACIONES:
+            def conversacion(turnos=turnos):
+                asistente = ErasmAIAssistant(llm, motor, indice=recursos.indice)
+                for mensaje in ("hola",) + turnos:
+                    asistente.procesar_mensaje(mensaje)
+            resultados[f"conversaciones/{turnos[0]}"] = _perfilar(conversacion, repeticiones, muestras_memoria=3)
+        llm.cerrar()
+    _imprimir_resultados(resultados)
+    return resultados
+
+
+def bench_prompt(repeticiones=10, latencia=0.05, por_token=0.0001):
+    """
+    Tokens del prompt final y latencia de recomendar_con_llama de principio a
+    fin para las conversaciones de referencia, con varios presupuestos
+    """
+    from cliente_llm import GroqLLM
+    from catalogo_memoria import CatalogoMemoria, MemoriaQueryEngine
+    from prompt_recomendacion import construir_prompt_recomendacion, PRESUPUESTO_POR_DEFECTO
+    from rag_funciones import buscar_recomendacion, recomendar_con_llama
+    from recomendadorErasmus import (
+        validar_carrera, extraer_certificados, construir_preferencias, TAMANOS_CIUDAD, REGIONES_VALIDAS, CLIMAS
+    )
+
+    print("=" * 70)
+    print(f"Prompt final: tokens estimados y latencia con LLM falso "
+          f"({latencia * 1000:.0f} ms + {por_token * 1e6:.0f} µs/token, ms)")
+    print("=" * 70)
+    motor = MemoriaQueryEngine(CatalogoMemoria.desde_directorio())
+    casos = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for carrera, certificados, tamano, region, clima, descripcion in CONVERSACIONES:
+            carrera = validar_carrera(carrera)[0]
+            certificados = extraer_certificados(certificados)
+            perfil = (certificados, TAMANOS_CIUDAD[tamano], REGIONES_VALIDAS[region], CLIMAS[clima])
+            intenciones = extraer_intenciones(descripcion)
+            candidatos = buscar_recomendacion(motor, motor.buscar(carrera, *perfil), intenciones)
+            casos.append((carrera, (descripcion, candidatos, intenciones, construir_preferencias(*perfil))))
+
+    resultados = {}
+    with ServidorLLMFalso(latencia=latencia, por_token=por_token) as servidor:
+        llm = GroqLLM(api_key="falsa", base_url=servidor.url)
+        for presupuesto in (0, PRESUPUESTO_POR_DEFECTO, 2000):
+            for carrera, argumentos in casos:
+                prompt = construir_prompt_recomendacion(*argumentos, presupuesto=presupuesto)
+                r = _perfilar(lambda: recomendar_con_llama(llm, *argumentos, presupuesto=presupuesto),
+                              repeticiones, muestras_memoria=1)
+                paises = len({c.pais for c in argumentos[1]})
+                print(f"presupuesto {presupuesto or 'sin límite':>10} | {carrera:<24} ({paises} países) "
+                      f"| {prompt.tokens:5} tokens, nivel {prompt.nivel} | p50 {r['p50']:7.1f} | p95 {r['p95']:7.1f}")
+                resultados[f"prompt/{presupuesto}/{carrera}"] = {**r, 'tokens': prompt.tokens}
+        llm.cerrar()
+    return resultados
+
+
+def guardar_base(resultados, ruta):
+    with open(ruta, 'w', encoding='utf-8') as f:
+        json.dump({'python': sys.version.split()[0], 'resultados': resultados}, f, indent=2, sort_keys=True)
+    print(f"\n💾 Línea base guardada en {ruta}")
+
+
+def comparar_con_base(resultados, ruta, tolerancia=0.2):
+    """
+    Compara el p50/p95 y la memoria con una línea base guardada.
+
+    Returns:
+        list de las métricas que empeoran más de 'tolerancia' (fracción)
+    """
+    with open(ruta, encoding='utf-8') as f:
+        base = json.load(f)['resultados']
+    print("\n" + "=" * 70)
+    print(f"Diferencias con {ruta} (tolerancia {tolerancia:.0%})")
+    print("=" * 70)
+    regresiones = []
+    for nombre in sorted(set(base) & set(resultados)):
+        cambios = []
+        for metrica in ('p50', 'p95', 'kb'):
+            antes, ahora = base[nombre][metrica], resultados[nombre][metrica]
+            cambio = (ahora - antes) / antes if antes else 0.0
+            cambios.append(f"{metrica} {antes:8.3f} → {ahora:8.3f} ({cambio:+6.0%})")
+            if cambio > tolerancia:
+                regresiones.append(f"{nombre} {metrica}")
+        marca = "⚠️" if any(r.startswith(nombre + " ") for r in regresiones) else "  "
+        print(f"{marca} {nombre:<40} | " + " | ".join(cambios))
+    for nombre in sorted(set(base) ^ set(resultados)):
+        print(f"   {nombre:<40} | {'solo en la base' if nombre in base else 'nuevo'}")
+    return regresiones
+
+
+def bench_estado(repeticiones=200, latencia=0.0):
+    """
+    Tamaño de la instantánea de una conversación (JSON y comprimida) y
+    latencia de guardarla y restaurarla en los almacenes en memoria y SQLite
+    """
+    import tempfile
+    from almacen_estado import AlmacenMemoria, AlmacenSQLite, serializar
+    from cliente_llm import GroqLLM
+    from recursos import obtener_recursos
+    from recomendadorErasmus import ErasmAIAssistant
+
+    recursos = obtener_recursos()
+    print("=" * 70)
+    print(f"Estado de las conversaciones (backend {recursos.backend})")
+    print("=" * 70)
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            motor = recursos.motor
+    except Exception as e:
+        print(f"⚠️ Backend no disponible: {e}")
+        return {}
+
+    # Conversación completa guardando lo mismo que app.py tras cada turno
+    with ServidorLLMFalso(latencia=latencia) as servidor:
+        llm = GroqLLM(api_key="falsa", base_url=servidor.url)
+        asistente = ErasmAIAssistant(llm, motor)
+        mensajes = [{"role": "assistant", "content": asistente.procesar_mensaje("")}]
+        tamanos = []
+        with contextlib.redirect_stdout(io.StringIO()):
+            for mensaje in CONVERSACIONES[0]:
+                estado = asistente.estado
+                mensajes.append({"role": "user", "content": mensaje})
+                mensajes.append({"role": "assistant", "content": asistente.procesar_mensaje(mensaje)})
+                instantanea = asistente.a_instantanea()
+                datos = {"asistente": instantanea, "mensajes": mensajes}
+                tamanos.append((estado, len(json.dumps(instantanea, ensure_ascii=False, separators=(',', ':'))),
+                                len(serializar(instantanea)), len(serializar(datos))))
+        llm.cerrar()
+
+    print(f"{'turno':<18}{'asistente JSON':>15}{'zlib':>7}{'con mensajes':>14}  (bytes)")
+    for estado, bruto, comprimido, total in tamanos:
+        print(f"{estado:<18}{bruto:>15}{comprimido:>7}{total:>14}")
+    print()
+
+    def restaurar(almacen):
+        guardado = almacen.cargar("bench")
+        return ErasmAIAssistant.desde_instantanea(guardado["asistente"], None, motor)
+
+    def recalcular_destinos():
+        restaurado = ErasmAIAssistant.desde_instantanea(instantanea, None, motor)
+        restaurado.destinos_filtrados = restaurado._buscar_destinos()
+
+    resultados = {}
+    with tempfile.TemporaryDirectory() as carpeta:
+        almacenes = {'memoria': AlmacenMemoria(), 'sqlite': AlmacenSQLite(os.path.join(carpeta, "estado.db"))}
+        for nombre, almacen in almacenes.items():
+            resultados[f"estado/guardar ({nombre})"] = _perfilar(lambda: almacen.guardar("bench", datos), repeticiones)
+            resultados[f"estado/restaurar ({nombre})"] = _perfilar(lambda: restaurar(almacen), repeticiones)
+            almacen.cerrar()
+    resultados["estado/recalcular destinos"] = _perfilar(recalcular_destinos, repeticiones)
+    _imprimir_resultados(resultados)
+    return resultados
+
+
+def bench_texto(repeticiones=500):
+    """
+    Índice BM25 de los atractivos: tiempo de construcción, tamaño del
+    fichero, apertura con mmap y latencia de las consultas (con los países
+    que más puntúan cada descripción)
+    """
+    import tempfile
+    import indice_bm25
+    from carga_datos import leer_filas
+
+    print("=" * 70)
+    print("Índice de texto de los atractivos (BM25)")
+    print("=" * 70)
+    inicio = time.perf_counter()
+    documentos = indice_bm25.documentos_desde_filas(leer_filas())
+    leido = time.perf_counter()
+    datos = indice_bm25.construir(documentos)
+    construido = time.perf_counter()
+    print(f"{len(documentos)} atractivos leídos en {(leido - inicio) * 1000:.1f} ms, "
+          f"índice de {len(datos) / 1024:.1f} KB construido en {(construido - leido) * 1000:.1f} ms")
+
+    consultas = DESCRIPCIONES + ["Quiero ver auroras boreales y fiordos", "Me encanta el vino y los viñedos"]
+    resultados = {}
+    with tempfile.TemporaryDirectory() as carpeta:
+        ruta = os.path.join(carpeta, "indice.bm25")
+        indice_bm25.guardar(datos, ruta)
+        resultados["texto/abrir (mmap)"] = _perfilar(lambda: indice_bm25.IndiceBM25.abrir(ruta), repeticiones)
+        indice = indice_bm25.IndiceBM25.abrir(ruta)
+        for texto in consultas:
+            puntos = indice.puntos_por_pais(texto)
+            mejores = sorted(puntos.items(), key=lambda par: -par[1])[:4]
+            print(f"{texto[:45]:<47}{len(puntos):>3} países  " + ", ".join(f"{p} {n}" for p, n in mejores))
+            resultados[f"texto/{texto[:30]}"] = _perfilar(lambda: indice.puntos_por_pais(texto), repeticiones)
+    print()
+    _imprimir_resultados(resultados)
+    return resultados
+
+
+# CONSULTA_RECOMENDACION con los datos del país y sus atractivos en cada fila
+# (antes de perfiles_paises), como referencia
+def _consulta_recomendacion_atractivos():
+    from intenciones_matcher import PUNTOS_PAIS_CYPHER
+    return f"""
+    UNWIND $destinos AS d
+    MATCH (u:Universidad) WHERE id(u) = d.id
+    MATCH (u)-[:SITUADA_EN]->(l:Ciudad)-[:UBICADA_EN]->(p:Pais)
+    WITH p, collect({{u: u, l: l, base: d.base}}) AS filas
+    CALL {{
+        WITH p
+        OPTIONAL MATCH (p)-[:TIENE_ATRACTIVO]->(a:Atractivo)
+        WITH a ORDER BY a.rating DESC
+        RETURN collect(a)[0..10] AS atractivos_top
+    }}
+    WITH p, filas, atractivos_top,
+         ({PUNTOS_PAIS_CYPHER}) + coalesce($puntos_categorias[p.nombre], 0) AS PuntosCaracteristicas
+    UNWIND filas AS f
+    WITH p, f.u AS u, f.l AS l, f.base AS PuntuacionBase, PuntosCaracteristicas, atractivos_top
+    RETURN u.nombre AS Universidad, p.nombre AS Pais, p.localizacion AS Localizacion,
+           l.nombre AS Ciudad, l.poblacion AS Poblacion, p.coste_vida AS Coste_Vida,
+           p.ambiente_fiesta AS Ambiente_Fiesta, p.comidas_tipicas AS Comidas_Tipicas,
+           p.temp_media_anual AS Temperatura, p.edad_media AS Edad_Media,
+           PuntosCaracteristicas, PuntuacionBase,
+           coalesce(PuntuacionBase, 0) + PuntosCaracteristicas AS PuntuacionTotal,
+           [a IN atractivos_top | {{nombre: a.nombre, rating: a.rating, categorias: a.categorias,
+                                    descripcion: a.descripcion, visitantes: a.visitantes_anuales}}]
+               AS Atractivos_Destacados
+    ORDER BY PuntuacionTotal DESC
+    LIMIT $k
+    """
+
+
+def bench_perfiles(repeticiones=30):
+    """
+    Etapa 2 de cada conversación con todas las ubicaciones de sus destinos
+    (lo que trae la precarga): bytes de las filas y memoria que retienen los
+    Candidato, con los datos del país y los atractivos en cada fila (antes)
+    y con las filas mínimas más los perfiles de país compartidos (ahora).
+    Con ERASMAI_BACKEND=neo4j mide también las dos consultas.
+    """
+    from catalogo_memoria import CatalogoMemoria, MemoriaQueryEngine
+    from consultas_cypher import CONSULTA_RECOMENDACION, parametros_recomendacion
+    from precarga import SIN_INTENCIONES, SIN_LIMITE
+    from recomendadorErasmus import extraer_certificados, TAMANOS_CIUDAD, REGIONES_VALIDAS, CLIMAS
+    from recursos import obtener_recursos
+    from resultados import Candidato
+
+    print("=" * 70)
+    print("Perfiles de país: filas de la etapa 2 por turno (todas las ubicaciones)")
+    print("=" * 70)
+    motor = MemoriaQueryEngine(CatalogoMemoria.desde_directorio())
+    perfiles = motor.perfiles_paises()
+    minimas = ('Universidad', 'Pais', 'Ciudad', 'Poblacion',
+               'PuntosCaracteristicas', 'PuntuacionBase', 'PuntuacionTotal')
+
+    def retenida(construir):
+        tracemalloc.start()
+        antes = tracemalloc.get_traced_memory()[0]
+        objetos = construir()
+        total = tracemalloc.get_traced_memory()[0] - antes
+        tracemalloc.stop()
+        del objetos
+        return total
+
+    def a_json(filas):
+        return len(json.dumps(filas, ensure_ascii=False).encode('utf-8'))
+
+    perfiles_json = a_json([perfiles.obtener(p).a_dict() for p in motor.catalogo.paises])
+    print(f"Perfiles de {len(perfiles)} países (se leen una vez por proceso): {perfiles_json / 1024:.1f} KB\n")
+    print(f"{'conversación':<24}{'filas':>6}{'KB antes':>10}{'KB ahora':>10}{'memoria antes':>15}{'ahora':>8}")
+
+    turnos = [
+        (carrera, extraer_certificados(certs), TAMANOS_CIUDAD[tamano], REGIONES_VALIDAS[region], CLIMAS[clima])
+        for carrera, certs, tamano, region, clima, _ in CONVERSACIONES
+    ]
+    for carrera, *respuestas in turnos:
+        with contextlib.redirect_stdout(io.StringIO()):
+            destinos = motor.buscar(carrera, *respuestas)
+        universidades = list(dict.fromkeys(d.universidad for d in destinos))
+        candidatos = motor.buscar_por_intenciones(
+            universidades, {'categorias_atractivos': [], 'caracteristicas_pais': SIN_INTENCIONES})
+        completas = [c.a_dict() for c in candidatos]
+        filas = [{columna: fila.get(columna) for columna in minimas} for fila in completas]
+        # las filas se decodifican dentro de la medida: cada una trae sus propias cadenas, como las del driver
+        json_completas, json_filas = json.dumps(completas), json.dumps(filas)
+        antes = retenida(lambda: [Candidato.desde_fila(f) for f in json.loads(json_completas)])
+        ahora = retenida(lambda: perfiles.completar([Candidato.desde_fila(f) for f in json.loads(json_filas)]))
+        print(f"{carrera:<24}{len(filas):>6}{a_json(completas) / 1024:>10.1f}{a_json(filas) / 1024:>10.1f}"
+              f"{antes / 1024:>13.1f}KB{ahora / 1024:>6.1f}KB")
+    print()
+
+    recursos = obtener_recursos()
+    if recursos.backend == "memoria":
+        return {}
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            cypher = recursos.motor
+            cypher.perfiles_paises()
+    except Exception as e:
+        print(f"⚠️ Neo4j no disponible: {e}")
+        return {}
+    from acceso_neo4j import leer
+    consultas = {'con atractivos': _consulta_recomendacion_atractivos(), 'perfiles': CONSULTA_RECOMENDACION}
+    resultados = {}
+    for carrera, *respuestas in turnos:
+        with contextlib.redirect_stdout(io.StringIO()):
+            destinos = cypher.buscar(carrera, *respuestas)
+        params = parametros_recomendacion(destinos, SIN_INTENCIONES, {}, k=SIN_LIMITE)
+        for nombre, consulta in consultas.items():
+            resultados[f"perfiles/{carrera} ({nombre})"] = _perfilar(
+                lambda: leer(cypher.driver, cypher.database, consulta, params, nombre="bench"), repeticiones)
+    _imprimir_resultados(resultados)
+    return resultados
+
+
+def bench_refinamiento(repeticiones=20, latencia=0.05):
+    """
+    Ajustes tras la recomendación ("otra opción", "sin Italia", "más peso a
+    la playa") con un LLM falso: latencia de cada turno frente a repetir la
+    conversación, y spans de base de datos e intenciones que abren (ninguno)
+    """
+    from cliente_llm import GroqLLM
+    from metricas import DURACION
+    from recursos import obtener_recursos
+    from recomendadorErasmus import ErasmAIAssistant
+
+    recursos = obtener_recursos()
+    print("=" * 70)
+    print(f"Ajustes de la recomendación (backend {recursos.backend}, LLM falso {latencia * 1000:.0f} ms, ms)")
+    print("=" * 70)
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            motor = recursos.motor
+    except Exception as e:
+        print(f"⚠️ Backend no disponible: {e}")
+        return {}
+
+    ajustes = ("otra opción", "sin italia", "más peso a la playa", "dame otra alternativa")
+    consultas = ("destinos", "recomendacion", "neo4j", "intenciones")
+    with ServidorLLMFalso(latencia=latencia) as servidor:
+        llm = GroqLLM(api_key="falsa", base_url=servidor.url)
+        asistente = ErasmAIAssistant(llm, motor, indice=recursos.indice)
+        for mensaje in ("hola",) + CONVERSACIONES[2]:
+            asistente.procesar_mensaje(mensaje)
+        instantanea = asistente.a_instantanea()
+        print(f"{'ajuste':<24}{'spans BD/intenciones':>22}  recomendada")
+        for texto in ajustes:
+            antes = {nombre: DURACION.total(span=nombre) for nombre in consultas}
+            asistente.procesar_mensaje(texto)
+            abiertos = sum(DURACION.total(span=nombre) - antes[nombre] for nombre in consultas)
+            print(f"{texto:<24}{abiertos:>22}  {asistente.refinamiento.recomendada}")
+        print()
+
+        def ajuste(texto):
+            restaurado = ErasmAIAssistant.desde_instantanea(instantanea, llm, motor, indice=recursos.indice)
+            restaurado.refinamiento = asistente.refinamiento.con()
+            restaurado.procesar_mensaje(texto)
+
+        resultados = {f"refinamiento/{texto}": _perfilar(lambda: ajuste(texto), repeticiones, muestras_memoria=3)
+                      for texto in ajustes[:3]}
+
+        def conversacion():
+            nuevo = ErasmAIAssistant(llm, motor, indice=recursos.indice)
+            for mensaje in ("hola",) + CONVERSACIONES[2]:
+                nuevo.procesar_mensaje(mensaje)
+        resultados["refinamiento/conversación completa"] = _perfilar(conversacion, repeticiones, muestras_memoria=3)
+        llm.cerrar()
+    _imprimir_resultados(resultados)
+    return resultados
+
+
+BENCHMARKS = {
+    'intenciones': bench_intenciones,
+    'llm': bench_llm,
+    'importacion': bench_importacion,
+    'consultas': bench_consultas,
+    'puntuacion': bench_puntuacion,
+    'etapas': bench_etapas,
+    'conversaciones': bench_conversaciones,
+    'prompt': bench_prompt,
+    'neo4j': bench_neo4j,
+    'estado': bench_estado,
+    'texto': bench_texto,
+    'perfiles': bench_perfiles,
+    'refinamiento': bench_refinamiento,
+}
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmarks de ErasmAI")
+    parser.add_argument('nombres', nargs='*',
+                        help=f"benchmarks a ejecutar, todos si no se indica ninguno ({', '.join(BENCHMARKS)})")
+    parser.add_argument('--guardar', metavar='RUTA', help="guarda los resultados como línea base")
+    parser.add_argument('--comparar', metavar='RUTA', help="compara con una línea base guardada")
+    parser.add_argument('--tolerancia', type=float, default=0.2, help="empeoramiento admitido (0.2 = 20%%)")
+    parser.add_argument('--latencia-llm', type=float, default=0.05, help="latencia del LLM falso (s)")
+    args = parser.parse_args()
+    for nombre in args.nombres:
+        if nombre not in BENCHMARKS:
+            parser.error(f"benchmark desconocido: {nombre}")
+
+    resultados = {}
+    for nombre in args.nombres or list(BENCHMARKS):
+        if nombre in ('conversaciones', 'refinamiento'):
+            resultados.update(BENCHMARKS[nombre](latencia=args.latencia_llm))
+        else:
+            resultados.update(BENCHMARKS[nombre]() or {})
+    if args.guardar:
+        guardar_base(resultados, args.guardar)
+    if args.comparar:
+        regresiones = comparar_con_base(resultados, args.comparar, args.tolerancia)
+        if regresiones:
+            print(f"\n⚠️ {len(regresiones)} regresiones: {', '.join(regresiones)}")
+            sys.exit(1)
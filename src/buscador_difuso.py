@@ -0,0 +1,130 @@
+"""
+Búsqueda aproximada de nombres (carreras, ciudades, países) con un índice de trigramas
+
+El índice se construye una sola vez: un diccionario de nombres normalizados
+para las coincidencias exactas y un índice invertido trigrama -> entradas
+para tolerar erratas. Cada consulta solo compara contra las entradas que
+comparten algún trigrama con el texto.
+"""
+
+import re
+import unicodedata
+
+
+UMBRAL = 0.6
+# Diferencia mínima entre el primer y el segundo candidato para dar el primero por bueno
+MARGEN = 0.05
+
+_NO_ALFANUMERICO = re.compile(r'[^a-z0-9]+')
+
+
+def normalizar(texto):
+    """Minúsculas, sin tildes y con cualquier separador reducido a un espacio"""
+    texto = unicodedata.normalize('NFKD', (texto or '').lower())
+    texto = ''.join(c for c in texto if not unicodedata.combining(c))
+    return _NO_ALFANUMERICO.sub(' ', texto).strip()
+
+
+def trigramas(texto):
+    """Trigramas de caracteres del texto normalizado, con relleno en los bordes"""
+    relleno = f"  {texto} "
+    return {relleno[i:i + 3] for i in range(len(relleno) - 2)}
+
+
+class BuscadorDifuso:
+    """
+    Índice de nombres oficiales y sus alias. buscar() devuelve candidatos
+    ordenados por puntuación (1.0 = coincidencia exacta) y mejor() el nombre
+    oficial si hay uno claro.
+
+    La puntuación de cada entrada es la mayor de:
+    - coeficiente de Dice entre los trigramas del texto y los de la entrada (erratas)
+    - la entrada aparece como palabras completas dentro del texto
+      ("grado en ingenieria informatica"): 0.7 a 1.0 según la parte del texto que cubre
+    - el texto es el comienzo de alguna palabra de la entrada ("ingenieria info"):
+      0.6 a 0.9 según la parte de la entrada que cubre
+    """
+
+    def __init__(self, nombres, alias=None):
+        self._exactos = {}
+        self._entradas = []  # (texto normalizado, nombre oficial, trigramas)
+        self._indice = {}
+
+        for nombre in nombres:
+            self._anadir(nombre, nombre)
+        for texto, nombre in (alias or {}).items():
+            self._anadir(texto, nombre)
+
+    def _anadir(self, texto, nombre):
+        normalizado = normalizar(texto)
+        if not normalizado or normalizado in self._exactos:
+            return
+        self._exactos[normalizado] = nombre
+        posicion = len(self._entradas)
+        grams = trigramas(normalizado)
+        self._entradas.append((normalizado, nombre, grams))
+        for gram in grams:
+            self._indice.setdefault(gram, []).append(posicion)
+
+    def __len__(self):
+        return len(self._entradas)
+
+    def _puntuar(self, texto):
+        """nombre oficial -> (puntuación, el texto es prefijo de la entrada)"""
+        consulta = normalizar(texto)
+        if not consulta:
+            return {}
+        if consulta in self._exactos:
+            return {self._exactos[consulta]: (1.0, False)}
+
+        grams = trigramas(consulta)
+        comunes = {}
+        for gram in grams:
+            for posicion in self._indice.get(gram, ()):
+                comunes[posicion] = comunes.get(posicion, 0) + 1
+
+        envuelta = f" {consulta} "
+        mejores = {}
+        for posicion, compartidos in comunes.items():
+            entrada, nombre, grams_entrada = self._entradas[posicion]
+            puntuacion = 2 * compartidos / (len(grams) + len(grams_entrada))
+            prefijo = False
+            if f" {entrada} " in envuelta:
+                puntuacion = max(puntuacion, 0.7 + 0.3 * len(entrada) / len(consulta))
+            elif f" {consulta}" in f" {entrada}":
+                puntuacion = max(puntuacion, 0.6 + 0.3 * len(consulta) / len(entrada))
+                prefijo = True
+            if puntuacion > mejores.get(nombre, (0, False))[0]:
+                mejores[nombre] = (puntuacion, prefijo)
+        return mejores
+
+    def buscar(self, texto, n=5, umbral=UMBRAL):
+        """
+        Returns:
+            list de (nombre oficial, puntuación) ordenada de mayor a menor,
+            un solo resultado por nombre oficial
+        """
+        return self._ordenar(self._puntuar(texto), umbral)[:n]
+
+    @staticmethod
+    def _ordenar(puntuaciones, umbral):
+        candidatos = [(nombre, p) for nombre, (p, _) in puntuaciones.items() if p >= umbral]
+        return sorted(candidatos, key=lambda par: (-par[1], par[0]))
+
+    def mejor(self, texto, umbral=UMBRAL, margen=MARGEN):
+        """
+        Nombre oficial del mejor candidato, o None si no hay ninguno o es
+        ambiguo: el segundo está a menos de 'margen' o el texto es el comienzo
+        de varios nombres distintos ("ing", "educacion")
+        """
+        puntuaciones = self._puntuar(texto)
+        candidatos = self._ordenar(puntuaciones, umbral)
+        if not candidatos:
+            return None
+        primero, puntuacion = candidatos[0]
+        if puntuacion < 1.0:
+            if len(candidatos) > 1 and puntuacion - candidatos[1][1] < margen:
+                return None
+            if puntuaciones[primero][1] and sum(prefijo for _, prefijo in puntuaciones.values()) > 1:
+                return None
+        return primero
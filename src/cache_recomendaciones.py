@@ -0,0 +1,226 @@
+"""
+Caché de recomendaciones del LLM direccionada por contenido
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from prompt_recomendacion import filtrar_input_usuarios, VERSION_PROMPT
+
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data")
+
+# Ficheros que definen el catálogo; si cambia cualquiera, cambia la versión
+FICHEROS_DATOS = ('datasetSibi.csv', 'añadirCosas.csv', 'atractivos_FINALES.csv', 'ciudades.csv')
+
+
+def version_datos(directorio=DATA_DIR):
+    """Hash del contenido de los CSV del catálogo (los que no existen se ignoran)"""
+    h = hashlib.sha256()
+    for nombre in FICHEROS_DATOS:
+        ruta = os.path.join(directorio, nombre)
+        if not os.path.exists(ruta):
+            continue
+        h.update(nombre.encode())
+        with open(ruta, 'rb') as f:
+            h.update(hashlib.sha256(f.read()).digest())
+    return h.hexdigest()[:16]
+
+
+def normalizar_descripcion(descripcion):
+    """Descripción saneada igual que en el prompt, en minúsculas y con espacios compactados"""
+    return ' '.join(filtrar_input_usuarios(descripcion).lower().split())
+
+
+def _forma_canonica(candidatos, intenciones, preferencias):
+    return {
+        'universidades': [c.universidad for c in candidatos],
+        'categorias': sorted(intenciones['categorias_atractivos']),
+        'pais': sorted(k for k, v in intenciones['caracteristicas_pais'].items() if v),
+        'preferencias': preferencias or {},
+    }
+
+
+def _hash(datos):
+    texto = json.dumps(datos, sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha256(texto.encode('utf-8')).hexdigest()
+
+
+class CacheRecomendaciones:
+    """
+    Caché LRU con caducidad (TTL) para las respuestas de recomendar_con_llama.
+
+    La clave es un sha256 de la forma canónica de las entradas: universidades
+    candidatas (en orden), categorías y características detectadas,
+    preferencias del cuestionario, modelo y versiones de los datos y del
+    prompt. Hay dos niveles, activables por separado:
+
+    - exacta: añade además la descripción saneada y normalizada
+    - intenciones: solo las intenciones; estudiantes con descripciones
+      distintas pero las mismas intenciones y candidatos comparten respuesta.
+      El prompt pide al modelo citar la descripción ("basándome en tu
+      descripción donde buscabas..."), así que un acierto a este nivel
+      puede mostrar a un estudiante el texto libre de otro: solo conviene
+      activarlo si las descripciones no son privadas
+
+    Con 'ruta' las entradas se guardan también en SQLite y sobreviven a
+    reinicios; las de otra versión de datos se descartan al abrir.
+    """
+
+    def __init__(self, max_entradas=512, ttl=24 * 3600, exacta=True, intenciones=False,
+                 ruta=None, version=None, modelo=""):
+        self.max_entradas = max_entradas
+        self.ttl = ttl
+        self.exacta = exacta
+        self.intenciones = intenciones
+        self.modelo = modelo
+        self.version = version if version is not None else version_datos()
+        self.aciertos = 0
+        self.fallos = 0
+        self._entradas = OrderedDict()  # clave -> (creado, texto)
+        self._lock = threading.Lock()
+        self._db = None
+        if ruta:
+            self._abrir(ruta)
+
+    @classmethod
+    def desde_entorno(cls, modelo=""):
+        """
+        Configuración por variables de entorno:
+        ERASMAI_CACHE ("exacta", "intenciones", "ambas" u "off"),
+        ERASMAI_CACHE_TTL (segundos), ERASMAI_CACHE_MAX y ERASMAI_CACHE_RUTA.
+        Devuelve None si la caché está desactivada.
+        """
+        modo = os.getenv("ERASMAI_CACHE", "exacta").lower()
+        if modo == "off":
+            return None
+        return cls(
+            max_entradas=int(os.getenv("ERASMAI_CACHE_MAX", "512")),
+            ttl=float(os.getenv("ERASMAI_CACHE_TTL", str(24 * 3600))),
+            exacta=modo in ("exacta", "ambas"),
+            intenciones=modo in ("intenciones", "ambas"),
+            ruta=os.getenv("ERASMAI_CACHE_RUTA") or None,
+            modelo=modelo
+        )
+
+    # ---------- claves ----------
+
+    def claves(self, descripcion, candidatos, intenciones, preferencias=None):
+        """Claves de los niveles activos, de la más específica a la más general"""
+        base = {**_forma_canonica(candidatos, intenciones, preferencias),
+                'modelo': self.modelo, 'version': self.version, 'prompt': VERSION_PROMPT}
+        claves = []
+        if self.exacta:
+            claves.append('e:' + _hash({**base, 'descripcion': normalizar_descripcion(descripcion)}))
+        if self.intenciones:
+            claves.append('i:' + _hash(base))
+        return claves
+
+    # ---------- lectura / escritura ----------
+
+    def obtener(self, descripcion, candidatos, intenciones, preferencias=None):
+        """Texto guardado para estas entradas, o None"""
+        ahora = time.time()
+        with self._lock:
+            caducadas = False
+            try:
+                for clave in self.claves(descripcion, candidatos, intenciones, preferencias):
+                    entrada = self._entradas.get(clave)
+                    if entrada is None:
+                        continue
+                    creado, texto = entrada
+                    if ahora - creado > self.ttl:
+                        self._borrar(clave)
+                        caducadas = True
+                        continue
+                    self._entradas.move_to_end(clave)
+                    self.aciertos += 1
+                    return texto
+                self.fallos += 1
+                return None
+            finally:
+                # sin commit, el DELETE dejaría abierta la transacción de escritura de SQLite
+                if caducadas and self._db is not None:
+                    self._db.commit()
+
+    def guardar(self, descripcion, candidatos, intenciones, preferencias, texto):
+        ahora = time.time()
+        with self._lock:
+            for clave in self.claves(descripcion, candidatos, intenciones, preferencias):
+                self._entradas[clave] = (ahora, texto)
+                self._entradas.move_to_end(clave)
+                if self._db is not None:
+                    self._db.execute(
+                        "INSERT OR REPLACE INTO recomendaciones VALUES (?, ?, ?, ?)",
+                        (clave, self.version, ahora, texto)
+                    )
+            while len(self._entradas) > self.max_entradas:
+                self._borrar(next(iter(self._entradas)))
+            if self._db is not None:
+                self._db.commit()
+
+    def invalidar(self, version=None):
+        """
+        Vacía la caché. Si se pasa la nueva versión de los datos, pasa a usarla
+        (las claves la incluyen, así que nada antiguo vuelve a coincidir).
+        """
+        with self._lock:
+            if version is not None:
+                self.version = version
+            self._entradas.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM recomendaciones")
+                self._db.commit()
+
+    def comprobar_version(self, directorio=DATA_DIR):
+        """Recalcula la versión de los datos e invalida si ha cambiado. True si invalidó"""
+        version = version_datos(directorio)
+        if version == self.version:
+            return False
+        self.invalidar(version)
+        return True
+
+    def estadisticas(self):
+        total = self.aciertos + self.fallos
+        return {
+            'entradas': len(self._entradas),
+            'aciertos': self.aciertos,
+            'fallos': self.fallos,
+            'tasa_aciertos': self.aciertos / total if total else 0.0,
+            'version': self.version,
+        }
+
+    def _borrar(self, clave):
+        self._entradas.pop(clave, None)
+        if self._db is not None:
+            self._db.execute("DELETE FROM recomendaciones WHERE clave = ?", (clave,))
+
+    # ---------- persistencia ----------
+
+    def _abrir(self, ruta):
+        self._db = sqlite3.connect(ruta, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS recomendaciones ("
+            "clave TEXT PRIMARY KEY, version TEXT, creado REAL, texto TEXT)"
+        )
+        limite = time.time() - self.ttl
+        self._db.execute(
+            "DELETE FROM recomendaciones WHERE version != ? OR creado < ?", (self.version, limite)
+        )
+        self._db.commit()
+        filas = self._db.execute(
+            "SELECT clave, creado, texto FROM recomendaciones ORDER BY creado DESC LIMIT ?",
+            (self.max_entradas,)
+        ).fetchall()
+        for clave, creado, texto in reversed(filas):
+            self._entradas[clave] = (creado, texto)
+
+    def cerrar(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
@@ -0,0 +1,347 @@
+"""
+Carga incremental de los CSV de data/ en Neo4j (sustituye a los bloques LOAD CSV de neo4j_setup.md)
+
+Uso:
+    python src/carga_datos.py [--directorio data/] [--lote 1000] [--forzar] [--podar]
+
+Los tres CSV se leen y normalizan una sola vez con las mismas reglas que el
+catálogo en memoria y se escriben con transacciones UNWIND por lotes. Cada
+nodo y relación guarda en la propiedad 'hash' la huella de su fila
+normalizada, así que al volver a cargar tras editar un CSV solo se escriben
+las filas que han cambiado. Se puede relanzar las veces que haga falta.
+
+Antes de cargar se aplican las migraciones pendientes del esquema (migraciones.py)
+y se reconstruye el índice de texto de los atractivos (indice_bm25.py).
+"""
+
+import argparse
+import csv
+import hashlib
+import json
+import os
+import sys
+import time
+
+from catalogo_memoria import DATA_DIR, RENOMBRAR_PAISES, _a_entero, _a_real, _std, requisitos_idioma
+from intenciones_matcher import plegar_acentos
+
+
+# ========================================
+# LECTURA Y NORMALIZACIÓN
+# ========================================
+
+def _huella(fila):
+    contenido = json.dumps(fila, sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha256(contenido.encode('utf-8')).hexdigest()[:16]
+
+
+def _categorias(texto):
+    return [c.replace('"', '').strip() for c in (texto or '').lower().split(',')]
+
+
+def leer_filas(directorio=DATA_DIR):
+    """
+    Lee y normaliza los CSV del proyecto.
+
+    Las filas repetidas se funden como lo hacían los MERGE/SET de
+    neo4j_setup.md: la última fila de una universidad fija su ranking y la
+    última de cada par (carrera, universidad) fija el idioma de todas sus
+    OFERTA. Los países de añadirCosas.csv y de los atractivos se cruzan sin
+    tildes con los del dataset.
+
+    Returns:
+        dict tipo -> lista de filas (dicts), cada una con su 'hash'
+    """
+    carreras, universidades, paises, ciudades = {}, {}, {}, {}
+    ubicadas, situadas, ofertas, idioma_por_par = {}, {}, {}, {}
+
+    with open(os.path.join(directorio, 'datasetSibi.csv'), encoding='utf-8-sig', newline='') as f:
+        for row in csv.DictReader(f):
+            carrera = _std(row['carrera'])
+            uni = _std(row['universidad_destino'])
+            pais = _std(row['pais_destino'])
+            pais = RENOMBRAR_PAISES.get(pais, pais)
+            ciudad = _std(row['ciudad_destino'])
+
+            carreras[carrera] = {'nombre': carrera, 'propiedades': {}}
+            universidades[uni] = {'nombre': uni, 'propiedades': {
+                'ranking_uni': _a_entero(row['ranking_uni']),
+                'exchange_score': _a_real(row['exchange_score']),
+            }}
+            paises.setdefault(pais, {'nombre': pais, 'propiedades': {}})
+            ciudades.setdefault(ciudad, {'nombre': ciudad, 'propiedades': {}})
+            ubicadas[ciudad, pais] = {'ciudad': ciudad, 'pais': pais}
+            situadas[uni, ciudad] = {'universidad': uni, 'ciudad': ciudad}
+
+            plazas, meses = _a_entero(row['plazas']), _a_entero(row['meses'])
+            ofertas[carrera, uni, plazas, meses] = {
+                'carrera': carrera, 'universidad': uni, 'plazas': plazas, 'meses': meses,
+            }
+            idioma_por_par[carrera, uni] = ((row['cert_idioma'] or '').strip(), (row['nivel_idioma'] or '').strip())
+
+    for (carrera, uni, _, _), oferta in ofertas.items():
+        oferta['cert_obligatorio'], oferta['nivel_requerido'] = idioma_por_par[carrera, uni]
+        # Alternativas ya interpretadas, en dos listas paralelas para filtrar en Cypher
+        requisitos = requisitos_idioma(oferta['nivel_requerido'])
+        oferta['idiomas_requeridos'] = [idioma for idioma, _ in requisitos]
+        oferta['niveles_requeridos'] = [nivel for _, nivel in requisitos]
+
+    plegados = {plegar_acentos(_std(p)): p for p in paises}
+
+    with open(os.path.join(directorio, 'añadirCosas.csv'), encoding='utf-8-sig', newline='') as f:
+        for row in csv.DictReader(f, delimiter=';'):
+            pais = plegados.get(plegar_acentos(_std(row['pais_destino'])))
+            if pais is None:
+                continue
+            paises[pais]['propiedades'] = {
+                'localizacion': _std(row['localizacion_pais']),
+                'moneda': row['moneda'].strip(),
+                'capital': row['capital'].strip(),
+                'coste_vida': row['coste_vida'].strip(),
+                'comidas_tipicas': row['comidas_tipicas'].strip(),
+                'ambiente_fiesta': row['ambiente_fiesta'].strip(),
+                'poblacion_total': _a_entero(row['poblacion']),
+                'temp_media_anual': _a_real(row['temp_med']),
+                'edad_media': _a_real(row['edad_media']),
+            }
+
+    atractivos, tiene = {}, {}
+    with open(os.path.join(directorio, 'atractivos_FINALES.csv'), encoding='utf-8-sig', newline='') as f:
+        for row in csv.DictReader(f):
+            pais = plegados.get(plegar_acentos(_std(row['pais_destino'])))
+            if pais is None:
+                continue
+            nombre = (row['Atraccion'] or '').strip()
+            atractivos[nombre] = {'nombre': nombre, 'propiedades': {
+                'visitantes_anuales': _a_entero(row['turistas_anuales']),
+                'mejor_estacion': (row['mejor_estacion'] or '').strip(),
+                'rating': _a_real(row['rating']),
+                'categorias': _categorias(row['categoria']),
+                'descripcion': (row['descripcion'] or '').strip(),
+            }}
+            tiene[pais, nombre] = {'pais': pais, 'atractivo': nombre}
+
+    # La población es opcional: sin ciudades.csv no se toca la que ya hubiera en el grafo
+    ruta_ciudades = os.path.join(directorio, 'ciudades.csv')
+    if os.path.exists(ruta_ciudades):
+        with open(ruta_ciudades, encoding='utf-8-sig', newline='') as f:
+            for row in csv.DictReader(f):
+                ciudad = _std(row['ciudad'])
+                if ciudad in ciudades:
+                    ciudades[ciudad]['propiedades'] = {'poblacion': _a_entero(row['poblacion'])}
+
+    filas = {
+        'Carrera': list(carreras.values()),
+        'Universidad': list(universidades.values()),
+        'Pais': list(paises.values()),
+        'Ciudad': list(ciudades.values()),
+        'Atractivo': list(atractivos.values()),
+        'UBICADA_EN': list(ubicadas.values()),
+        'SITUADA_EN': list(situadas.values()),
+        'OFERTA': list(ofertas.values()),
+        'TIENE_ATRACTIVO': list(tiene.values()),
+    }
+    for lista in filas.values():
+        for fila in lista:
+            fila['hash'] = _huella(fila)
+    return filas
+
+
+# ========================================
+# PLANTILLAS CYPHER
+# ========================================
+
+def _nodo(etiqueta):
+    return {
+        'campos': ('nombre',),
+        'leer': f"MATCH (n:{etiqueta}) RETURN [n.nombre] AS clave, n.hash AS hash",
+        'escribir': f"""
+            UNWIND $filas AS f
+            MERGE (n:{etiqueta} {{nombre: f.nombre}})
+            SET n += f.propiedades, n.hash = f.hash
+        """,
+        'borrar': f"""
+            UNWIND $claves AS k
+            MATCH (n:{etiqueta} {{nombre: k[0]}})
+            DETACH DELETE n
+        """,
+    }
+
+
+def _relacion(tipo, origen, destino, campo_origen, campo_destino):
+    return {
+        'campos': (campo_origen, campo_destino),
+        'leer': f"""
+            MATCH (a:{origen})-[r:{tipo}]->(b:{destino})
+            RETURN [a.nombre, b.nombre] AS clave, r.hash AS hash
+        """,
+        'escribir': f"""
+            UNWIND $filas AS f
+            MATCH (a:{origen} {{nombre: f.{campo_origen}}})
+            MATCH (b:{destino} {{nombre: f.{campo_destino}}})
+            MERGE (a)-[r:{tipo}]->(b)
+            SET r.hash = f.hash
+        """,
+        'borrar': f"""
+            UNWIND $claves AS k
+            MATCH (:{origen} {{nombre: k[0]}})-[r:{tipo}]->(:{destino} {{nombre: k[1]}})
+            DELETE r
+        """,
+    }
+
+
+# Orden de escritura: primero los nodos, después las relaciones que los unen
+# (el borrado con --podar va en orden inverso)
+TIPOS = {
+    'Carrera': _nodo('Carrera'),
+    'Universidad': _nodo('Universidad'),
+    'Pais': _nodo('Pais'),
+    'Ciudad': _nodo('Ciudad'),
+    'Atractivo': _nodo('Atractivo'),
+    'UBICADA_EN': _relacion('UBICADA_EN', 'Ciudad', 'Pais', 'ciudad', 'pais'),
+    'SITUADA_EN': _relacion('SITUADA_EN', 'Universidad', 'Ciudad', 'universidad', 'ciudad'),
+    'TIENE_ATRACTIVO': _relacion('TIENE_ATRACTIVO', 'Pais', 'Atractivo', 'pais', 'atractivo'),
+    # OFERTA se identifica también por plazas y meses, como en el MERGE del Bloque B
+    'OFERTA': {
+        'campos': ('carrera', 'universidad', 'plazas', 'meses'),
+        'leer': """
+            MATCH (c:Carrera)-[o:OFERTA]->(u:Universidad)
+            RETURN [c.nombre, u.nombre, o.numero_de_plazas, o.duracion_de_estancia] AS clave,
+                   o.hash AS hash
+        """,
+        'escribir': """
+            UNWIND $filas AS f
+            MATCH (c:Carrera {nombre: f.carrera})
+            MATCH (u:Universidad {nombre: f.universidad})
+            MERGE (c)-[o:OFERTA {numero_de_plazas: f.plazas, duracion_de_estancia: f.meses}]->(u)
+            SET o.cert_obligatorio = f.cert_obligatorio,
+                o.nivel_requerido = f.nivel_requerido,
+                o.idiomas_requeridos = f.idiomas_requeridos,
+                o.niveles_requeridos = f.niveles_requeridos,
+                o.hash = f.hash
+        """,
+        'borrar': """
+            UNWIND $claves AS k
+            MATCH (:Carrera {nombre: k[0]})-[o:OFERTA]->(:Universidad {nombre: k[1]})
+            WHERE o.numero_de_plazas = k[2] AND o.duracion_de_estancia = k[3]
+            DELETE o
+        """,
+    },
+}
+
+
+# ========================================
+# CARGA
+# ========================================
+
+def planificar(filas, existentes, campos, forzar=False):
+    """
+    Compara las filas del CSV con los hashes guardados en el grafo
+
+    Args:
+        existentes: dict clave -> hash leído de Neo4j (None si no tiene)
+
+    Returns:
+        (filas a escribir, claves cargadas antes y que ya no están en los CSV)
+    """
+    actuales = {tuple(fila[c] for c in campos): fila for fila in filas}
+    cambiadas = [fila for clave, fila in actuales.items() if forzar or existentes.get(clave) != fila['hash']]
+    sobrantes = [list(clave) for clave, huella in existentes.items()
+                 if clave not in actuales and huella is not None]
+    return cambiadas, sobrantes
+
+
+def _por_lotes(filas, lote):
+    for i in range(0, len(filas), lote):
+        yield filas[i:i + lote]
+
+
+def cargar(driver, database, filas, lote=1000, forzar=False, podar=False):
+    """
+    Escribe en Neo4j solo las filas nuevas o modificadas (todas con 'forzar')
+    y, con 'podar', borra las que se cargaron antes y ya no están en los CSV.
+    Los nodos y relaciones creados a mano (sin hash) nunca se borran.
+
+    Returns:
+        dict tipo -> {'filas', 'escritas', 'borradas', 'segundos'}
+    """
+    informe = {}
+    sobrantes_por_tipo = {}
+    with driver.session(database=database) as session:
+        for tipo, plantilla in TIPOS.items():
+            inicio = time.perf_counter()
+            existentes = {
+                tuple(registro['clave']): registro['hash']
+                for registro in session.execute_read(lambda tx: list(tx.run(plantilla['leer'])))
+            }
+            cambiadas, sobrantes_por_tipo[tipo] = planificar(filas[tipo], existentes, plantilla['campos'], forzar)
+            for trozo in _por_lotes(cambiadas, lote):
+                session.execute_write(lambda tx: tx.run(plantilla['escribir'], filas=trozo).consume())
+            informe[tipo] = {'filas': len(filas[tipo]), 'escritas': len(cambiadas), 'borradas': 0,
+                             'segundos': time.perf_counter() - inicio}
+
+        if podar:
+            for tipo in reversed(list(TIPOS)):
+                inicio = time.perf_counter()
+                sobrantes = sobrantes_por_tipo[tipo]
+                for trozo in _por_lotes(sobrantes, lote):
+                    session.execute_write(lambda tx: tx.run(TIPOS[tipo]['borrar'], claves=trozo).consume())
+                informe[tipo]['borradas'] = len(sobrantes)
+                informe[tipo]['segundos'] += time.perf_counter() - inicio
+    return informe
+
+
+def _ritmo(cambios, segundos):
+    """Filas escritas o borradas por segundo de escritura (las que no cambian no cuentan)"""
+    return cambios / segundos if segundos else 0
+
+
+def imprimir_informe(informe, segundos):
+    print(f"{'tipo':<16}{'filas':>7}{'escritas':>10}{'borradas':>10}{'s':>8}{'escr./s':>10}")
+    for tipo, datos in informe.items():
+        ritmo = _ritmo(datos['escritas'] + datos['borradas'], datos['segundos'])
+        print(f"{tipo:<16}{datos['filas']:>7}{datos['escritas']:>10}{datos['borradas']:>10}"
+              f"{datos['segundos']:>8.2f}{ritmo:>10.0f}")
+    total = sum(d['filas'] for d in informe.values())
+    escritas = sum(d['escritas'] for d in informe.values())
+    borradas = sum(d['borradas'] for d in informe.values())
+    carga = sum(d['segundos'] for d in informe.values())
+    print(f"\n✅ {total} filas, {escritas} escritas y {borradas} borradas en {segundos:.2f} s "
+          f"({carga:.2f} s en Neo4j: {_ritmo(escritas + borradas, carga):.0f} filas escritas/s)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Carga incremental de los CSV en Neo4j")
+    parser.add_argument('--directorio', default=DATA_DIR, help="carpeta con los CSV")
+    parser.add_argument('--lote', type=int, default=1000, help="filas por transacción")
+    parser.add_argument('--forzar', action='store_true', help="reescribe todas las filas aunque no hayan cambiado")
+    parser.add_argument('--podar', action='store_true',
+                        help="borra lo cargado antes que ya no está en los CSV")
+    args = parser.parse_args(argv)
+
+    inicio = time.perf_counter()
+    filas = leer_filas(args.directorio)
+    print(f"📄 {sum(len(f) for f in filas.values())} filas normalizadas en {time.perf_counter() - inicio:.2f} s")
+
+    import indice_bm25
+    from cache_recomendaciones import version_datos
+    ruta_indice = os.path.join(args.directorio, os.path.basename(indice_bm25.RUTA_POR_DEFECTO))
+    datos_indice = indice_bm25.construir(indice_bm25.documentos_desde_filas(filas), version_datos(args.directorio))
+    indice_bm25.guardar(datos_indice, ruta_indice)
+    print(f"🔎 Índice de texto de atractivos: {len(datos_indice) / 1024:.0f} KB en {ruta_indice}")
+
+    from migraciones import migrar
+    from recursos import Recursos
+    recursos = Recursos(backend="neo4j")
+    try:
+        aplicadas = migrar(recursos.driver, recursos.database)
+        if aplicadas:
+            print(f"🗄️ Migraciones del esquema aplicadas: {aplicadas}")
+        informe = cargar(recursos.driver, recursos.database, filas, args.lote, args.forzar, args.podar)
+    finally:
+        recursos.cerrar()
+    imprimir_informe(informe, time.perf_counter() - inicio)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,363 @@
+"""
+Catálogo Erasmus en memoria: alternativa a Neo4j para el motor de búsqueda
+"""
+
+import csv
+import json
+import math
+import os
+import re
+
+from llama_index.core.query_engine import BaseQueryEngine
+from llama_index.core.callbacks import CallbackManager
+
+from intenciones_matcher import NIVEL_MAPA, plegar_acentos, puntos_pais
+from perfiles_categorias import PerfilesCategorias, TOP_ATRACTIVOS, mascara_de_categorias
+from perfiles_paises import PerfilesPaises
+from resultados import Atractivo, Candidato, Destino, PerfilPais
+
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data")
+
+# Mismo renombrado manual que se aplica en neo4j_setup.md (Bloque C.2)
+RENOMBRAR_PAISES = {'turquía': 'turquia'}
+
+def _a_entero(valor):
+    """Equivalente a toInteger() de Cypher: None si no es numérico"""
+    try:
+        return int(float(valor.strip()))
+    except (AttributeError, ValueError):
+        return None
+
+
+def _a_real(valor):
+    """Equivalente a toFloat() de Cypher: None si no es numérico"""
+    try:
+        return float(valor.strip())
+    except (AttributeError, ValueError):
+        return None
+
+
+def _std(valor):
+    """trim(toLower(...)) como en los bloques LOAD CSV"""
+    return (valor or '').strip().lower()
+
+
+_REQUISITO_IDIOMA = re.compile(r'([abc][12])\s+([a-z]+)')
+
+
+def requisitos_idioma(nivel_requerido):
+    """
+    Alternativas de un nivel_requerido ("B2 Ingles o B2 Aleman") como lista
+    de (idioma sin tildes, nivel de NIVEL_MAPA); basta con cumplir una
+    """
+    return [(idioma, NIVEL_MAPA[nivel.upper()])
+            for nivel, idioma in _REQUISITO_IDIOMA.findall(plegar_acentos(_std(nivel_requerido)))]
+
+
+class CatalogoMemoria:
+    """
+    Carga los tres CSV del proyecto en estructuras indexadas en memoria,
+    reproduciendo el grafo que construye neo4j_setup.md:
+
+    - ofertas_por_carrera: carrera -> tupla de filas ya unidas
+      (universidad, ciudad, pais, plazas, meses, cert, nivel)
+    - ubicaciones: universidad -> tupla de (ciudad, pais)
+    - universidades / paises / ciudades: propiedades de cada nodo
+    - atractivos_por_pais: pais -> tupla de atractivos ordenados por rating
+    - perfiles: máscaras de categorías por país (perfiles_categorias)
+    - perfiles_paises: datos y atractivos destacados de cada país (perfiles_paises)
+    """
+
+    def __init__(self):
+        self.universidades = {}
+        self.paises = {}
+        self.ciudades = {}
+        self.atractivos = {}
+        self.ofertas_por_carrera = {}
+        self.ubicaciones = {}
+        self.atractivos_por_pais = {}
+        self.perfiles = PerfilesCategorias()
+        self.perfiles_paises = PerfilesPaises()
+
+    @classmethod
+    def desde_directorio(cls, directorio=DATA_DIR):
+        catalogo = cls()
+        catalogo.cargar(directorio)
+        return catalogo
+
+    def cargar(self, directorio=DATA_DIR):
+        ofertas, uni_ciudades, ciudad_paises = self._cargar_dataset(
+            os.path.join(directorio, 'datasetSibi.csv'))
+        for viejo, nuevo in RENOMBRAR_PAISES.items():
+            if viejo in self.paises:
+                self.paises[nuevo] = self.paises.pop(viejo)
+            for paises in ciudad_paises.values():
+                if viejo in paises:
+                    paises[paises.index(viejo)] = nuevo
+
+        self._cargar_paises(os.path.join(directorio, 'añadirCosas.csv'))
+        self._cargar_atractivos(os.path.join(directorio, 'atractivos_FINALES.csv'))
+        self._cargar_ciudades(os.path.join(directorio, 'ciudades.csv'))
+        self.perfiles_paises.refrescar(
+            PerfilPais(
+                pais=pais,
+                localizacion=p.get('localizacion'),
+                coste_vida=p.get('coste_vida'),
+                ambiente_fiesta=p.get('ambiente_fiesta'),
+                comidas_tipicas=p.get('comidas_tipicas'),
+                temperatura=p.get('temp_media_anual'),
+                edad_media=p.get('edad_media'),
+                atractivos_destacados=self.atractivos_por_pais.get(pais, ())[:TOP_ATRACTIVOS],
+            )
+            for pais, p in self.paises.items()
+        )
+
+        self.ubicaciones = {
+            uni: tuple((ciudad, pais) for ciudad in ciudades for pais in ciudad_paises[ciudad])
+            for uni, ciudades in uni_ciudades.items()
+        }
+
+        self.ofertas_por_carrera = {}
+        for (carrera, uni), rels in ofertas.items():
+            filas = self.ofertas_por_carrera.setdefault(carrera, [])
+            for plazas, meses, cert, nivel in rels:
+                for ciudad, pais in self.ubicaciones[uni]:
+                    filas.append((uni, ciudad, pais, plazas, meses, cert, nivel))
+        self.ofertas_por_carrera = {c: tuple(f) for c, f in self.ofertas_por_carrera.items()}
+
+    def _cargar_dataset(self, ruta):
+        # (carrera, universidad) -> [[plazas, meses, cert, nivel], ...]
+        ofertas = {}
+        uni_ciudades = {}
+        ciudad_paises = {}
+
+        with open(ruta, encoding='utf-8-sig', newline='') as f:
+            for row in csv.DictReader(f):
+                carrera = _std(row['carrera'])
+                uni = _std(row['universidad_destino'])
+                pais = _std(row['pais_destino'])
+                ciudad = _std(row['ciudad_destino'])
+
+                self.universidades[uni] = {
+                    'ranking_uni': _a_entero(row['ranking_uni']),
+                    'exchange_score': _a_real(row['exchange_score']),
+                }
+                self.paises.setdefault(pais, {})
+                self.ciudades.setdefault(ciudad, {'poblacion': None})
+
+                paises = ciudad_paises.setdefault(ciudad, [])
+                if pais not in paises:
+                    paises.append(pais)
+                ciudades = uni_ciudades.setdefault(uni, [])
+                if ciudad not in ciudades:
+                    ciudades.append(ciudad)
+
+                # MERGE de OFERTA por (plazas, meses): relaciones distintas si cambian
+                rels = ofertas.setdefault((carrera, uni), [])
+                clave = (_a_entero(row['plazas']), _a_entero(row['meses']))
+                if not any((r[0], r[1]) == clave for r in rels):
+                    rels.append([clave[0], clave[1], None, None])
+
+                # SET posterior de cert/nivel sobre todas las OFERTA del par
+                for rel in rels:
+                    rel[2] = (row['cert_idioma'] or '').strip()
+                    rel[3] = (row['nivel_idioma'] or '').strip()
+
+        return ofertas, uni_ciudades, ciudad_paises
+
+    def _indice_paises(self):
+        """Nombre plegado -> nombre en el catálogo, para cruzar 'Turquía' con 'turquia'"""
+        return {plegar_acentos(_std(p)): p for p in self.paises}
+
+    def _cargar_paises(self, ruta):
+        paises = self._indice_paises()
+        with open(ruta, encoding='utf-8-sig', newline='') as f:
+            for row in csv.DictReader(f, delimiter=';'):
+                pais = paises.get(plegar_acentos(_std(row['pais_destino'])))
+                if pais is None:
+                    continue
+                self.paises[pais] = {
+                    'localizacion': _std(row['localizacion_pais']),
+                    'moneda': row['moneda'].strip(),
+                    'capital': row['capital'].strip(),
+                    'coste_vida': row['coste_vida'].strip(),
+                    'comidas_tipicas': row['comidas_tipicas'].strip(),
+                    'ambiente_fiesta': row['ambiente_fiesta'].strip(),
+                    'poblacion_total': _a_entero(row['poblacion']),
+                    'temp_media_anual': _a_real(row['temp_med']),
+                    'edad_media': _a_real(row['edad_media']),
+                }
+
+    def _cargar_atractivos(self, ruta):
+        por_pais = {}
+        paises = self._indice_paises()
+        with open(ruta, encoding='utf-8-sig', newline='') as f:
+            for row in csv.DictReader(f):
+                pais = paises.get(plegar_acentos(_std(row['pais_destino'])))
+                if pais is None:
+                    continue
+                nombre = (row['Atraccion'] or '').strip()
+                self.atractivos[nombre] = Atractivo(
+                    nombre=nombre,
+                    rating=_a_real(row['rating']),
+                    categorias=[c.replace('"', '').strip()
+                                for c in (row['categoria'] or '').lower().split(',')],
+                    descripcion=(row['descripcion'] or '').strip(),
+                    visitantes=_a_entero(row['turistas_anuales']),
+                )
+                nombres = por_pais.setdefault(pais, [])
+                if nombre not in nombres:
+                    nombres.append(nombre)
+
+        # ORDER BY a.rating DESC: en Cypher los nulos van primero en orden descendente
+        self.atractivos_por_pais = {
+            pais: tuple(sorted(
+                (self.atractivos[n] for n in nombres),
+                key=lambda a: (a.rating is not None, -(a.rating or 0))
+            ))
+            for pais, nombres in por_pais.items()
+        }
+        self.perfiles.refrescar({
+            pais: [a.categorias for a in atractivos]
+            for pais, atractivos in self.atractivos_por_pais.items()
+        })
+
+    def _cargar_ciudades(self, ruta):
+        """Población de las ciudades (opcional, no forma parte de los CSV base)"""
+        if not os.path.exists(ruta):
+            return
+        with open(ruta, encoding='utf-8-sig', newline='') as f:
+            for row in csv.DictReader(f):
+                ciudad = _std(row['ciudad'])
+                if ciudad in self.ciudades:
+                    self.ciudades[ciudad]['poblacion'] = _a_entero(row['poblacion'])
+
+
+def _puntos_pais(p, caracteristicas):
+    """Mismos puntos que PUNTOS_PAIS_CYPHER (coste, fiesta, edad)"""
+    return puntos_pais(p.get('coste_vida'), p.get('ambiente_fiesta'), p.get('edad_media'), caracteristicas)
+
+
+class MemoriaQueryEngine(BaseQueryEngine):
+    """
+    Motor compatible con CypherQueryEngine que responde las mismas consultas
+    (cuestionario e intenciones) sobre un CatalogoMemoria, sin base de datos.
+    """
+
+    def __init__(self, catalogo):
+        from motor_puntuacion import MotorPuntuacion
+        self.catalogo = catalogo
+        self.motor = MotorPuntuacion.desde_catalogo(catalogo)
+        super().__init__(callback_manager=CallbackManager())
+
+    def _get_prompt_modules(self):
+        return {}
+
+    async def _aquery(self, query_bundle):
+        return self._query(query_bundle)
+
+    def _query(self, query_bundle):
+        try:
+            llm_params = json.loads(query_bundle.query)
+        except json.JSONDecodeError:
+            return json.dumps({"error": "JSON inválido"})
+
+        carrera_input = llm_params.get("carrera", "").lower()
+        if not carrera_input:
+            return json.dumps({"error": "Falta carrera"})
+
+        resultados = self.buscar(
+            carrera_input,
+            llm_params.get("certificados"),
+            llm_params.get("tamano_ciudad"),
+            llm_params.get("region_europa"),
+            llm_params.get("preferencia_clima"),
+        )
+        return json.dumps([r.a_dict() for r in resultados], indent=2, ensure_ascii=False)
+
+    def buscar(self, carrera, certificados, tamano_ciudad, region_europa, preferencia_clima):
+        """Etapa 1: ofertas de la carrera filtradas por idioma y puntuadas por preferencias (list de Destino)"""
+        cat = self.catalogo
+        ofertas, bases = self.motor.puntuar_perfil(carrera, certificados, tamano_ciudad, region_europa,
+                                                   preferencia_clima)
+        filas = self.motor.filas_ofertas.get(carrera, ())
+
+        resultados = []
+        for oferta, base in zip(ofertas.tolist(), bases.tolist()):
+            uni, ciudad, pais, plazas, meses, cert, nivel = filas[oferta]
+            p = cat.paises.get(pais, {})
+            resultados.append(Destino(
+                universidad=uni,
+                id_universidad=uni,
+                pais=pais,
+                localizacion_pais=p.get('localizacion'),
+                temperatura_media=p.get('temp_media_anual'),
+                ciudad=ciudad,
+                poblacion=cat.ciudades[ciudad]['poblacion'],
+                plazas_disponibles=plazas,
+                duracion_meses=meses,
+                certificado_obligatorio=cert,
+                nivel_requerido=nivel,
+                puntuacion_compuesta=None if math.isnan(base) else base,
+            ))
+        return resultados
+
+    def perfiles_categorias(self):
+        return self.catalogo.perfiles
+
+    def perfiles_paises(self):
+        return self.catalogo.perfiles_paises
+
+    def buscar_por_intenciones(self, universidades, intenciones):
+        """Etapa 2: mismos datos y puntuación que CypherQueryEngine.buscar_por_intenciones (list de Candidato)"""
+        cat = self.catalogo
+        mascara = mascara_de_categorias(intenciones['categorias_atractivos'])
+        caracteristicas = intenciones['caracteristicas_pais']
+
+        resultados = []
+        for uni in dict.fromkeys(universidades):
+            for ciudad, pais in cat.ubicaciones.get(uni, ()):
+                puntos = (_puntos_pais(cat.paises.get(pais, {}), caracteristicas)
+                          + cat.perfiles.obtener(pais).puntos_presencia(mascara))
+                resultados.append(self._candidato(uni, ciudad, pais, puntos))
+        return resultados
+
+    def buscar_recomendacion(self, destinos, intenciones, k=5, precarga=None):
+        """
+        Etapa 2 y TOP k en una pasada vectorizada (MotorPuntuacion), con el
+        mismo resultado que CONSULTA_RECOMENDACION ('precarga' siempre es
+        None: ver precargar_candidatos)
+        """
+        bases = {}
+        for d in destinos:
+            if d.universidad in self.motor.indice_universidad:
+                bases.setdefault(d.universidad, d.puntuacion_compuesta)
+
+        top = self.motor.top_k(
+            [self.motor.indice_universidad[uni] for uni in bases],
+            [math.nan if base is None else base for base in bases.values()],
+            intenciones, k
+        )
+        resultados = []
+        for ubicacion, _, puntos, total in top:
+            uni, ciudad, pais = self.motor.ubicaciones[ubicacion]
+            candidato = self._candidato(uni, ciudad, pais, puntos)
+            candidato.puntuacion_base = bases[uni]
+            candidato.puntuacion_total = total
+            resultados.append(candidato)
+        return resultados
+
+    def precargar_candidatos(self, destinos):
+        """Sin base de datos no hay nada que traer por adelantado"""
+        return None
+
+    def _candidato(self, uni, ciudad, pais, puntos):
+        candidato = Candidato(
+            universidad=uni,
+            pais=pais,
+            ciudad=ciudad,
+            poblacion=self.catalogo.ciudades[ciudad]['poblacion'],
+            puntos_caracteristicas=puntos,
+        )
+        return self.catalogo.perfiles_paises.completar([candidato])[0]
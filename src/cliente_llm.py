@@ -0,0 +1,177 @@
+"""
+Cliente LLM (Groq Llama-3) asíncrono y compartido por todas las sesiones
+
+Límites configurables con variables de entorno (opcionales):
+    ERASMAI_LLM_CONCURRENCIA  generaciones en vuelo a la vez (100)
+    ERASMAI_LLM_CONEXIONES    conexiones máximas del pool httpx (100)
+Por defecto son los del cliente síncrono de Groq (100 conexiones), así que
+el semáforo no frena por debajo de lo que ya se conseguía antes.
+"""
+
+import asyncio
+import os
+import queue
+import threading
+import time
+
+import httpx
+from groq import AsyncGroq
+
+from metricas import LLM_LATENCIA, LLM_PRIMER_TOKEN, LLM_TOKENS
+
+
+MODELO_POR_DEFECTO = "llama-3.1-8b-instant"
+MAX_CONCURRENCIA = int(os.getenv("ERASMAI_LLM_CONCURRENCIA", "100"))
+MAX_CONEXIONES = int(os.getenv("ERASMAI_LLM_CONEXIONES", "100"))
+
+
+class Response:
+    def __init__(self, text):
+        self.text = text
+
+
+class GroqLLM:
+    """
+    Cliente de Groq con un único bucle asyncio en un hilo de fondo.
+
+    Todas las peticiones del proceso (de cualquier sesión o hilo) pasan por
+    ese bucle, que mantiene un pool httpx con conexiones keep-alive y un
+    semáforo que limita cuántas generaciones hay en vuelo a la vez.
+    complete() y stream_complete() son envoltorios síncronos sobre
+    acomplete() y astream_complete(); todos admiten un mensaje de sistema
+    opcional además del prompt.
+    """
+
+    def __init__(self, api_key=None, model=MODELO_POR_DEFECTO, base_url=None,
+                 max_concurrencia=None, max_conexiones=None, timeout=60.0):
+        max_concurrencia = max_concurrencia or MAX_CONCURRENCIA
+        max_conexiones = max_conexiones or MAX_CONEXIONES
+        self.model = model
+        self.max_concurrencia = max_concurrencia
+
+        self._loop = asyncio.new_event_loop()
+        self._hilo = threading.Thread(target=self._loop.run_forever, name="erasmai-llm", daemon=True)
+        self._hilo.start()
+
+        async def _crear():
+            http_client = httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=max_conexiones,
+                    max_keepalive_connections=max_conexiones,
+                    keepalive_expiry=30.0
+                ),
+                timeout=timeout
+            )
+            cliente = AsyncGroq(
+                api_key=api_key or os.getenv("GROQ_API_KEY"),
+                base_url=base_url,
+                http_client=http_client
+            )
+            return cliente, asyncio.Semaphore(max_concurrencia)
+
+        self.client, self._semaforo = self._ejecutar(_crear())
+
+    def _ejecutar(self, corrutina):
+        return asyncio.run_coroutine_threadsafe(corrutina, self._loop).result()
+
+    def _mensajes(self, prompt, sistema=None):
+        mensajes = [{"role": "system", "content": sistema}] if sistema else []
+        return mensajes + [{"role": "user", "content": prompt}]
+
+    @staticmethod
+    def _contar_tokens(uso):
+        if uso is not None:
+            LLM_TOKENS.inc(uso.prompt_tokens or 0, tipo="entrada")
+            LLM_TOKENS.inc(uso.completion_tokens or 0, tipo="salida")
+
+    async def _acomplete(self, prompt, sistema=None):
+        async with self._semaforo:
+            inicio = time.perf_counter()
+            completion = await self.client.chat.completions.create(
+                model=self.model,
+                messages=self._mensajes(prompt, sistema),
+                temperature=0.7,
+                max_tokens=1500
+            )
+            LLM_LATENCIA.observar(time.perf_counter() - inicio, modo="completo")
+        self._contar_tokens(completion.usage)
+        return Response(completion.choices[0].message.content)
+
+    async def acomplete(self, prompt, sistema=None):
+        """Versión asíncrona de complete(), utilizable desde cualquier bucle de eventos"""
+        futuro = asyncio.run_coroutine_threadsafe(self._acomplete(prompt, sistema), self._loop)
+        return await asyncio.wrap_future(futuro)
+
+    def complete(self, prompt, sistema=None):
+        return self._ejecutar(self._acomplete(prompt, sistema))
+
+    async def _astream(self, prompt, entregar, sistema=None):
+        async with self._semaforo:
+            inicio = time.perf_counter()
+            primero = True
+            stream = await self.client.chat.completions.create(
+                model=self.model,
+                messages=self._mensajes(prompt, sistema),
+                temperature=0.7,
+                max_tokens=1500,
+                stream=True
+            )
+            async for chunk in stream:
+                # Groq envía el uso de tokens en el último trozo (x_groq.usage)
+                self._contar_tokens(getattr(getattr(chunk, 'x_groq', None), 'usage', None))
+                texto = chunk.choices[0].delta.content if chunk.choices else None
+                if texto:
+                    if primero:
+                        LLM_PRIMER_TOKEN.observar(time.perf_counter() - inicio)
+                        primero = False
+                    entregar(texto)
+            LLM_LATENCIA.observar(time.perf_counter() - inicio, modo="stream")
+
+    async def astream_complete(self, prompt, sistema=None):
+        """Versión asíncrona de stream_complete(): generador asíncrono de trozos"""
+        bucle = asyncio.get_running_loop()
+        cola = asyncio.Queue()
+        fin = object()
+
+        async def _producir():
+            try:
+                await self._astream(prompt, lambda t: bucle.call_soon_threadsafe(cola.put_nowait, t), sistema)
+            finally:
+                bucle.call_soon_threadsafe(cola.put_nowait, fin)
+
+        futuro = asyncio.wrap_future(asyncio.run_coroutine_threadsafe(_producir(), self._loop))
+        try:
+            while (trozo := await cola.get()) is not fin:
+                yield trozo
+            await futuro
+        finally:
+            # si el consumidor deja de leer, la generación se cancela y libera el semáforo
+            futuro.cancel()
+
+    def stream_complete(self, prompt, sistema=None):
+        """
+        Genera la respuesta trozo a trozo según llega de la API. Si el
+        generador se cierra antes de terminar (p. ej. un rerun de Streamlit),
+        la petición se cancela y libera su plaza del semáforo.
+        """
+        cola = queue.Queue()
+        fin = object()
+
+        async def _producir():
+            try:
+                await self._astream(prompt, cola.put, sistema)
+            finally:
+                cola.put(fin)
+
+        futuro = asyncio.run_coroutine_threadsafe(_producir(), self._loop)
+        try:
+            while (trozo := cola.get()) is not fin:
+                yield trozo
+            futuro.result()
+        finally:
+            futuro.cancel()
+
+    def cerrar(self):
+        self._ejecutar(self.client.close())
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._hilo.join()
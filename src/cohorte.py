@@ -0,0 +1,280 @@
+"""
+Modo cohorte: recomendaciones por lotes para toda una promoción de estudiantes
+
+Uso:
+    python src/cohorte.py perfiles.csv recomendaciones.jsonl [--procesos 4] [--llm 8] [--sin-llm]
+
+La entrada es un CSV o JSONL con las columnas id (opcional), carrera,
+certificados, tamano_ciudad, region, clima y descripcion, con las mismas
+respuestas que admite el chat ("B2 de inglés", "pequeña", "sur", "frio"...).
+La salida se escribe línea a línea; si se vuelve a lanzar con el mismo
+fichero de salida, los estudiantes ya terminados se saltan y los que
+fallaron en el LLM se reintentan (queda un solo registro por estudiante).
+"""
+
+import argparse
+import asyncio
+import contextlib
+import csv
+import io
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import indice_bm25
+from catalogo_memoria import CatalogoMemoria, MemoriaQueryEngine
+from intenciones_matcher import extraer_intenciones
+from rag_funciones import anadir_relevancia_texto, buscar_recomendacion, construir_prompt_recomendacion
+from recomendadorErasmus import (
+    validar_carrera, extraer_certificados, construir_preferencias,
+    TAMANOS_CIUDAD, REGIONES_VALIDAS, CLIMAS
+)
+
+
+# ========================================
+# ENTRADA / SALIDA
+# ========================================
+
+def leer_perfiles(ruta):
+    """Lee un CSV o JSONL de perfiles; sin columna id se usa el número de fila"""
+    with open(ruta, encoding='utf-8-sig', newline='') as f:
+        if ruta.endswith('.jsonl'):
+            perfiles = [json.loads(linea) for linea in f if linea.strip()]
+        else:
+            perfiles = list(csv.DictReader(f))
+    for n, perfil in enumerate(perfiles, 1):
+        perfil['id'] = str(perfil.get('id') or n)
+    return perfiles
+
+
+def ya_procesados(ruta_salida):
+    """
+    Ids ya resueltos en una salida anterior. Antes de reanudar compacta el
+    fichero para que quede un solo registro por id: recorta la última línea
+    si quedó a medias (ejecución interrumpida), se queda con el último
+    registro de cada id y quita los que fallaron en el LLM, que se reintentan
+    y se vuelven a escribir al final.
+    """
+    if not os.path.exists(ruta_salida):
+        return set()
+    with open(ruta_salida, 'rb') as f:
+        contenido = f.read()
+    completo = contenido[:contenido.rfind(b'\n') + 1]
+    lineas = completo.decode('utf-8').splitlines()
+
+    ultimos = {}
+    for linea in lineas:
+        registro = json.loads(linea)
+        ultimos[registro['id']] = (registro, linea)
+    hechos = {id_: linea for id_, (registro, linea) in ultimos.items() if registro.get('estado') != 'error_llm'}
+
+    if len(hechos) != len(lineas) or completo != contenido:
+        temporal = ruta_salida + '.tmp'
+        with open(temporal, 'w', encoding='utf-8') as f:
+            f.writelines(linea + '\n' for linea in hechos.values())
+        os.replace(temporal, ruta_salida)
+    return set(hechos)
+
+
+def normalizar_perfil(perfil):
+    """
+    Traduce las respuestas del perfil a los valores internos del asistente
+
+    Raises:
+        ValueError: si la carrera o alguna respuesta no es válida
+    """
+    carrera, _ = validar_carrera(perfil.get('carrera') or '')
+    if not carrera:
+        raise ValueError(f"Carrera no reconocida: {perfil.get('carrera')!r}")
+
+    certificados = perfil.get('certificados')
+    if not isinstance(certificados, list):
+        certificados = extraer_certificados(certificados or 'no')
+        if certificados is None:
+            raise ValueError(f"Certificados no reconocidos: {perfil.get('certificados')!r}")
+
+    def opcion(campo, valores):
+        texto = (perfil.get(campo) or '').lower().strip()
+        if texto and texto not in valores:
+            raise ValueError(f"Valor no válido para {campo}: {texto!r}")
+        return valores.get(texto)
+
+    return {
+        'carrera': carrera,
+        'certificados': certificados,
+        'tamano_ciudad': opcion('tamano_ciudad', TAMANOS_CIUDAD),
+        'region_europa': opcion('region', REGIONES_VALIDAS),
+        'preferencia_clima': opcion('clima', CLIMAS),
+        'descripcion': perfil.get('descripcion') or '',
+    }
+
+
+# ========================================
+# TRABAJADORES (etapas 1 y 2)
+# ========================================
+
+# Catálogo e índice de texto de solo lectura del proceso. Se cargan en el proceso
+# principal antes de crear el pool, así los trabajadores creados con fork los
+# heredan sin copiarlos (el índice es un mmap: todos comparten sus páginas)
+_motor = None
+_indice = None
+
+
+def _iniciar_trabajador():
+    global _motor, _indice
+    if _motor is None:
+        _motor = MemoriaQueryEngine(CatalogoMemoria.desde_directorio())
+    if _indice is None:
+        _indice = indice_bm25.desde_directorio()
+
+
+def puntuar_perfil(perfil):
+    """Etapas 1 y 2 de un estudiante; se ejecuta en un proceso del pool"""
+    resultado = {'id': perfil['id'], 'carrera': perfil.get('carrera')}
+    try:
+        datos = normalizar_perfil(perfil)
+    except ValueError as e:
+        return {**resultado, 'estado': 'error', 'error': str(e)}
+
+    intenciones = anadir_relevancia_texto(extraer_intenciones(datos['descripcion']), datos['descripcion'], _indice)
+    with contextlib.redirect_stdout(io.StringIO()):
+        destinos = _motor.buscar(
+            datos['carrera'], datos['certificados'], datos['tamano_ciudad'],
+            datos['region_europa'], datos['preferencia_clima']
+        )
+        candidatos = buscar_recomendacion(_motor, destinos, intenciones) if destinos else []
+
+    if not candidatos:
+        return {**resultado, 'estado': 'sin_destinos', 'carrera': datos['carrera']}
+    return {
+        **resultado,
+        'estado': 'ok',
+        'carrera': datos['carrera'],
+        'descripcion': datos['descripcion'],
+        'intenciones': intenciones,
+        'preferencias': construir_preferencias(
+            datos['certificados'], datos['tamano_ciudad'], datos['region_europa'], datos['preferencia_clima']
+        ),
+        'candidatos': candidatos,
+    }
+
+
+# ========================================
+# COORDINACIÓN (pool + cola LLM + escritura)
+# ========================================
+
+def _registro(resultado, recomendacion=None):
+    registro = {k: v for k, v in resultado.items() if k not in ('candidatos', 'descripcion', 'preferencias')}
+    if 'candidatos' in resultado:
+        registro['candidatos'] = [
+            {'Universidad': c.universidad, 'Ciudad': c.ciudad, 'Pais': c.pais,
+             'PuntuacionTotal': c.puntuacion_total}
+            for c in resultado['candidatos']
+        ]
+        registro['destino'] = registro['candidatos'][0]['Universidad']
+    if recomendacion is not None:
+        registro['recomendacion'] = recomendacion
+    return registro
+
+
+async def _recomendar(resultado, llm, cache):
+    argumentos = (resultado['descripcion'], resultado['candidatos'],
+                  resultado['intenciones'], resultado['preferencias'])
+    if cache is not None:
+        texto = cache.obtener(*argumentos)
+        if texto is not None:
+            return texto
+    prompt = construir_prompt_recomendacion(*argumentos)
+    respuesta = await llm.acomplete(prompt.usuario, sistema=prompt.sistema)
+    if cache is not None:
+        cache.guardar(*argumentos, respuesta.text)
+    return respuesta.text
+
+
+async def procesar_cohorte(perfiles, ruta_salida, procesos=None, concurrencia_llm=8, recursos=None):
+    """
+    Etapas 1 y 2 en un pool de procesos y generación con el LLM a través de
+    una cola acotada con 'concurrencia_llm' consumidores. Cada estudiante se
+    escribe en cuanto termina. Sin 'recursos' solo se calculan los candidatos.
+
+    El LLM (que arranca su propio hilo) se crea después de lanzar los
+    trabajadores, para no hacer fork de un proceso con hilos.
+
+    Returns:
+        dict estado -> número de estudiantes
+    """
+    bucle = asyncio.get_running_loop()
+    cola = asyncio.Queue(maxsize=concurrencia_llm * 2)
+    recuento = {}
+    fin = object()
+
+    with open(ruta_salida, 'a', encoding='utf-8') as salida:
+
+        def escribir(registro):
+            salida.write(json.dumps(registro, ensure_ascii=False) + '\n')
+            salida.flush()
+            recuento[registro['estado']] = recuento.get(registro['estado'], 0) + 1
+            print(f"{'✅' if registro['estado'] == 'ok' else '⚠️'} [{sum(recuento.values())}/{len(perfiles)}] "
+                  f"{registro['id']}: {registro.get('destino') or registro.get('error') or registro['estado']}")
+
+        async def consumidor():
+            while (resultado := await cola.get()) is not fin:
+                if resultado['estado'] != 'ok' or llm is None:
+                    escribir(_registro(resultado))
+                    continue
+                try:
+                    escribir(_registro(resultado, await _recomendar(resultado, llm, cache)))
+                except Exception as e:
+                    escribir({**_registro(resultado), 'estado': 'error_llm', 'error': str(e)})
+
+        _iniciar_trabajador()
+        contexto = multiprocessing.get_context('fork') if 'fork' in multiprocessing.get_all_start_methods() else None
+        with ProcessPoolExecutor(procesos, mp_context=contexto, initializer=_iniciar_trabajador) as pool:
+            pendientes = [bucle.run_in_executor(pool, puntuar_perfil, perfil) for perfil in perfiles]
+            llm = cache = None
+            if recursos is not None:
+                llm, cache = recursos.llm, recursos.cache
+            consumidores = [asyncio.create_task(consumidor()) for _ in range(concurrencia_llm)]
+            for terminado in asyncio.as_completed(pendientes):
+                await cola.put(await terminado)
+
+        for _ in consumidores:
+            await cola.put(fin)
+        await asyncio.gather(*consumidores)
+
+    return recuento
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Recomendaciones Erasmus por lotes")
+    parser.add_argument('entrada', help="CSV o JSONL con los perfiles")
+    parser.add_argument('salida', help="JSONL de resultados (se reanuda si existe)")
+    parser.add_argument('--procesos', type=int, default=None, help="procesos para las etapas 1 y 2")
+    parser.add_argument('--llm', type=int, default=8, help="peticiones simultáneas al LLM")
+    parser.add_argument('--sin-llm', action='store_true', help="solo candidatos, sin texto del LLM")
+    args = parser.parse_args(argv)
+
+    perfiles = leer_perfiles(args.entrada)
+    hechos = ya_procesados(args.salida)
+    pendientes = [p for p in perfiles if p['id'] not in hechos]
+    print(f"🎓 {len(perfiles)} perfiles, {len(hechos)} ya procesados, {len(pendientes)} pendientes")
+    if not pendientes:
+        return
+
+    recursos = None
+    if not args.sin_llm:
+        from recursos import obtener_recursos
+        recursos = obtener_recursos()
+
+    inicio = time.perf_counter()
+    recuento = asyncio.run(procesar_cohorte(pendientes, args.salida, args.procesos, args.llm, recursos))
+    if recursos is not None:
+        recursos.cerrar()
+    print(f"\n✅ Cohorte terminada en {time.perf_counter() - inicio:.1f} s: {recuento}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,196 @@
+"""
+Plantillas Cypher fijas y parametrizadas para el motor de búsqueda.
+
+Todo lo que depende del usuario viaja como $parámetro, de modo que el texto
+de cada consulta es siempre el mismo y Neo4j reutiliza el plan en caché.
+"""
+
+from acceso_neo4j import leer
+from intenciones_matcher import PUNTOS_PAIS_CYPHER
+
+
+# ========================================
+# ETAPA 1: CUESTIONARIO
+# ========================================
+
+CONSULTA_DESTINOS = """
+    MATCH (c:Carrera {nombre: $carrera_input})
+        -[o:OFERTA]->(u:Universidad)
+    MATCH (u)-[:SITUADA_EN]->(l:Ciudad)-[:UBICADA_EN]->(p:Pais)
+    WHERE toInteger(o.numero_de_plazas) > 0
+      AND ($modo_idioma = 'todos'
+           OR o.cert_obligatorio = 'NO'
+           OR ($modo_idioma = 'certificados'
+               AND o.cert_obligatorio = 'SI'
+               AND any(i IN range(0, size(coalesce(o.idiomas_requeridos, [])) - 1)
+                       WHERE $niveles[o.idiomas_requeridos[i]] >= o.niveles_requeridos[i])))
+    WITH u, o, p, l,
+        ((toFloat(686 - u.ranking_uni)*0.1) + (u.exchange_score * 0.2)
+         + (CASE
+                WHEN $tamano_ciudad = 'grande' AND l.poblacion >= 156000 THEN 70
+                WHEN $tamano_ciudad = 'pequena' AND l.poblacion < 156000 THEN 70
+                ELSE 0 END)
+         + (CASE WHEN p.localizacion = $region_europa THEN 70 ELSE 0 END)
+         + (CASE
+                WHEN $preferencia_clima = 'frio' AND p.temp_media_anual < 11.4 THEN 50
+                WHEN $preferencia_clima = 'calor' AND p.temp_media_anual >= 11.4 THEN 50
+                ELSE 0 END)) AS PuntuacionCompuesta
+    RETURN DISTINCT u.nombre AS Universidad,
+           id(u) AS Id_Universidad,
+           p.nombre AS Pais,
+           p.localizacion AS Localizacion_Pais,
+           p.temp_media_anual AS Temperatura_Media,
+           l.nombre AS Ciudad,
+           l.poblacion AS Poblacion,
+           o.numero_de_plazas AS Plazas_Disponibles,
+           o.duracion_de_estancia AS Duracion_Meses,
+           o.cert_obligatorio AS Certificado_Obligatorio,
+           o.nivel_requerido AS Nivel_Requerido,
+           PuntuacionCompuesta
+    ORDER BY PuntuacionCompuesta DESC
+"""
+
+
+def parametros_busqueda(carrera, certificados, niveles, tamano_ciudad, region_europa, preferencia_clima):
+    """
+    Traduce el perfil del cuestionario a los parámetros de CONSULTA_DESTINOS
+
+    Args:
+        certificados: "NO", lista de certificados o None
+        niveles: dict idioma (normalizado, sin tildes) -> mayor nivel
+            certificado en ese idioma (NIVEL_MAPA). Una OFERTA con
+            certificado obligatorio se acepta si alguna de sus alternativas
+            (idiomas_requeridos/niveles_requeridos, interpretadas en la
+            carga) tiene un certificado de nivel suficiente.
+    """
+    if certificados == "NO":
+        modo_idioma = 'sin_certificados'
+    elif isinstance(certificados, list) and certificados:
+        modo_idioma = 'certificados'
+    else:
+        modo_idioma = 'todos'
+
+    return {
+        'carrera_input': carrera,
+        'modo_idioma': modo_idioma,
+        'niveles': {idioma: nivel for idioma, nivel in niveles.items() if idioma},
+        'tamano_ciudad': tamano_ciudad,
+        'region_europa': region_europa or None,
+        'preferencia_clima': preferencia_clima,
+    }
+
+
+# ========================================
+# ETAPA 2: INTENCIONES
+# ========================================
+
+# Los datos del país y sus atractivos no viajan en cada fila: salen de
+# perfiles_paises (PerfilesPaises.completar), leídos una vez por país
+CONSULTA_INTENCIONES = f"""
+    MATCH (u:Universidad)-[:SITUADA_EN]->(l:Ciudad)-[:UBICADA_EN]->(p:Pais)
+    WHERE u.nombre IN $universidades
+
+    // Puntos por país (coste, fiesta, edad); los de atractivos se suman
+    // después con las máscaras de perfiles_categorias
+    RETURN u.nombre AS Universidad,
+           p.nombre AS Pais,
+           l.nombre AS Ciudad,
+           l.poblacion AS Poblacion,
+           ({PUNTOS_PAIS_CYPHER}) AS PuntosCaracteristicas
+"""
+
+
+# Etapas 1 y 2 en un solo viaje: recibe los ids de nodo de las universidades
+# de la etapa 1 con su puntuación base y los puntos de categorías ya calculados
+# por país (máscaras) y devuelve directamente el TOP k por puntuación total.
+# Como CONSULTA_INTENCIONES, sin datos del país ni atractivos (perfiles_paises)
+CONSULTA_RECOMENDACION = f"""
+    UNWIND $destinos AS d
+    MATCH (u:Universidad) WHERE id(u) = d.id
+    MATCH (u)-[:SITUADA_EN]->(l:Ciudad)-[:UBICADA_EN]->(p:Pais)
+    WITH u, l, p, d.base AS PuntuacionBase,
+         ({PUNTOS_PAIS_CYPHER}) + coalesce($puntos_categorias[p.nombre], 0) AS PuntosCaracteristicas
+    RETURN u.nombre AS Universidad,
+           p.nombre AS Pais,
+           l.nombre AS Ciudad,
+           l.poblacion AS Poblacion,
+           PuntosCaracteristicas,
+           PuntuacionBase,
+           coalesce(PuntuacionBase, 0) + PuntosCaracteristicas AS PuntuacionTotal
+    ORDER BY PuntuacionTotal DESC
+    LIMIT $k
+"""
+
+
+def parametros_recomendacion(destinos, puntos_pais, puntos_categorias, k=5):
+    """
+    Parámetros de CONSULTA_RECOMENDACION
+
+    Args:
+        destinos: list de Destino de la etapa 1 (ordenada por puntuación); de
+            cada universidad se usa la primera puntuación, como hacía el
+            flujo anterior de la etapa 2
+        puntos_pais: dict con $coste_bajo, $fiesta_alta y $ambiente_joven
+        puntos_categorias: dict pais -> puntos por categorías de atractivos
+    """
+    bases = {}
+    for d in destinos:
+        bases.setdefault(d.id_universidad, d.puntuacion_compuesta)
+    return {
+        'destinos': [{'id': i, 'base': base} for i, base in bases.items()],
+        'puntos_categorias': puntos_categorias,
+        'k': k,
+        **puntos_pais,
+    }
+
+
+# Una fila por país con sus datos, las categorías de todos sus atractivos por
+# rating descendente (máscaras de perfiles_categorias) y su TOP 10 completo
+# (perfiles_paises). Se lee una vez por proceso y tras recargar los datos
+CONSULTA_PERFILES_PAISES = """
+    MATCH (p:Pais)
+    OPTIONAL MATCH (p)-[:TIENE_ATRACTIVO]->(a:Atractivo)
+    WITH p, a
+    ORDER BY a.rating DESC
+    WITH p, collect(a) AS atractivos
+    RETURN p.nombre AS Pais,
+           p.localizacion AS Localizacion,
+           p.coste_vida AS Coste_Vida,
+           p.ambiente_fiesta AS Ambiente_Fiesta,
+           p.comidas_tipicas AS Comidas_Tipicas,
+           p.temp_media_anual AS Temperatura,
+           p.edad_media AS Edad_Media,
+           [a IN atractivos | a.categorias] AS Categorias,
+           [a IN atractivos[0..10] | {
+               nombre: a.nombre,
+               rating: a.rating,
+               categorias: a.categorias,
+               descripcion: a.descripcion,
+               visitantes: a.visitantes_anuales
+           }] AS Atractivos_Destacados
+"""
+
+
+# ========================================
+# CALENTAMIENTO DE PLANES
+# ========================================
+
+PLANTILLAS = {
+    'destinos': (CONSULTA_DESTINOS, parametros_busqueda('', None, {}, None, None, None)),
+    'intenciones': (CONSULTA_INTENCIONES, {
+        'universidades': [],
+        'coste_bajo': False, 'fiesta_alta': False, 'ambiente_joven': False,
+    }),
+    'recomendacion': (CONSULTA_RECOMENDACION, parametros_recomendacion(
+        [], {'coste_bajo': False, 'fiesta_alta': False, 'ambiente_joven': False}, {}
+    )),
+}
+
+
+def calentar_planes(driver, database):
+    """
+    Ejecuta cada plantilla una vez con parámetros vacíos para que Neo4j
+    compile y guarde su plan antes de la primera petición real.
+    """
+    for nombre, (consulta, parametros) in PLANTILLAS.items():
+        leer(driver, database, consulta, parametros, nombre=f"calentar.{nombre}")
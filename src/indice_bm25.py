@@ -0,0 +1,266 @@
+"""
+Índice BM25 sobre el texto de los atractivos (nombre, categorías y descripción)
+
+Da a cada país una relevancia para la descripción libre del estudiante, para
+lo que no cubren las categorías fijas de intenciones_matcher ("auroras
+boreales", "fiordos"). Se construye desde los CSV al cargar los datos y se
+guarda en un fichero binario que se abre con mmap: los arrays se leen tal
+cual (sin deserializar) y varios procesos comparten las mismas páginas.
+
+Formato (little endian, secciones alineadas a 4 bytes):
+    cabecera          MAGIA, versión de los datos y tamaños (CABECERA)
+    terminos          uint32[n_terminos + 1] desplazamientos + bytes de los términos ordenados
+    postings_inicio   uint32[n_terminos + 1]
+    postings_doc      uint16[n_postings]     documento (atractivo)
+    postings_peso     float32[n_postings]    peso BM25 ya calculado (idf · tf saturado)
+    paises_inicio     uint32[n_paises + 1]   primer documento de cada país (agrupados)
+    paises            uint32[n_paises + 1] desplazamientos + bytes de los nombres
+"""
+
+import math
+import mmap
+import os
+import re
+import struct
+
+import numpy as np
+
+from cache_recomendaciones import DATA_DIR, version_datos
+from intenciones_matcher import plegar_acentos
+from metricas import logger
+
+
+RUTA_POR_DEFECTO = os.path.join(DATA_DIR, "indice_atractivos.bm25")
+
+MAGIA = b"EBM25v1\0"
+CABECERA = struct.Struct("<8s16sIIII")  # magia, versión de datos, docs, términos, postings, países
+
+K1 = 1.2
+B = 0.75
+
+# Puntos para el país cuyo mejor atractivo alcanza SATURACION (una palabra
+# poco frecuente, como "fiordos", ronda 9); por debajo, proporcionales
+PUNTOS_TEXTO = 100
+SATURACION = 10.0
+
+_PALABRA = re.compile(r'[a-z0-9]+')
+
+PALABRAS_VACIAS = frozenset("""
+    a al algo algun alguna como con de del desde donde el ella en entre era es esta este esto
+    fue gran ha hay la las le lo los mas me mi mucha mucho muy ni no o para pero poco por que
+    quiero se ser si sin sobre su sus tambien te tener tiene todo tu un una uno unos y ya yo
+    busco gustaria destino lugar sitio ver hacer estar quisiera
+""".split())
+
+
+def raiz(palabra):
+    """Raíz mínima para el español: sin plural (-es/-s) ni vocal final de género"""
+    if len(palabra) > 4 and palabra.endswith('es') and palabra[-3] not in 'aeiou':
+        palabra = palabra[:-2]
+    elif len(palabra) > 3 and palabra.endswith('s'):
+        palabra = palabra[:-1]
+    if len(palabra) > 4 and palabra[-1] in 'ao':
+        palabra = palabra[:-1]
+    return palabra
+
+
+def terminos(texto):
+    """Términos del texto: plegado sin tildes, sin palabras vacías y reducido a raíces"""
+    return [raiz(p) for p in _PALABRA.findall(plegar_acentos(texto or '')) if p not in PALABRAS_VACIAS]
+
+
+def _alinear(datos):
+    return datos + b"\0" * (-len(datos) % 4)
+
+
+def _cadenas(textos):
+    codificados = [t.encode('utf-8') for t in textos]
+    desplazamientos = np.zeros(len(codificados) + 1, dtype='<u4')
+    desplazamientos[1:] = np.cumsum([len(c) for c in codificados])
+    return desplazamientos.tobytes() + _alinear(b"".join(codificados))
+
+
+# ========================================
+# CONSTRUCCIÓN
+# ========================================
+
+def documentos_desde_filas(filas):
+    """(pais, texto) de cada atractivo a partir de carga_datos.leer_filas()"""
+    atractivos = {a['nombre']: a['propiedades'] for a in filas['Atractivo']}
+    documentos = []
+    for rel in filas['TIENE_ATRACTIVO']:
+        a = atractivos[rel['atractivo']]
+        texto = " ".join([rel['atractivo'], " ".join(a.get('categorias') or []), a.get('descripcion') or ''])
+        documentos.append((rel['pais'], texto))
+    return documentos
+
+
+def construir(documentos, version=""):
+    """
+    Args:
+        documentos: lista de (pais, texto), uno por atractivo
+        version: versión de los datos de origen (se guarda en la cabecera)
+
+    Returns:
+        bytes con el índice en el formato del módulo
+    """
+    documentos = sorted(documentos, key=lambda d: d[0])
+    paises = sorted({pais for pais, _ in documentos})
+    if len(documentos) > np.iinfo(np.uint16).max:
+        raise ValueError(f"Demasiados documentos para el índice: {len(documentos)}")
+
+    frecuencias = [{} for _ in documentos]
+    longitudes = []
+    for doc, (_, texto) in enumerate(documentos):
+        terminos_doc = terminos(texto)
+        longitudes.append(len(terminos_doc))
+        for t in terminos_doc:
+            frecuencias[doc][t] = frecuencias[doc].get(t, 0) + 1
+    media = (sum(longitudes) / len(longitudes)) if longitudes else 1.0
+
+    postings = {}
+    for doc, tf in enumerate(frecuencias):
+        for t, n in tf.items():
+            postings.setdefault(t, []).append((doc, n))
+
+    n_docs = len(documentos)
+    vocabulario = sorted(postings, key=lambda t: t.encode('utf-8'))
+    inicio = np.zeros(len(vocabulario) + 1, dtype='<u4')
+    docs, pesos = [], []
+    for i, t in enumerate(vocabulario):
+        lista = postings[t]
+        idf = math.log(1 + (n_docs - len(lista) + 0.5) / (len(lista) + 0.5))
+        for doc, tf in lista:
+            norma = K1 * (1 - B + B * longitudes[doc] / media)
+            docs.append(doc)
+            pesos.append(idf * tf * (K1 + 1) / (tf + norma))
+        inicio[i + 1] = len(docs)
+
+    paises_inicio = np.zeros(len(paises) + 1, dtype='<u4')
+    indice_pais = {p: i for i, p in enumerate(paises)}
+    for pais, _ in documentos:
+        paises_inicio[indice_pais[pais] + 1] += 1
+    paises_inicio = np.cumsum(paises_inicio, dtype='<u4')
+
+    return b"".join([
+        CABECERA.pack(MAGIA, version.encode('ascii')[:16].ljust(16, b"\0"),
+                      n_docs, len(vocabulario), len(docs), len(paises)),
+        _cadenas(vocabulario),
+        inicio.tobytes(),
+        _alinear(np.array(docs, dtype='<u2').tobytes()),
+        np.array(pesos, dtype='<f4').tobytes(),
+        paises_inicio.tobytes(),
+        _cadenas(paises),
+    ])
+
+
+def guardar(datos, ruta=RUTA_POR_DEFECTO):
+    """Escribe el índice de forma atómica (los procesos que ya lo tienen abierto siguen con el anterior)"""
+    temporal = f"{ruta}.{os.getpid()}.tmp"
+    with open(temporal, 'wb') as f:
+        f.write(datos)
+    os.replace(temporal, ruta)
+
+
+# ========================================
+# CONSULTA
+# ========================================
+
+class IndiceBM25:
+    """Índice abierto sobre un buffer (mmap o bytes); las consultas no copian los arrays"""
+
+    def __init__(self, buffer):
+        self._buffer = buffer
+        magia, version, self.n_docs, n_terminos, n_postings, n_paises = CABECERA.unpack_from(buffer, 0)
+        if magia != MAGIA:
+            raise ValueError("No es un índice BM25 de ErasmAI")
+        self.version = version.rstrip(b"\0").decode('ascii')
+
+        posicion = CABECERA.size
+        self._terminos_desp, self._terminos, posicion = self._leer_cadenas(posicion, n_terminos)
+        self._inicio, posicion = self._array('<u4', n_terminos + 1, posicion)
+        self._docs, posicion = self._array('<u2', n_postings, posicion)
+        posicion += -posicion % 4
+        self._pesos, posicion = self._array('<f4', n_postings, posicion)
+        self._paises_inicio, posicion = self._array('<u4', n_paises + 1, posicion)
+        desplazamientos, blob, _ = self._leer_cadenas(posicion, n_paises)
+        self.paises = [bytes(blob[desplazamientos[i]:desplazamientos[i + 1]]).decode('utf-8')
+                       for i in range(n_paises)]
+
+    def _array(self, tipo, n, posicion):
+        array = np.frombuffer(self._buffer, dtype=tipo, count=n, offset=posicion)
+        return array, posicion + array.nbytes
+
+    def _leer_cadenas(self, posicion, n):
+        desplazamientos, posicion = self._array('<u4', n + 1, posicion)
+        fin = posicion + int(desplazamientos[-1])
+        blob = memoryview(self._buffer)[posicion:fin]
+        return desplazamientos, blob, fin + (-fin % 4)
+
+    @classmethod
+    def abrir(cls, ruta=RUTA_POR_DEFECTO):
+        with open(ruta, 'rb') as f:
+            return cls(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+
+    def __len__(self):
+        return self.n_docs
+
+    def _posicion(self, termino):
+        """Búsqueda binaria del término en el vocabulario ordenado (-1 si no está)"""
+        clave = termino.encode('utf-8')
+        desp, blob = self._terminos_desp, self._terminos
+        bajo, alto = 0, len(desp) - 2
+        while bajo <= alto:
+            medio = (bajo + alto) // 2
+            actual = blob[desp[medio]:desp[medio + 1]].tobytes()
+            if actual == clave:
+                return medio
+            if actual < clave:
+                bajo = medio + 1
+            else:
+                alto = medio - 1
+        return -1
+
+    def puntuaciones(self, texto):
+        """Puntuación BM25 de cada atractivo (array de n_docs)"""
+        total = np.zeros(self.n_docs, dtype=np.float32)
+        for termino in set(terminos(texto)):
+            i = self._posicion(termino)
+            if i >= 0:
+                inicio, fin = self._inicio[i], self._inicio[i + 1]
+                total[self._docs[inicio:fin]] += self._pesos[inicio:fin]
+        return total
+
+    def relevancia_por_pais(self, texto):
+        """País -> puntuación de su atractivo más relevante, solo los que tienen alguna coincidencia"""
+        total = self.puntuaciones(texto)
+        if not total.any():
+            return {}
+        maximos = np.maximum.reduceat(total, self._paises_inicio[:-1].astype(np.intp))
+        return {self.paises[i]: float(maximos[i]) for i in np.flatnonzero(maximos)}
+
+    def puntos_por_pais(self, texto):
+        """Puntos para la recomendación: PUNTOS_TEXTO al alcanzar SATURACION, proporcional por debajo"""
+        return {pais: round(PUNTOS_TEXTO * min(1.0, relevancia / SATURACION))
+                for pais, relevancia in self.relevancia_por_pais(texto).items()}
+
+
+def desde_directorio(directorio=DATA_DIR, ruta=None):
+    """
+    Índice de los CSV de 'directorio'. Abre el fichero guardado si corresponde
+    a la versión actual de los datos; si no, lo reconstruye y lo guarda.
+    """
+    ruta = ruta or os.path.join(directorio, os.path.basename(RUTA_POR_DEFECTO))
+    version = version_datos(directorio)
+    if os.path.exists(ruta):
+        try:
+            indice = IndiceBM25.abrir(ruta)
+            if indice.version == version:
+                return indice
+        except ValueError as e:
+            logger.warning("Índice BM25 ilegible (%s), se reconstruye", e)
+
+    from carga_datos import leer_filas
+    guardar(construir(documentos_desde_filas(leer_filas(directorio)), version), ruta)
+    logger.info("Índice BM25 de atractivos reconstruido en %s", ruta)
+    return IndiceBM25.abrir(ruta)
@@ -2,6 +2,10 @@
 Sistema de detección de intenciones y matching con categorías de Neo4j
 """
 
+import re
+import unicodedata
+from functools import lru_cache
+
 # ========================================
 # DICCIONARIO DE KEYWORDS → CATEGORÍAS
 # ========================================
@@ -59,6 +63,111 @@ KEYWORDS_PAIS = {
     ]
 }
 
+# ========================================
+# AUTÓMATA DE PALABRAS CLAVE
+# ========================================
+
+CATEGORIAS_ATRACTIVOS = {**KEYWORDS_EXPERIENCIA, **KEYWORDS_CULTURAL,
+                         **KEYWORDS_GEOGRAFIA, **KEYWORDS_CONSTRUCCION}
+
+# Características de país que se detectan (clave en KEYWORDS_PAIS -> clave en el resultado)
+CARACTERISTICAS_PAIS = {
+    'barato': 'coste_bajo',
+    'fiesta_alta': 'fiesta_alta',
+    'joven': 'ambiente_joven'
+}
+
+
+# Niveles del MCER de los certificados, comparables entre sí
+NIVEL_MAPA = {'A1': 1, 'A2': 2, 'B1': 3, 'B2': 4, 'C1': 5, 'C2': 6}
+
+
+def plegar_acentos(texto):
+    """Minúsculas y sin tildes ni diéresis (la ñ se pliega a n)"""
+    texto = texto.lower()
+    if texto.isascii():
+        return texto
+    return unicodedata.normalize('NFD', texto).encode('ascii', 'ignore').decode('ascii')
+
+
+_PALABRA = re.compile(r'\w+')
+
+
+@lru_cache(maxsize=65536)
+def _trocear(palabra_cruda):
+    """Palabras plegadas contenidas en un trozo de texto sin espacios ('playas,' -> ('playas',))"""
+    return tuple(_PALABRA.findall(plegar_acentos(palabra_cruda)))
+
+
+def _aparece(texto, palabra):
+    """True si 'palabra' aparece en 'texto' como palabra(s) completa(s), admitiendo plural en -s/-es"""
+    inicio = texto.find(palabra)
+    while inicio != -1:
+        fin = inicio + len(palabra)
+        if inicio == 0 or not texto[inicio - 1].isalnum():
+            for sufijo in ('', 's', 'es'):
+                if texto.startswith(sufijo, fin) and not texto[fin + len(sufijo):fin + len(sufijo) + 1].isalnum():
+                    return True
+        inicio = texto.find(palabra, inicio + 1)
+    return False
+
+
+class AutomataIntenciones:
+    """
+    Detector de palabras clave construido una sola vez.
+
+    Las palabras clave se pliegan (sin tildes) y se indexan: las de una
+    palabra en un dict forma -> etiquetas (con sus plurales en -s/-es) y las
+    compuestas por su primera palabra. El texto se trocea una vez en palabras
+    completas, así 'mar' no coincide con 'marketing' ni 'arte' con 'parte'.
+    Cada palabra distinta se pliega una sola vez (con caché entre llamadas),
+    las simples se resuelven con una intersección de conjuntos y las
+    compuestas solo se buscan si aparece su primera palabra.
+    """
+
+    def __init__(self, tablas):
+        """
+        Args:
+            tablas: dict etiqueta -> lista de palabras clave
+        """
+        self.simples = {}
+        self.compuestas = {}
+        for etiqueta, palabras in tablas.items():
+            for palabra in palabras:
+                partes = _trocear(palabra)
+                if len(partes) == 1:
+                    for forma in (partes[0], partes[0] + 's', partes[0] + 'es'):
+                        self.simples.setdefault(forma, set()).add(etiqueta)
+                else:
+                    variantes = self.compuestas.setdefault(partes[0], {})
+                    for variante in {' '.join(palabra.lower().split()), ' '.join(partes)}:
+                        variantes.setdefault(variante, set()).add(etiqueta)
+
+    def buscar(self, texto):
+        """Devuelve el conjunto de etiquetas cuyas palabras clave aparecen en el texto"""
+        crudas = texto.lower().split()
+        palabras = {t for c in set(crudas) for t in _trocear(c)}
+
+        detectadas = set()
+        for forma in self.simples.keys() & palabras:
+            detectadas |= self.simples[forma]
+
+        primeras = self.compuestas.keys() & palabras
+        if primeras:
+            normalizado = ' '.join(crudas)
+            for primera in primeras:
+                for variante, etiquetas in self.compuestas[primera].items():
+                    if _aparece(normalizado, variante):
+                        detectadas |= etiquetas
+        return detectadas
+
+
+_AUTOMATA = AutomataIntenciones({
+    **{('categoria', cat): kws for cat, kws in CATEGORIAS_ATRACTIVOS.items()},
+    **{('pais', clave): KEYWORDS_PAIS[clave] for clave in CARACTERISTICAS_PAIS}
+})
+
+
 # ========================================
 # FUNCIONES DE MATCHING
 # ========================================
@@ -81,38 +190,54 @@ def extraer_intenciones(descripcion_usuario):
             }
         }
     """
-    texto_lower = descripcion_usuario.lower()
+    detectadas = _AUTOMATA.buscar(descripcion_usuario)
     
-    categorias_detectadas = set()
-    caracteristicas_pais = {
-        'coste_bajo': False,
-        'fiesta_alta': False,
-        'ambiente_joven': False
+    return {
+        'categorias_atractivos': [cat for cat in CATEGORIAS_ATRACTIVOS if ('categoria', cat) in detectadas],
+        'caracteristicas_pais': {
+            destino: ('pais', clave) in detectadas
+            for clave, destino in CARACTERISTICAS_PAIS.items()
+        }
     }
+
+
+def extraer_intenciones_lote(descripciones):
+    """
+    Versión por lotes de extraer_intenciones para muchas descripciones
     
-    for categoria, keywords in {**KEYWORDS_EXPERIENCIA, **KEYWORDS_CULTURAL, 
-                                **KEYWORDS_GEOGRAFIA, **KEYWORDS_CONSTRUCCION}.items():
-        if any(kw in texto_lower for kw in keywords):
-            categorias_detectadas.add(categoria)
-    
-    if any(kw in texto_lower for kw in KEYWORDS_PAIS['barato']):
-        caracteristicas_pais['coste_bajo'] = True
-    
-    if any(kw in texto_lower for kw in KEYWORDS_PAIS['fiesta_alta']):
-        caracteristicas_pais['fiesta_alta'] = True
-    
-    if any(kw in texto_lower for kw in KEYWORDS_PAIS['joven']):
-        caracteristicas_pais['ambiente_joven'] = True
+    Args:
+        descripciones: iterable de str
     
-    return {
-        'categorias_atractivos': list(categorias_detectadas),
-        'caracteristicas_pais': caracteristicas_pais
-    }
+    Returns:
+        list con un dict de intenciones por descripción, en el mismo orden
+    """
+    return [extraer_intenciones(d) for d in descripciones]
+
+
+# Fragmento Cypher fijo: las intenciones viajan como parámetros.
+# Los puntos por categorías de atractivos se calculan con máscaras (perfiles_categorias).
+PUNTOS_PAIS_CYPHER = (
+    "CASE WHEN $coste_bajo AND p.coste_vida IN ['Bajo', 'Muy Bajo'] THEN 100 ELSE 0 END"
+    " + CASE WHEN $fiesta_alta AND p.ambiente_fiesta IN ['Alto', 'Muy Alto'] THEN 100 ELSE 0 END"
+    " + CASE WHEN $ambiente_joven AND p.edad_media < 40 THEN 100 ELSE 0 END"
+)
+
+
+def puntos_pais(coste_vida, ambiente_fiesta, edad_media, caracteristicas):
+    """Mismos puntos que PUNTOS_PAIS_CYPHER, con los datos del país ya leídos"""
+    puntos = 0
+    if caracteristicas['coste_bajo'] and coste_vida in ('Bajo', 'Muy Bajo'):
+        puntos += 100
+    if caracteristicas['fiesta_alta'] and ambiente_fiesta in ('Alto', 'Muy Alto'):
+        puntos += 100
+    if caracteristicas['ambiente_joven'] and edad_media is not None and edad_media < 40:
+        puntos += 100
+    return puntos
 
 
 def construir_clausulas_puntuacion(intenciones):
     """
-    Construye las cláusulas CASE de Cypher para puntuar según intenciones
+    Construye la cláusula Cypher y los parámetros para puntuar según intenciones
     
     Args:
         intenciones: dict retornado por extraer_intenciones()
@@ -120,44 +245,21 @@ def construir_clausulas_puntuacion(intenciones):
     Returns:
         dict con:
         {
-            'puntos_atractivos': str (cláusula Cypher),
             'puntos_pais': str (cláusula Cypher),
+            'parametros': dict (valores de $coste_bajo, $fiesta_alta...),
             'categorias_buscar': list (para referencia)
         }
     """
     categorias = intenciones['categorias_atractivos']
     caracteristicas = intenciones['caracteristicas_pais']
-   
-    condiciones_atractivos = []
-    for cat in categorias:
-        condiciones_atractivos.append(f"""
-            CASE WHEN EXISTS {{
-                MATCH (p)-[:TIENE_ATRACTIVO]->(a:Atractivo)
-                WHERE any(c IN a.categorias WHERE toLower(c) CONTAINS '{cat}')
-            }} THEN 100 ELSE 0 END
-        """)
-        
-
-    
-    puntos_atractivos = " + ".join(condiciones_atractivos) if condiciones_atractivos else "0"
-    
-    condiciones_pais = []
-    
-    if caracteristicas['coste_bajo']:
-        condiciones_pais.append("CASE WHEN p.coste_vida IN ['Bajo', 'Muy Bajo'] THEN 100 ELSE 0 END")
-    
-    if caracteristicas['fiesta_alta']:
-        condiciones_pais.append("CASE WHEN p.ambiente_fiesta IN ['Alto', 'Muy Alto'] THEN 100 ELSE 0 END")
-    
-    if caracteristicas['ambiente_joven']:
-     
-        condiciones_pais.append("CASE WHEN p.edad_media < 40 THEN 100 ELSE 0 END")
-    
-    puntos_pais = " + ".join(condiciones_pais) if condiciones_pais else "0"
     
     return {
-        'puntos_atractivos': puntos_atractivos,
-        'puntos_pais': puntos_pais,
+        'puntos_pais': PUNTOS_PAIS_CYPHER,
+        'parametros': {
+            'coste_bajo': bool(caracteristicas['coste_bajo']),
+            'fiesta_alta': bool(caracteristicas['fiesta_alta']),
+            'ambiente_joven': bool(caracteristicas['ambiente_joven'])
+        },
         'categorias_buscar': categorias
     }
 
@@ -0,0 +1,280 @@
+"""
+Trazas y métricas de cada turno: spans, contadores e histogramas
+
+Configuración por variables de entorno (todas opcionales):
+    ERASMAI_LOG              nivel de log ("WARNING" por defecto; "DEBUG" muestra el TOP 5 detallado)
+    ERASMAI_TRAZAS           fichero JSONL donde se escribe cada span terminado
+    ERASMAI_METRICAS         fichero con las métricas en formato de texto de Prometheus,
+                             reescrito al final de cada turno
+    ERASMAI_METRICAS_PUERTO  puerto HTTP donde se sirve /metrics
+"""
+
+import itertools
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+logger = logging.getLogger("erasmai")
+
+BUCKETS_SEGUNDOS = (0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+BUCKETS_FILAS = (0, 1, 5, 10, 25, 50, 100, 250, 500, 1000)
+BUCKETS_TOKENS = (250, 500, 1000, 1500, 2000, 2500, 3000, 4000, 6000, 8000)
+
+
+# ========================================
+# MÉTRICAS
+# ========================================
+
+def _etiquetas(nombres, valores):
+    if not nombres:
+        return ""
+    pares = (f'{n}="{str(v).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"'
+             for n, v in zip(nombres, valores))
+    return "{" + ",".join(pares) + "}"
+
+
+class Contador:
+    tipo = "counter"
+
+    def __init__(self, nombre, ayuda, etiquetas=()):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiquetas = tuple(etiquetas)
+        self._valores = {}
+        self._lock = threading.Lock()
+
+    def inc(self, cantidad=1, **etiquetas):
+        clave = tuple(etiquetas.get(n, "") for n in self.etiquetas)
+        with self._lock:
+            self._valores[clave] = self._valores.get(clave, 0) + cantidad
+
+    def valor(self, **etiquetas):
+        return self._valores.get(tuple(etiquetas.get(n, "") for n in self.etiquetas), 0)
+
+    def muestras(self):
+        with self._lock:
+            return [(self.nombre + _etiquetas(self.etiquetas, clave), valor)
+                    for clave, valor in sorted(self._valores.items())]
+
+
+class Histograma:
+    tipo = "histogram"
+
+    def __init__(self, nombre, ayuda, etiquetas=(), buckets=BUCKETS_SEGUNDOS):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiquetas = tuple(etiquetas)
+        self.buckets = tuple(buckets)
+        self._series = {}  # etiquetas -> [conteos por bucket, suma, total]
+        self._lock = threading.Lock()
+
+    def observar(self, valor, **etiquetas):
+        clave = tuple(etiquetas.get(n, "") for n in self.etiquetas)
+        with self._lock:
+            serie = self._series.get(clave)
+            if serie is None:
+                serie = self._series[clave] = [[0] * len(self.buckets), 0.0, 0]
+            for i, limite in enumerate(self.buckets):
+                if valor <= limite:
+                    serie[0][i] += 1
+            serie[1] += valor
+            serie[2] += 1
+
+    def total(self, **etiquetas):
+        serie = self._series.get(tuple(etiquetas.get(n, "") for n in self.etiquetas))
+        return serie[2] if serie else 0
+
+    def suma(self, **etiquetas):
+        serie = self._series.get(tuple(etiquetas.get(n, "") for n in self.etiquetas))
+        return serie[1] if serie else 0.0
+
+    def muestras(self):
+        nombres = self.etiquetas + ("le",)
+        filas = []
+        with self._lock:
+            for clave, (conteos, suma, total) in sorted(self._series.items()):
+                for limite, conteo in zip(self.buckets, conteos):
+                    filas.append((f"{self.nombre}_bucket" + _etiquetas(nombres, clave + (limite,)), conteo))
+                filas.append((f"{self.nombre}_bucket" + _etiquetas(nombres, clave + ("+Inf",)), total))
+                filas.append((f"{self.nombre}_sum" + _etiquetas(self.etiquetas, clave), suma))
+                filas.append((f"{self.nombre}_count" + _etiquetas(self.etiquetas, clave), total))
+        return filas
+
+
+class RegistroMetricas:
+    """Conjunto de métricas del proceso, exportable en formato de texto de Prometheus"""
+
+    def __init__(self):
+        self._metricas = {}
+
+    def contador(self, nombre, ayuda, etiquetas=()):
+        return self._metricas.setdefault(nombre, Contador(nombre, ayuda, etiquetas))
+
+    def histograma(self, nombre, ayuda, etiquetas=(), buckets=BUCKETS_SEGUNDOS):
+        return self._metricas.setdefault(nombre, Histograma(nombre, ayuda, etiquetas, buckets))
+
+    def a_prometheus(self):
+        lineas = []
+        for metrica in self._metricas.values():
+            lineas.append(f"# HELP {metrica.nombre} {metrica.ayuda}")
+            lineas.append(f"# TYPE {metrica.nombre} {metrica.tipo}")
+            lineas.extend(f"{nombre} {valor:g}" for nombre, valor in metrica.muestras())
+        return "\n".join(lineas) + "\n"
+
+
+REGISTRO = RegistroMetricas()
+
+TURNOS = REGISTRO.contador("erasmai_turnos_total", "Mensajes procesados por estado de la conversación", ("estado",))
+DURACION = REGISTRO.histograma("erasmai_span_segundos", "Duración de cada span", ("span",))
+ERRORES = REGISTRO.contador("erasmai_errores_total", "Spans terminados con excepción", ("span",))
+FILAS = REGISTRO.histograma("erasmai_filas", "Filas devueltas por cada consulta", ("consulta",), BUCKETS_FILAS)
+PROMPT = REGISTRO.histograma("erasmai_prompt_tokens", "Tokens estimados del prompt (sistema + usuario)", (),
+                             BUCKETS_TOKENS)
+LLM_LATENCIA = REGISTRO.histograma("erasmai_llm_segundos", "Duración de cada generación del LLM", ("modo",))
+LLM_PRIMER_TOKEN = REGISTRO.histograma("erasmai_llm_primer_token_segundos",
+                                       "Tiempo hasta el primer trozo en streaming")
+LLM_TOKENS = REGISTRO.contador("erasmai_llm_tokens_total", "Tokens consumidos según la API", ("tipo",))
+CACHE = REGISTRO.contador("erasmai_cache_total", "Consultas a la caché de recomendaciones", ("resultado",))
+
+
+# ========================================
+# SPANS
+# ========================================
+
+_local = threading.local()
+_ids = itertools.count(1)
+
+
+class Span:
+    __slots__ = ('nombre', 'id', 'padre', 'traza', 'inicio', 'duracion', 'atributos')
+
+    def __init__(self, nombre, padre, atributos):
+        self.nombre = nombre
+        self.id = next(_ids)
+        self.padre = padre.id if padre else None
+        self.traza = padre.traza if padre else self.id
+        self.inicio = time.time()
+        self.duracion = None
+        self.atributos = atributos
+
+    def anotar(self, **atributos):
+        self.atributos.update(atributos)
+
+    def a_dict(self):
+        return {'nombre': self.nombre, 'id': self.id, 'padre': self.padre, 'traza': self.traza,
+                'inicio': self.inicio, 'duracion_ms': self.duracion * 1000, 'atributos': self.atributos}
+
+
+@contextmanager
+def span(nombre, **atributos):
+    """
+    Mide un bloque: registra su duración en erasmai_span_segundos{span=nombre},
+    lo anida bajo el span abierto del mismo hilo y, con ERASMAI_TRAZAS, lo
+    escribe al terminar. Los atributos se pueden completar con anotar().
+    """
+    pila = getattr(_local, 'pila', None)
+    if pila is None:
+        pila = _local.pila = []
+    actual = Span(nombre, pila[-1] if pila else None, atributos)
+    pila.append(actual)
+    inicio = time.perf_counter()
+    try:
+        yield actual
+    except Exception as e:
+        ERRORES.inc(span=nombre)
+        actual.atributos['error'] = type(e).__name__
+        raise
+    finally:
+        actual.duracion = time.perf_counter() - inicio
+        # los generadores pueden cerrar sus spans fuera de orden
+        if actual in pila:
+            pila.remove(actual)
+        DURACION.observar(actual.duracion, span=nombre)
+        logger.debug("span %s %.3f ms %s", nombre, actual.duracion * 1000, actual.atributos)
+        if _exportador_trazas is not None:
+            _exportador_trazas.escribir(actual)
+
+
+class ExportadorTrazas:
+    """Escribe cada span terminado como una línea JSON"""
+
+    def __init__(self, ruta):
+        self._fichero = open(ruta, 'a', encoding='utf-8')
+        self._lock = threading.Lock()
+
+    def escribir(self, span):
+        linea = json.dumps(span.a_dict(), ensure_ascii=False, default=str)
+        with self._lock:
+            self._fichero.write(linea + "\n")
+            self._fichero.flush()
+
+    def cerrar(self):
+        self._fichero.close()
+
+
+# ========================================
+# EXPORTACIÓN Y CONFIGURACIÓN
+# ========================================
+
+_exportador_trazas = None
+_servidor = None
+_configurado = False
+_lock_configuracion = threading.Lock()
+
+def exportar(ruta=None):
+    """Reescribe (de forma atómica) el fichero de métricas, si hay uno configurado"""
+    ruta = ruta or os.getenv("ERASMAI_METRICAS")
+    if not ruta:
+        return
+    temporal = f"{ruta}.tmp"
+    with open(temporal, 'w', encoding='utf-8') as f:
+        f.write(REGISTRO.a_prometheus())
+    os.replace(temporal, ruta)
+
+
+def servir_metricas(puerto, host="127.0.0.1"):
+    """Sirve las métricas en http://host:puerto/metrics desde un hilo de fondo"""
+
+    class Manejador(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            if self.path.rstrip('/') != '/metrics':
+                self.send_error(404)
+                return
+            cuerpo = REGISTRO.a_prometheus().encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+            self.send_header('Content-Length', str(len(cuerpo)))
+            self.end_headers()
+            self.wfile.write(cuerpo)
+
+    servidor = ThreadingHTTPServer((host, puerto), Manejador)
+    servidor.daemon_threads = True
+    threading.Thread(target=servidor.serve_forever, name="erasmai-metricas", daemon=True).start()
+    return servidor
+
+
+def configurar():
+    """
+    Aplica la configuración de las variables de entorno (nivel de log,
+    exportador de trazas y servidor de métricas). Es idempotente, así que se
+    puede llamar en cada recarga de Streamlit.
+    """
+    global _exportador_trazas, _servidor, _configurado
+    with _lock_configuracion:
+        if _configurado:
+            return
+        logging.basicConfig(format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+        logger.setLevel(os.getenv("ERASMAI_LOG", "WARNING").upper())
+        if os.getenv("ERASMAI_TRAZAS"):
+            _exportador_trazas = ExportadorTrazas(os.getenv("ERASMAI_TRAZAS"))
+        if os.getenv("ERASMAI_METRICAS_PUERTO"):
+            _servidor = servir_metricas(int(os.getenv("ERASMAI_METRICAS_PUERTO")))
+        _configurado = True
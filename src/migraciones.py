@@ -0,0 +1,194 @@
+"""
+Migraciones versionadas del esquema de Neo4j (restricciones y requisitos de idioma de OFERTA)
+
+Uso:
+    python src/migraciones.py               aplica las migraciones pendientes
+    python src/migraciones.py --estado      muestra la versión actual y las pendientes
+    python src/migraciones.py --perfilar    además, ejecuta PROFILE de las consultas
+                                            antes y después y compara los db hits
+
+La versión aplicada se guarda en el nodo (:MigracionEsquema {id: 'erasmai'}).
+Todas las sentencias son idempotentes (IF NOT EXISTS / MERGE), así que una
+migración interrumpida se puede relanzar sin más.
+"""
+
+import argparse
+import sys
+
+from consultas_cypher import PLANTILLAS, parametros_busqueda, parametros_recomendacion
+from metricas import logger
+from resultados import Destino
+
+
+# (versión, descripción, sentencias). Cada sentencia se ejecuta en su propia
+# transacción implícita: los cambios de esquema no se pueden mezclar con
+# escrituras de datos y CALL ... IN TRANSACTIONS la necesita.
+MIGRACIONES = [
+    (1, "Restricciones únicas con la sintaxis FOR ... REQUIRE", [
+        "CREATE CONSTRAINT carrera_nombre IF NOT EXISTS FOR (c:Carrera) REQUIRE c.nombre IS UNIQUE",
+        "CREATE CONSTRAINT universidad_nombre IF NOT EXISTS FOR (u:Universidad) REQUIRE u.nombre IS UNIQUE",
+        "CREATE CONSTRAINT pais_nombre IF NOT EXISTS FOR (p:Pais) REQUIRE p.nombre IS UNIQUE",
+        "CREATE CONSTRAINT ciudad_nombre IF NOT EXISTS FOR (l:Ciudad) REQUIRE l.nombre IS UNIQUE",
+        "CREATE CONSTRAINT atractivo_nombre IF NOT EXISTS FOR (a:Atractivo) REQUIRE a.nombre IS UNIQUE",
+    ]),
+    # carga_datos.py ya escribe estas propiedades con requisitos_idioma(); esto
+    # solo cubre bases cargadas a mano y separa cada alternativa en nivel e idioma
+    (2, "Requisitos de idioma de OFERTA como listas idiomas_requeridos/niveles_requeridos", [
+        """
+        MATCH ()-[o:OFERTA]->()
+        WHERE o.nivel_requerido IS NOT NULL AND o.idiomas_requeridos IS NULL
+        CALL {
+            WITH o
+            WITH o, [s IN split(toLower(o.nivel_requerido), ' o ')
+                     | [t IN split(trim(s), ' ') WHERE t <> '']] AS partes
+            WITH o, [p IN partes WHERE size(p) >= 2
+                     AND p[0] IN ['a1', 'a2', 'b1', 'b2', 'c1', 'c2']] AS alternativas
+            SET o.idiomas_requeridos = [p IN alternativas |
+                    replace(replace(replace(replace(replace(replace(replace(p[1],
+                        'á', 'a'), 'é', 'e'), 'í', 'i'), 'ó', 'o'), 'ú', 'u'), 'ñ', 'n'), 'ü', 'u')],
+                o.niveles_requeridos = [p IN alternativas |
+                    {a1: 1, a2: 2, b1: 3, b2: 4, c1: 5, c2: 6}[p[0]]]
+        } IN TRANSACTIONS OF 500 ROWS
+        """,
+    ]),
+]
+
+VERSION_ESQUEMA = MIGRACIONES[-1][0]
+
+
+# ========================================
+# MIGRACIONES
+# ========================================
+
+def version_actual(session):
+    registro = session.run(
+        "OPTIONAL MATCH (m:MigracionEsquema {id: 'erasmai'}) RETURN m.version AS version"
+    ).single()
+    return registro['version'] or 0
+
+
+def pendientes(driver, database):
+    """Migraciones aún no aplicadas, como (versión, descripción)"""
+    with driver.session(database=database) as session:
+        actual = version_actual(session)
+    return [(version, descripcion) for version, descripcion, _ in MIGRACIONES if version > actual]
+
+
+def migrar(driver, database, hasta=None):
+    """
+    Aplica en orden las migraciones pendientes hasta la versión 'hasta'
+    (todas por defecto) y anota la versión tras cada una.
+
+    Returns:
+        list de versiones aplicadas
+    """
+    aplicadas = []
+    with driver.session(database=database) as session:
+        actual = version_actual(session)
+        for version, descripcion, sentencias in MIGRACIONES:
+            if version <= actual or (hasta is not None and version > hasta):
+                continue
+            logger.info("Migración %s: %s", version, descripcion)
+            for sentencia in sentencias:
+                session.run(sentencia).consume()
+            session.run(
+                "MERGE (m:MigracionEsquema {id: 'erasmai'}) SET m.version = $version, m.aplicada = datetime()",
+                version=version,
+            ).consume()
+            aplicadas.append(version)
+    return aplicadas
+
+
+# ========================================
+# PROFILE
+# ========================================
+
+def _recorrer(plan):
+    yield plan
+    for hijo in plan.get('children', []):
+        yield from _recorrer(hijo)
+
+
+def perfilar(session, consulta, parametros):
+    """
+    Ejecuta la consulta con PROFILE
+
+    Returns:
+        dict con el total de 'db_hits', las 'filas' devueltas y los 'operadores'
+        de acceso a nodos (scans y seeks) del plan
+    """
+    perfil = session.run("PROFILE " + consulta, parametros).consume().profile
+    operadores = sorted({
+        paso['operatorType'].split('@')[0] for paso in _recorrer(perfil)
+        if 'Scan' in paso['operatorType'] or 'Seek' in paso['operatorType']
+    })
+    return {
+        'db_hits': sum(paso.get('dbHits', 0) for paso in _recorrer(perfil)),
+        'filas': perfil.get('rows', 0),
+        'operadores': operadores,
+    }
+
+
+def parametros_de_ejemplo(session, carrera):
+    """Parámetros realistas para las plantillas: los destinos reales de una carrera"""
+    parametros = parametros_busqueda(carrera, None, {}, 'grande', None, 'calor')
+    destinos = [Destino.desde_fila(fila) for fila in session.run(PLANTILLAS['destinos'][0], parametros)]
+    puntos = {'coste_bajo': True, 'fiesta_alta': True, 'ambiente_joven': False}
+    return {
+        'destinos': parametros,
+        'intenciones': {'universidades': sorted({d.universidad for d in destinos}), **puntos},
+        'recomendacion': parametros_recomendacion(destinos, puntos, {}),
+    }
+
+
+def perfilar_plantillas(driver, database, carrera):
+    """PROFILE de cada plantilla de consultas_cypher con los destinos de 'carrera'"""
+    with driver.session(database=database) as session:
+        parametros = parametros_de_ejemplo(session, carrera)
+        return {
+            nombre: perfilar(session, consulta, parametros[nombre])
+            for nombre, (consulta, _) in PLANTILLAS.items()
+        }
+
+
+def imprimir_comparacion(antes, despues):
+    print(f"{'consulta':<16}{'db hits antes':>15}{'después':>10}{'cambio':>9}  operadores")
+    for nombre, datos in despues.items():
+        previo = antes.get(nombre, datos)['db_hits']
+        cambio = (datos['db_hits'] - previo) / previo * 100 if previo else 0
+        print(f"{nombre:<16}{previo:>15}{datos['db_hits']:>10}{cambio:>8.0f}%  {', '.join(datos['operadores'])}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Migraciones del esquema de Neo4j")
+    parser.add_argument('--estado', action='store_true', help="solo muestra las migraciones pendientes")
+    parser.add_argument('--hasta', type=int, default=None, help="versión máxima a aplicar")
+    parser.add_argument('--perfilar', action='store_true', help="compara PROFILE antes y después")
+    parser.add_argument('--carrera', default='ingenieria informatica', help="carrera para --perfilar")
+    args = parser.parse_args(argv)
+
+    from recursos import Recursos
+    recursos = Recursos(backend="neo4j")
+    driver, database = recursos.driver, recursos.database
+    try:
+        faltan = pendientes(driver, database)
+        print(f"🗄️ Esquema en la versión {VERSION_ESQUEMA - len(faltan)} de {VERSION_ESQUEMA}")
+        for version, descripcion in faltan:
+            print(f"   pendiente {version}: {descripcion}")
+        if args.estado:
+            return
+
+        if args.perfilar and not faltan:
+            print("⚠️ No hay migraciones pendientes: --perfilar necesita una base sin migrar para comparar")
+            args.perfilar = False
+        antes = perfilar_plantillas(driver, database, args.carrera) if args.perfilar else None
+        aplicadas = migrar(driver, database, args.hasta)
+        print(f"✅ Migraciones aplicadas: {aplicadas or 'ninguna'}")
+        if antes is not None:
+            imprimir_comparacion(antes, perfilar_plantillas(driver, database, args.carrera))
+    finally:
+        recursos.cerrar()
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
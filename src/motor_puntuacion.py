@@ -0,0 +1,268 @@
+"""
+Motor de puntuación vectorizado (NumPy) sobre el catálogo en memoria.
+
+Reúne en un solo sitio lo que antes estaba repartido entre la fórmula
+PuntuacionCompuesta de Cypher, los CASE de PuntosCaracteristicas y los bucles
+de rag_funciones: todas las componentes se calculan con operaciones sobre
+arrays y el TOP k se elige con argpartition. Los resultados (valores y orden,
+incluidos los empates) son los mismos que los de MemoriaQueryEngine.
+"""
+
+import numpy as np
+
+from catalogo_memoria import requisitos_idioma
+from intenciones_matcher import NIVEL_MAPA, plegar_acentos
+from perfiles_categorias import CATEGORIAS, PUNTOS_PRESENCIA, PUNTOS_POR_APARICION
+
+
+UMBRAL_POBLACION = 156000
+UMBRAL_TEMPERATURA = 11.4
+
+
+def _real(valor):
+    return np.nan if valor is None else float(valor)
+
+
+class MotorPuntuacion:
+    """
+    Matrices de características construidas una vez a partir de un CatalogoMemoria.
+
+    - ubicaciones (una fila por universidad/ciudad/país, agrupadas por
+      universidad): ranking, exchange_score, población, región, temperatura,
+      coste/fiesta/edad del país, presencia de cada categoría (todos los
+      atractivos) y apariciones en el TOP 10 del país
+    - ofertas por carrera: índice de la ubicación, certificado obligatorio y
+      nivel mínimo exigido por idioma (inf si el idioma no sirve); en
+      filas_ofertas quedan las tuplas originales del catálogo, alineadas
+    """
+
+    def __init__(self, catalogo):
+        self.catalogo = catalogo
+        self._construir_ubicaciones()
+        self._construir_ofertas()
+
+    @classmethod
+    def desde_catalogo(cls, catalogo):
+        return cls(catalogo)
+
+    # ---------- construcción ----------
+
+    def _construir_ubicaciones(self):
+        cat = self.catalogo
+        self.universidades = list(cat.ubicaciones)
+        self.indice_universidad = {uni: i for i, uni in enumerate(self.universidades)}
+        self.regiones = sorted({p.get('localizacion') for p in cat.paises.values() if p.get('localizacion')})
+        codigo_region = {r: i for i, r in enumerate(self.regiones)}
+
+        self.ubicaciones = []
+        self.indice_ubicacion = {}
+        self.paises = sorted({pais for ubicaciones in cat.ubicaciones.values() for _, pais in ubicaciones})
+        codigo_pais = {p: i for i, p in enumerate(self.paises)}
+        paises_ubicacion = []
+        filas = []
+        for uni in self.universidades:
+            u = cat.universidades[uni]
+            for ciudad, pais in cat.ubicaciones[uni]:
+                self.indice_ubicacion[(uni, ciudad, pais)] = len(self.ubicaciones)
+                self.ubicaciones.append((uni, ciudad, pais))
+                paises_ubicacion.append(codigo_pais[pais])
+                p = cat.paises.get(pais, {})
+                filas.append((
+                    self.indice_universidad[uni],
+                    _real(u['ranking_uni']),
+                    _real(u['exchange_score']),
+                    _real(cat.ciudades[ciudad]['poblacion']),
+                    codigo_region.get(p.get('localizacion'), -1),
+                    _real(p.get('temp_media_anual')),
+                    p.get('coste_vida') in ('Bajo', 'Muy Bajo'),
+                    p.get('ambiente_fiesta') in ('Alto', 'Muy Alto'),
+                    p.get('edad_media') is not None and p['edad_media'] < 40,
+                ))
+
+        columnas = list(zip(*filas)) if filas else [()] * 9
+        self.uni = np.array(columnas[0], dtype=np.int64)
+        self.ranking = np.array(columnas[1], dtype=np.float64)
+        self.exchange = np.array(columnas[2], dtype=np.float64)
+        self.poblacion = np.array(columnas[3], dtype=np.float64)
+        self.region = np.array(columnas[4], dtype=np.int64)
+        self.temperatura = np.array(columnas[5], dtype=np.float64)
+        self.coste_bajo = np.array(columnas[6], dtype=bool)
+        self.fiesta_alta = np.array(columnas[7], dtype=bool)
+        self.ambiente_joven = np.array(columnas[8], dtype=bool)
+        self.pais = np.array(paises_ubicacion, dtype=np.int64)
+
+        n = len(self.ubicaciones)
+        self.presencia = np.zeros((n, len(CATEGORIAS)), dtype=np.int64)
+        self.apariciones = np.zeros((n, len(CATEGORIAS)), dtype=np.int64)
+        for fila, (_, _, pais) in enumerate(self.ubicaciones):
+            perfil = cat.perfiles.obtener(pais)
+            for i in range(len(CATEGORIAS)):
+                self.presencia[fila, i] = bool(perfil.mascara & (1 << i))
+            self.apariciones[fila] = perfil.conteos
+
+    def _construir_ofertas(self):
+        cat = self.catalogo
+        self.idiomas = []
+        codigo_idioma = {}
+        por_carrera = {}
+        self.filas_ofertas = {}
+        for carrera, filas in cat.ofertas_por_carrera.items():
+            vistas = set()
+            ubicacion, cert_no, cert_si, requisitos = [], [], [], []
+            for uni, ciudad, pais, plazas, meses, cert, nivel in filas:
+                if plazas is None or plazas <= 0:
+                    continue
+                clave = (uni, ciudad, pais, plazas, meses, cert, nivel)
+                if clave in vistas:
+                    continue
+                vistas.add(clave)
+                self.filas_ofertas.setdefault(carrera, []).append(clave)
+                minimos = {}
+                for idioma, nivel_req in requisitos_idioma(nivel):
+                    codigo = codigo_idioma.setdefault(idioma, len(codigo_idioma))
+                    minimos[codigo] = min(minimos.get(codigo, np.inf), nivel_req)
+                ubicacion.append(self.indice_ubicacion[(uni, ciudad, pais)])
+                cert_no.append(cert == 'NO')
+                cert_si.append(cert == 'SI')
+                requisitos.append(minimos)
+            por_carrera[carrera] = (ubicacion, cert_no, cert_si, requisitos)
+        self.idiomas = list(codigo_idioma)
+        self.codigo_idioma = codigo_idioma
+
+        self.ofertas = {}
+        for carrera, (ubicacion, cert_no, cert_si, requisitos) in por_carrera.items():
+            minimo = np.full((len(ubicacion), len(self.idiomas)), np.inf)
+            for fila, minimos in enumerate(requisitos):
+                for codigo, valor in minimos.items():
+                    minimo[fila, codigo] = valor
+            self.ofertas[carrera] = (
+                np.array(ubicacion, dtype=np.int64),
+                np.array(cert_no, dtype=bool),
+                np.array(cert_si, dtype=bool),
+                minimo,
+            )
+
+    # ---------- etapa 1 ----------
+
+    def _filtro_idioma(self, cert_no, cert_si, minimo, certificados):
+        if certificados == "NO":
+            return cert_no
+        if not (isinstance(certificados, list) and certificados):
+            return np.ones(len(cert_no), dtype=bool)
+        acepta = np.zeros(len(cert_no), dtype=bool)
+        for cert in certificados:
+            codigo = self.codigo_idioma.get(plegar_acentos(cert.get('idioma', '')))
+            if codigo is not None:
+                acepta |= NIVEL_MAPA.get(cert.get('nivel', '').upper(), 0) >= minimo[:, codigo]
+        return cert_no | (cert_si & acepta)
+
+    def _bases(self, filas, tamano_ciudad, region_europa, preferencia_clima):
+        """PuntuacionCompuesta de las ubicaciones 'filas' (nan si falta ranking o exchange_score)"""
+        poblacion = self.poblacion[filas]
+        temperatura = self.temperatura[filas]
+        if tamano_ciudad == 'grande':
+            puntos_ciudad = np.where(poblacion >= UMBRAL_POBLACION, 70, 0)
+        elif tamano_ciudad == 'pequena':
+            puntos_ciudad = np.where(poblacion < UMBRAL_POBLACION, 70, 0)
+        else:
+            puntos_ciudad = 0
+        if region_europa and region_europa in self.regiones:
+            puntos_region = np.where(self.region[filas] == self.regiones.index(region_europa), 70, 0)
+        else:
+            puntos_region = 0
+        if preferencia_clima == 'frio':
+            puntos_clima = np.where(temperatura < UMBRAL_TEMPERATURA, 50, 0)
+        elif preferencia_clima == 'calor':
+            puntos_clima = np.where(temperatura >= UMBRAL_TEMPERATURA, 50, 0)
+        else:
+            puntos_clima = 0
+        return ((686 - self.ranking[filas]) * 0.1 + self.exchange[filas] * 0.2
+                + puntos_ciudad + puntos_region + puntos_clima)
+
+    def puntuar_perfil(self, carrera, certificados, tamano_ciudad, region_europa, preferencia_clima):
+        """
+        Etapa 1 vectorizada
+
+        Returns:
+            (ofertas, bases): índices en filas_ofertas[carrera] de las ofertas
+            que pasan los filtros y su puntuación, en el mismo orden que
+            MemoriaQueryEngine.buscar (puntuación descendente, nulos al
+            final, empates por orden de carga)
+        """
+        if carrera not in self.ofertas:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        ubicacion, cert_no, cert_si, minimo = self.ofertas[carrera]
+        ofertas = np.flatnonzero(self._filtro_idioma(cert_no, cert_si, minimo, certificados))
+        bases = self._bases(ubicacion[ofertas], tamano_ciudad, region_europa, preferencia_clima)
+        nulos = np.isnan(bases)
+        orden = np.lexsort((ofertas, -np.where(nulos, 0, bases), nulos))
+        return ofertas[orden], bases[orden]
+
+    # ---------- etapa 2 ----------
+
+    def puntos_caracteristicas(self, intenciones):
+        """Puntos de país (coste, fiesta, edad) + presencia + apariciones + texto (BM25), por ubicación"""
+        caracteristicas = intenciones['caracteristicas_pais']
+        puntos = np.zeros(len(self.ubicaciones), dtype=np.int64)
+        if caracteristicas['coste_bajo']:
+            puntos += 100 * self.coste_bajo
+        if caracteristicas['fiesta_alta']:
+            puntos += 100 * self.fiesta_alta
+        if caracteristicas['ambiente_joven']:
+            puntos += 100 * self.ambiente_joven
+
+        pedidas = set(intenciones['categorias_atractivos'])
+        columnas = [i for i, cat in enumerate(CATEGORIAS) if cat in pedidas]
+        if columnas:
+            puntos += PUNTOS_PRESENCIA * self.presencia[:, columnas].sum(axis=1)
+            puntos += PUNTOS_POR_APARICION * self.apariciones[:, columnas].sum(axis=1)
+
+        texto = intenciones.get('puntos_texto')
+        if texto:
+            puntos += np.array([texto.get(p, 0) for p in self.paises], dtype=np.int64)[self.pais]
+        return puntos
+
+    def top_k(self, universidades, bases, intenciones, k=5):
+        """
+        TOP k de ubicaciones para las universidades dadas
+
+        Args:
+            universidades: índices de universidad en orden de preferencia (sin repetir)
+            bases: puntuación base de cada una (nan = sin puntuación, cuenta como 0)
+
+        Returns:
+            list de (ubicacion, base, puntos, total), de mayor a menor total;
+            los empates conservan el orden de universidades y ubicaciones
+        """
+        posicion = np.full(len(self.universidades), -1, dtype=np.int64)
+        posicion[universidades] = np.arange(len(universidades))
+        base_uni = np.zeros(len(self.universidades))
+        base_uni[universidades] = bases
+
+        filas = np.flatnonzero(posicion[self.uni] >= 0)
+        if not len(filas):
+            return []
+        puntos = self.puntos_caracteristicas(intenciones)[filas]
+        base = base_uni[self.uni[filas]]
+        total = np.where(np.isnan(base), 0, base) + puntos
+
+        if len(filas) > k:
+            # argpartition da k mejores; los que empatan con el peor de ellos
+            # también entran, para desempatar por orden como hace sort()
+            umbral = total[np.argpartition(-total, k - 1)[:k]].min()
+            seleccion = np.flatnonzero(total >= umbral)
+        else:
+            seleccion = np.arange(len(filas))
+        orden = seleccion[np.lexsort((filas[seleccion], posicion[self.uni[filas[seleccion]]], -total[seleccion]))][:k]
+        return [(int(filas[i]), float(base[i]), int(puntos[i]), float(total[i])) for i in orden]
+
+    def recomendar(self, carrera, certificados, tamano_ciudad, region_europa, preferencia_clima,
+                   intenciones, k=5):
+        """Etapas 1 y 2 en una pasada para un perfil y unas intenciones"""
+        ofertas, bases = self.puntuar_perfil(carrera, certificados, tamano_ciudad, region_europa,
+                                             preferencia_clima)
+        if not len(ofertas):
+            return []
+        unis, primera = np.unique(self.uni[self.ofertas[carrera][0][ofertas]], return_index=True)
+        orden = np.argsort(primera)
+        return self.top_k(unis[orden], bases[primera[orden]], intenciones, k)
@@ -0,0 +1,110 @@
+"""
+Máscaras de bits de categorías de atractivos precalculadas por país.
+
+Cada país guarda una máscara con las categorías presentes en cualquiera de sus
+atractivos y un vector con las apariciones de cada categoría en su TOP 10
+(por rating). Una intención se convierte en otra máscara y los puntos salen de
+operaciones de bits en lugar de recorrer las listas de categorías en cada turno.
+"""
+
+from intenciones_matcher import (
+    KEYWORDS_EXPERIENCIA, KEYWORDS_CULTURAL, KEYWORDS_GEOGRAFIA, KEYWORDS_CONSTRUCCION
+)
+
+
+CATEGORIAS = tuple(dict.fromkeys([
+    *KEYWORDS_EXPERIENCIA, *KEYWORDS_CULTURAL, *KEYWORDS_GEOGRAFIA, *KEYWORDS_CONSTRUCCION
+]))
+BIT_CATEGORIA = {cat: 1 << i for i, cat in enumerate(CATEGORIAS)}
+
+PUNTOS_PRESENCIA = 100
+PUNTOS_POR_APARICION = 10
+TOP_ATRACTIVOS = 10
+
+
+def mascara_de_categorias(categorias):
+    """Convierte una lista de categorías detectadas en su máscara de bits"""
+    mascara = 0
+    for cat in categorias:
+        mascara |= BIT_CATEGORIA.get(cat, 0)
+    return mascara
+
+
+def _indices(mascara):
+    while mascara:
+        bit = mascara & -mascara
+        yield bit.bit_length() - 1
+        mascara ^= bit
+
+
+class PerfilCategorias:
+    __slots__ = ('mascara', 'conteos')
+
+    def __init__(self, mascara, conteos):
+        self.mascara = mascara
+        self.conteos = conteos
+
+    def puntos_presencia(self, mascara_intencion):
+        """+100 por cada categoría pedida presente en algún atractivo del país"""
+        return PUNTOS_PRESENCIA * (self.mascara & mascara_intencion).bit_count()
+
+    def puntos_apariciones(self, mascara_intencion):
+        """+10 por cada aparición de una categoría pedida en el TOP 10 del país"""
+        return PUNTOS_POR_APARICION * sum(self.conteos[i] for i in _indices(mascara_intencion))
+
+
+PERFIL_VACIO = PerfilCategorias(0, (0,) * len(CATEGORIAS))
+
+
+def calcular_perfil(categorias_por_atractivo):
+    """
+    Args:
+        categorias_por_atractivo: listas de categorías de los atractivos de un
+            país, ya ordenadas por rating descendente
+
+    Returns:
+        PerfilCategorias con la máscara (todos los atractivos) y los conteos (TOP 10)
+    """
+    mascara = 0
+    conteos = [0] * len(CATEGORIAS)
+    for posicion, categorias in enumerate(categorias_por_atractivo):
+        for c in categorias or []:
+            c = c.lower()
+            for i, cat in enumerate(CATEGORIAS):
+                if cat in c:
+                    mascara |= 1 << i
+                    if posicion < TOP_ATRACTIVOS:
+                        conteos[i] += 1
+    return PerfilCategorias(mascara, tuple(conteos))
+
+
+class PerfilesCategorias:
+    """Perfiles por país; se reconstruyen enteros cada vez que se recargan los atractivos"""
+
+    def __init__(self):
+        self._perfiles = {}
+        self.cargado = False
+
+    def refrescar(self, categorias_por_pais):
+        """
+        Args:
+            categorias_por_pais: dict pais -> listas de categorías de sus
+                atractivos ordenados por rating descendente
+        """
+        self._perfiles = {
+            pais: calcular_perfil(categorias)
+            for pais, categorias in categorias_por_pais.items()
+        }
+        self.cargado = True
+
+    def obtener(self, pais):
+        return self._perfiles.get(pais, PERFIL_VACIO)
+
+    def puntos_por_pais(self, mascara_intencion):
+        """Puntos de presencia + apariciones de cada país con alguna categoría pedida"""
+        puntos = {}
+        for pais, perfil in self._perfiles.items():
+            total = perfil.puntos_presencia(mascara_intencion) + perfil.puntos_apariciones(mascara_intencion)
+            if total:
+                puntos[pais] = total
+        return puntos
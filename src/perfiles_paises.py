@@ -0,0 +1,53 @@
+"""
+Perfiles de país compartidos por todo el proceso
+
+Los datos de cada país y sus atractivos destacados se leen una sola vez (con
+las máscaras de perfiles_categorias) y todos los candidatos de ese país, de
+cualquier sesión, apuntan al mismo PerfilPais. Las consultas de la etapa 2
+solo devuelven universidad, ciudad, país y puntos; completar() añade el
+resto. Se reconstruyen enteros al recargar los datos.
+"""
+
+from resultados import PerfilPais
+
+
+# Campos del Candidato que salen del perfil de su país
+CAMPOS_PAIS = ('localizacion', 'coste_vida', 'ambiente_fiesta', 'comidas_tipicas',
+               'temperatura', 'edad_media', 'atractivos_destacados')
+
+
+class PerfilesPaises:
+    """Perfil de cada país por nombre; refrescar() sustituye el diccionario entero de una vez"""
+
+    def __init__(self):
+        self._perfiles = {}
+        self.cargado = False
+
+    def refrescar(self, perfiles):
+        """
+        Args:
+            perfiles: iterable de PerfilPais
+        """
+        self._perfiles = {perfil.pais: perfil for perfil in perfiles}
+        self.cargado = True
+
+    def invalidar(self):
+        """Marca los perfiles como obsoletos; el motor los vuelve a leer en el siguiente uso"""
+        self.cargado = False
+
+    def __len__(self):
+        return len(self._perfiles)
+
+    def obtener(self, pais):
+        perfil = self._perfiles.get(pais)
+        if perfil is None:
+            return PerfilPais(pais=pais, atractivos_destacados=())
+        return perfil
+
+    def completar(self, candidatos):
+        """Copia en cada candidato los datos de su país y la tupla (compartida) de atractivos"""
+        for candidato in candidatos:
+            perfil = self.obtener(candidato.pais)
+            for campo in CAMPOS_PAIS:
+                setattr(candidato, campo, getattr(perfil, campo))
+        return candidatos
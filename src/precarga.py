@@ -0,0 +1,200 @@
+"""
+Precarga especulativa de datos mientras el estudiante responde el cuestionario
+
+En cuanto se conocen la carrera y los certificados, los destinos posibles ya
+no cambian: el tamaño de ciudad, la región y el clima solo suman puntos. El
+superconjunto se pide en segundo plano (PrecargaDestinos) y cada respuesta se
+aplica en memoria. Del mismo modo, mientras el estudiante escribe su
+descripción se traen los países y atractivos de sus destinos
+(PrecargaCandidatos) y la recomendación final solo tiene que puntuarlos.
+
+Los hilos se comparten entre sesiones: una precarga que al necesitarse sigue
+en cola se cancela y se consulta directamente.
+
+Variables de entorno (opcionales):
+    ERASMAI_PRECARGA        "off" para consultar todo al responder
+    ERASMAI_PRECARGA_HILOS  hilos del proceso dedicados a las precargas (4)
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from consultas_cypher import CONSULTA_RECOMENDACION, parametros_recomendacion
+from metricas import REGISTRO, logger
+from motor_puntuacion import UMBRAL_POBLACION, UMBRAL_TEMPERATURA
+from intenciones_matcher import puntos_pais
+from resultados import Candidato
+
+
+ACTIVADA = os.getenv("ERASMAI_PRECARGA", "on").lower() != "off"
+EJECUTOR = ThreadPoolExecutor(max_workers=int(os.getenv("ERASMAI_PRECARGA_HILOS", "4")),
+                              thread_name_prefix="erasmai-precarga")
+
+PRECARGAS = REGISTRO.contador("erasmai_precargas_total",
+                              "Precargas pedidas, según estuvieran listas, hubiera que esperarlas, fallaran o se cancelaran sin empezar",
+                              ("tipo", "resultado"))
+
+# LIMIT de CONSULTA_RECOMENDACION para traer todas las filas
+SIN_LIMITE = 100000
+
+SIN_INTENCIONES = {'coste_bajo': False, 'fiesta_alta': False, 'ambiente_joven': False}
+
+
+def _resultado(futuro, tipo):
+    """
+    Valor de la precarga, esperándola si ya está en marcha. Si sigue en la
+    cola de EJECUTOR (detrás de las de otras sesiones) se cancela: esperar
+    su turno y la consulta sería más lento que la consulta directa.
+
+    Returns:
+        el valor, o None si falló o se ha cancelado (el llamante consulta
+        directamente)
+    """
+    if futuro.cancel():
+        PRECARGAS.inc(tipo=tipo, resultado="cancelada")
+        return None
+    resultado = "lista" if futuro.done() else "espera"
+    try:
+        valor = futuro.result()
+    except Exception as e:
+        logger.warning("La precarga de %s ha fallado: %s", tipo, e)
+        PRECARGAS.inc(tipo=tipo, resultado="error")
+        return None
+    PRECARGAS.inc(tipo=tipo, resultado=resultado)
+    return valor
+
+
+# ========================================
+# ETAPA 1: CUESTIONARIO
+# ========================================
+
+def _puntos_ciudad(destino, tamano_ciudad):
+    if destino.poblacion is None:
+        return 0
+    if tamano_ciudad == 'grande':
+        return 70 if destino.poblacion >= UMBRAL_POBLACION else 0
+    if tamano_ciudad == 'pequena':
+        return 70 if destino.poblacion < UMBRAL_POBLACION else 0
+    return 0
+
+
+def _puntos_region(destino, region_europa):
+    return 70 if region_europa and destino.localizacion_pais == region_europa else 0
+
+
+def _puntos_clima(destino, preferencia_clima):
+    if destino.temperatura_media is None:
+        return 0
+    if preferencia_clima == 'frio':
+        return 50 if destino.temperatura_media < UMBRAL_TEMPERATURA else 0
+    if preferencia_clima == 'calor':
+        return 50 if destino.temperatura_media >= UMBRAL_TEMPERATURA else 0
+    return 0
+
+
+# Los mismos CASE que PuntuacionCompuesta en CONSULTA_DESTINOS
+COMPONENTES = {
+    'tamano_ciudad': _puntos_ciudad,
+    'region_europa': _puntos_region,
+    'preferencia_clima': _puntos_clima,
+}
+
+
+class PrecargaDestinos:
+    """
+    Destinos de una carrera con unos certificados, pedidos sin preferencias
+    (la puntuación es solo ranking y exchange_score). aplicar() suma los
+    puntos de cada respuesta en cuanto llega y destinos() devuelve la lista
+    que daría motor.buscar con todas ellas.
+    """
+
+    def __init__(self, motor, carrera, certificados):
+        self.carrera = carrera
+        self.certificados = certificados
+        self._preferencias = {}
+        self._puntos = {}  # preferencia -> puntos de cada destino del superconjunto
+        self._futuro = EJECUTOR.submit(motor.buscar, carrera, certificados, None, None, None)
+
+    def aplicar(self, **preferencias):
+        """Anota respuestas del cuestionario y, si el superconjunto ya ha llegado, las puntúa"""
+        self._preferencias.update(preferencias)
+        if self._futuro.done() and not self._futuro.cancelled() and self._futuro.exception() is None:
+            self._puntuar(self._futuro.result())
+
+    def _puntuar(self, superconjunto):
+        for campo, valor in self._preferencias.items():
+            if campo not in self._puntos or self._puntos[campo][0] != valor:
+                self._puntos[campo] = (valor, [COMPONENTES[campo](d, valor) for d in superconjunto])
+
+    def destinos(self, tamano_ciudad, region_europa, preferencia_clima):
+        """
+        Returns:
+            list de Destino en el mismo orden que motor.buscar (puntuación
+            descendente, nulos al final), o None si la precarga ha fallado
+            o no había empezado
+        """
+        superconjunto = _resultado(self._futuro, "destinos")
+        if superconjunto is None:
+            return None
+        self._preferencias.update(tamano_ciudad=tamano_ciudad, region_europa=region_europa,
+                                  preferencia_clima=preferencia_clima)
+        self._puntuar(superconjunto)
+
+        totales = []
+        for i, destino in enumerate(superconjunto):
+            total = destino.puntuacion_compuesta
+            if total is not None:
+                # en el orden de la fórmula, para obtener exactamente los mismos decimales
+                for campo in COMPONENTES:
+                    total += self._puntos[campo][1][i]
+            totales.append(total)
+        orden = sorted(range(len(superconjunto)), key=lambda i: (totales[i] is None, -(totales[i] or 0)))
+        return [superconjunto[i].copia(puntuacion_compuesta=totales[i]) for i in orden]
+
+
+# ========================================
+# ETAPA 2: INTENCIONES
+# ========================================
+
+class PrecargaCandidatos:
+    """
+    Ubicaciones de los destinos de la etapa 1, leídas con CONSULTA_RECOMENDACION
+    sin intenciones y completadas con los perfiles de país (datos y atractivos
+    compartidos, perfiles_paises). top_k() les suma después los
+    puntos de la descripción sin volver a la base de datos. La crea
+    CypherQueryEngine.precargar_candidatos; el motor en memoria no la
+    necesita y devuelve None.
+    """
+
+    def __init__(self, motor, destinos):
+        self._futuro = EJECUTOR.submit(self._consultar, motor, destinos)
+
+    @staticmethod
+    def _consultar(motor, destinos):
+        params = parametros_recomendacion(destinos, SIN_INTENCIONES, {}, k=SIN_LIMITE)
+        candidatos = motor._query_registros(CONSULTA_RECOMENDACION, params, Candidato, nombre="precarga.recomendacion")
+        return motor.perfiles_paises().completar(candidatos)
+
+    def top_k(self, caracteristicas, puntos_categorias, k=5):
+        """
+        Mismo TOP k que CONSULTA_RECOMENDACION con esas intenciones
+
+        Args:
+            caracteristicas: dict con coste_bajo, fiesta_alta y ambiente_joven
+            puntos_categorias: dict pais -> puntos por categorías de atractivos
+
+        Returns:
+            list de Candidato, o None si la precarga ha fallado o no había
+            empezado
+        """
+        candidatos = _resultado(self._futuro, "candidatos")
+        if candidatos is None:
+            return None
+        puntuados = []
+        for c in candidatos:
+            puntos = (puntos_pais(c.coste_vida, c.ambiente_fiesta, c.edad_media, caracteristicas)
+                      + puntos_categorias.get(c.pais, 0))
+            puntuados.append(c.copia(puntos_caracteristicas=puntos,
+                                     puntuacion_total=(c.puntuacion_base or 0) + puntos))
+        puntuados.sort(key=lambda c: -c.puntuacion_total)
+        return puntuados[:k]
@@ -0,0 +1,283 @@
+"""
+Prompt de la recomendación final con presupuesto de tokens
+
+Las instrucciones y el formato de respuesta son fijos y van en un mensaje de
+sistema; el mensaje de usuario solo lleva lo que cambia en cada petición
+(preferencias, descripción, candidatos y la ficha de cada país una sola vez).
+Si no cabe en el presupuesto se recorta primero lo que menos aporta: el
+detalle de los atractivos peor clasificados.
+"""
+
+import math
+import os
+import re
+
+from intenciones_matcher import formatear_categorias_para_prompt
+
+
+# Tokens (estimados) de sistema + usuario; 0 desactiva el recorte
+PRESUPUESTO_POR_DEFECTO = int(os.getenv("ERASMAI_PRESUPUESTO_PROMPT", "3000"))
+
+# Cambia cuando cambia el texto del prompt, para no reutilizar respuestas cacheadas del anterior
+VERSION_PROMPT = 2
+
+# Niveles de detalle de menor a mayor recorte: (atractivos por país, caracteres de su descripción)
+NIVELES = ((5, 180), (5, 100), (4, 100), (3, 100), (3, 0), (2, 0), (1, 0), (0, 0))
+
+MINIMO_DESCRIPCION = 200
+
+
+MENSAJE_SISTEMA = """Eres un asistente experto en recomendaciones Erasmus que ayuda a estudiantes españoles a elegir su mejor destino.
+
+El usuario te dará sus preferencias del cuestionario, su descripción libre, los destinos candidatos y una ficha por país (clima, coste, ambiente y atractivos). Elige UN destino de entre los candidatos.
+
+**INSTRUCCIONES IMPORTANTES:**
+
+1. La puntuación total solo es una guía orientativa, NO el criterio definitivo.
+2. Analiza profundamente qué destino cumple mejor:
+    - Las preferencias iniciales del cuestionario
+    - Lo que describió en su búsqueda libre
+    - La calidad y relevancia de los atractivos turísticos
+    - La experiencia Erasmus típica en ese país
+3. Explica tu razonamiento conectando TODAS las piezas: preferencias iniciales, descripción libre y características del destino.
+4. **Sé completamente honesto. Si el destino NO cumple completamente con alguna preferencia importante del usuario (clima, región, idioma, tamaño de ciudad, etc.), DEBES indicarlo claramente antes de justificar la elección. Prohibido omitir o suavizar estos incumplimientos.**
+5. **Nunca inventes ni exageres características. Si un criterio objetivo no se cumple según los datos, dilo claramente y nunca afirmes que sí cumple. Evita frases vagas como “es algo más frío que tu preferencia” o “te hará sentir en el norte”.**
+6. **Antes de justificar la recomendación, realiza un apartado explícito (Desventajas a considerar”) donde enumeres uno a uno los requisitos del usuario que NO se cumplen (por ejemplo: “El destino NO cumple la preferencia de clima frío, pues su temperatura media es 16.9°C, mayor que el umbral de 13°C”; “Esta ciudad no es realmente pequeña, pues tiene 530.000 habitantes”). Solo tras ese apartado, explica por qué se recomienda igualmente.**
+7. **No adaptes ni cambies los valores numéricos. Utiliza los datos tal cual: si la temperatura, población o región no coinciden plenamente con lo solicitado, decláralo sin camuflarlo en la argumentación.**
+8. Guía para criterios objetivos (aplícalos siempre tal cual):
+    - Clima frío: solo si la temperatura media anual es menor o igual a 13°C.
+    - Ciudad pequeña: solo si la población es menor o igual a 150.000 habitantes. Por ejemplo 300.000 habitantes es una ciudad grande y 120000 habitantes una ciudad pequeña.
+    - Región, idioma y requisitos: comparar si lo que ha puesto el usuario se coresponde con los datos exactos proporcionados.
+    - Si existen diferencias relevantes, indícalas claramente. Ejemplo:
+      “Este destino NO cumple tu preferencia de clima frío, ya que la temperatura media es 16.9°C (clima templado)...”
+    - Si todo se cumple, indícalo explícitamente: “El destino cumple todos los requisitos objetivos del usuario.”
+9. Si el usuario especificó que NO desea algún país, ciudad o destino concreto (“no quiero ir a Polonia”, “cualquier sitio menos Italia”), jamás recomiendes ese destino, aunque se ajuste a otras preferencias.
+
+**Revisa todos estos puntos antes de generar tu recomendación final. Es obligatorio reflejar los criterios no cumplidos antes de justificar la elección.**
+
+Responde con este formato, rellenando cada dato con los del destino elegido tal como aparecen en su ficha:
+
+🎓 **DESTINO RECOMENDADO:**
+[Universidad] en [Ciudad], [País]
+
+
+🎯 **POR QUÉ ES PERFECTO PARA TI:**
+[IMPORTANTE: Conecta explícitamente con sus preferencias iniciales del cuestionario. Ejemplo: "Te recomiendo este destino porque cumple con tu nivel de [idioma], tu preferencia por [clima], [región] y [tamaño de ciudad]. Además, basándome en tu descripción donde buscabas [X, Y, Z]..."]
+[IMPORTANTE: Si no cumple con alguna característica también se debe detallar. Ejemplo: "Aunque no se encuentre en la [región] y el [clima] no se corresponda con tu preferencia, lo sigo considerando la mejor opción analizando tu descripción donde buscabas [X, Y, Z] "]
+[Continúa explicando en 4-5 líneas cómo este destino específico cumple o no con clima, localización, coste, ambiente, edad de la población y por qué encaja perfectamente con sus preferencias.]
+
+
+
+🏛️ **ATRACTIVOS IMPERDIBLES DEL PAÍS:**
+[Lista 3-4 atractivos turísticos específicos del país, explicando brevemente por qué son relevantes para lo que el estudiante busca]
+
+🌍 **SOBRE EL PAÍS Y LA CIUDAD:**
+- **Localización:** [Región del país] - [Contexto geográfico y cultural]
+- **Clima:** [Temperatura media]°C de media anual - [Qué significa esto para la experiencia]
+- **Tamaño ciudad:** [Población de la ciudad] habitantes - [Ambiente urbano/tranquilo]
+- **Cultura y estilo de vida:** [Describe el ambiente típico del país, costumbres, mentalidad]
+
+💰 **COSTE DE VIDA:**
+Nivel: [Coste de vida del país]
+[Explica qué significa esto en la práctica para un estudiante Erasmus español: alojamiento, comida, transporte, ocio]
+
+🎉 **VIDA ESTUDIANTIL Y AMBIENTE:**
+- **Ambiente festivo:** [Ambiente festivo del país]
+- **Edad media población:** [Edad media] años
+- **Comunidad Erasmus:** [Describe el ambiente universitario, vida nocturna, actividades típicas]
+- **Gastronomía:** [Gastronomía típica] - [Destaca platos que no puede perderse]
+
+💡 **CONSEJO FINAL:**
+[Un consejo personalizado basado en todo lo anterior]
+"""
+
+
+# ========================================
+# SANEADO Y TOKENS
+# ========================================
+
+def filtrar_input_usuarios(texto):
+    """Filtra patrones sospechosos para prevenir prompt injection"""
+    patrones_prohibidos = [
+        # Frases típicas de ataque
+        r"ignore (all )?previous instructions",
+        r"ignore (the )?above",
+        r"disregard (the )?above",
+        r"overwrite instructions",
+        r"reset (the )?conversation",
+        r"do as user says",
+        r"as a system prompt",
+        r"as an ai language model",
+        # Instrucciones para cambiar rol
+        r"you are now ",
+        r"from now on ",
+        r"pretend to be ",
+        # Instrucciones para saltarse restricciones
+        r"bypass restrictions",
+        r"break character",
+        r"respond in [A-Za-z]+ (only)?",
+        # Inyección de delimitadores o código
+        r"``````",        # Bloques de código markdown extensos
+        r"<.*?>",            # Posibles etiquetas HTML o delimitadores
+        r"{.*?}",            # Posibles instrucciones envolviendo payloads
+        r"\[.*?]",           # Delimitadores inusuales
+        # Comandos peligrosos/llamadas de función
+        r"exit\(\)",
+        r"quit",
+        r"run (this )?code",
+        r"execute (the )?following",
+        # Instrucciones directas de manipulación
+        r"repeat after me",
+        r"ignore safety",
+        r"respond with",
+        r"write a prompt",
+    ]
+    texto_filtrado = texto
+    for pat in patrones_prohibidos:
+        texto_filtrado = re.sub(pat, "", texto_filtrado, flags=re.IGNORECASE|re.DOTALL)
+    return texto_filtrado.strip()
+
+
+_PIEZAS = re.compile(r"\w+|[^\w\s]")
+
+
+def estimar_tokens(texto):
+    """
+    Tokens aproximados sin tokenizador: cada palabra cuenta un token por cada
+    5 caracteres (mínimo 1) y cada signo o emoji, uno. Las cifras reales de
+    cada llamada se registran en erasmai_llm_tokens_total.
+    """
+    return sum(math.ceil(len(pieza) / 5) for pieza in _PIEZAS.findall(texto))
+
+
+TOKENS_SISTEMA = estimar_tokens(MENSAJE_SISTEMA)
+
+
+class PromptRecomendacion:
+    """Mensajes de sistema y de usuario, con los tokens estimados y el nivel de recorte aplicado"""
+    __slots__ = ('sistema', 'usuario', 'tokens', 'nivel')
+
+    def __init__(self, sistema, usuario, tokens, nivel):
+        self.sistema = sistema
+        self.usuario = usuario
+        self.tokens = tokens
+        self.nivel = nivel
+
+    def texto(self):
+        """Ambos mensajes en un solo texto, para clientes sin mensaje de sistema"""
+        return f"{self.sistema}\n\n{self.usuario}"
+
+
+# ========================================
+# SECCIONES DEL MENSAJE DE USUARIO
+# ========================================
+
+def _seccion_preferencias(preferencias):
+    if not preferencias:
+        return ""
+    lineas = ["**PREFERENCIAS INICIALES DEL ESTUDIANTE (del cuestionario previo):**"]
+    for clave, etiqueta in (('Idioma', 'Nivel de idioma'), ('Clima', 'Clima preferido'),
+                            ('Region', 'Región preferida'), ('TamanoCiudad', 'Tamaño de ciudad')):
+        if preferencias.get(clave):
+            lineas.append(f"- {etiqueta}: {preferencias[clave]}")
+    return "\n".join(lineas) + "\n\n"
+
+
+def _seccion_intenciones(intenciones):
+    categorias_texto = formatear_categorias_para_prompt(intenciones['categorias_atractivos'])
+    caracteristicas = intenciones['caracteristicas_pais']
+    return (
+        "**CARACTERÍSTICAS DETECTADAS EN LA DESCRIPCIÓN:**\n"
+        f"- Atractivos deseados: {categorias_texto if intenciones['categorias_atractivos'] else 'No especificados'}\n"
+        f"- Coste bajo: {'Sí' if caracteristicas['coste_bajo'] else 'No'}\n"
+        f"- Ambiente festivo: {'Sí' if caracteristicas['fiesta_alta'] else 'No'}\n"
+        f"- Ambiente joven: {'Sí' if caracteristicas['ambiente_joven'] else 'No'}\n\n"
+    )
+
+
+def _seccion_candidatos(candidatos):
+    partes = [f"**TOP {len(candidatos)} DESTINOS CANDIDATOS:**\n"]
+    for i, dest in enumerate(candidatos, 1):
+        pob = f"{dest.poblacion:,}".replace(',', '.') if dest.poblacion is not None else "N/A"
+        partes.append(
+            f"{i}. **{dest.universidad}** — {dest.ciudad} ({pob} hab.), {dest.pais}\n"
+            f"   📊 Base {dest.puntuacion_base or 0:.0f} pts · características +{dest.puntos_caracteristicas:.0f} pts "
+            f"· total {dest.puntuacion_total or 0:.0f} pts (solo orientativas)\n"
+        )
+    return "".join(partes) + "\n"
+
+
+def _ficha_pais(dest, max_atractivos, largo_descripcion):
+    partes = [
+        f"### {dest.pais.title() if dest.pais else 'N/A'} ({dest.localizacion})\n"
+        f"- Temperatura media: {dest.temperatura}°C\n"
+        f"- Coste de vida: {dest.coste_vida}\n"
+        f"- Ambiente festivo: {dest.ambiente_fiesta}\n"
+        f"- Edad media población: {dest.edad_media} años\n"
+        f"- Gastronomía típica: {dest.comidas_tipicas}\n"
+    ]
+    atractivos = dest.atractivos_destacados[:max_atractivos]
+    if atractivos:
+        partes.append("- 🏛️ Atractivos destacados:\n")
+    for j, atr in enumerate(atractivos, 1):
+        linea = f"  {j}. **{atr.nombre}** ⭐ {atr.rating}/5 — {', '.join(atr.categorias[:4])}"
+        if atr.visitantes:
+            linea += f" — {atr.visitantes:,} visitantes/año".replace(',', '.')
+        partes.append(linea + "\n")
+        if largo_descripcion and atr.descripcion:
+            partes.append(f"     {atr.descripcion[:largo_descripcion]}...\n")
+    return "".join(partes) + "\n"
+
+
+def _seccion_paises(candidatos, max_atractivos, largo_descripcion):
+    """Una ficha por país, aunque varios candidatos lo compartan"""
+    vistos = {}
+    for dest in candidatos:
+        vistos.setdefault(dest.pais, dest)
+    fichas = (_ficha_pais(dest, max_atractivos, largo_descripcion) for dest in vistos.values())
+    return "**🌍 FICHA DE CADA PAÍS:**\n\n" + "".join(fichas)
+
+
+# ========================================
+# CONSTRUCCIÓN
+# ========================================
+
+def construir_prompt_recomendacion(descripcion_usuario, candidatos_finales, intenciones, preferencias_iniciales=None,
+                                   presupuesto=None):
+    """
+    Construye los mensajes con los que Llama-3 analiza los candidatos y elige destino
+
+    Args:
+        presupuesto: tokens estimados máximos (sistema + usuario); None usa
+            ERASMAI_PRESUPUESTO_PROMPT y 0 no recorta
+
+    Returns:
+        PromptRecomendacion con el nivel de detalle más alto que cabe; si ni
+        sin atractivos cabe, se acorta también la descripción del estudiante
+    """
+    if presupuesto is None:
+        presupuesto = PRESUPUESTO_POR_DEFECTO
+    descripcion = filtrar_input_usuarios(descripcion_usuario)
+    fijo = _seccion_preferencias(preferencias_iniciales) + _seccion_intenciones(intenciones)
+    candidatos = _seccion_candidatos(candidatos_finales)
+
+    def montar(descripcion, max_atractivos, largo_descripcion):
+        return (
+            fijo
+            + f"**LO QUE EL ESTUDIANTE BUSCA (descripción libre final):**\n\"{descripcion}\"\n\n"
+            + candidatos
+            + _seccion_paises(candidatos_finales, max_atractivos, largo_descripcion)
+        )
+
+    for nivel, (max_atractivos, largo_descripcion) in enumerate(NIVELES):
+        usuario = montar(descripcion, max_atractivos, largo_descripcion)
+        tokens = TOKENS_SISTEMA + estimar_tokens(usuario)
+        if not presupuesto or tokens <= presupuesto:
+            return PromptRecomendacion(MENSAJE_SISTEMA, usuario, tokens, nivel)
+
+    sobrante = tokens - presupuesto
+    largo = max(MINIMO_DESCRIPCION, len(descripcion) - sobrante * 5)
+    if largo < len(descripcion):
+        usuario = montar(descripcion[:largo] + "...", 0, 0)
+        tokens = TOKENS_SISTEMA + estimar_tokens(usuario)
+    return PromptRecomendacion(MENSAJE_SISTEMA, usuario, tokens, len(NIVELES))
@@ -1,28 +1,29 @@
 
-from neo4j import GraphDatabase
 from llama_index.core.query_engine import BaseQueryEngine
 from llama_index.core.callbacks import CallbackManager
 import json
 import re
-from difflib import get_close_matches
-from intenciones_matcher import extraer_intenciones, construir_clausulas_puntuacion, formatear_categorias_para_prompt
-from rag_funciones import buscar_destinos_por_intenciones, enriquecer_con_puntuaciones, recomendar_con_llama, ajustar_puntos_por_cantidad_atractivos
-from groq import Groq
-from dotenv import load_dotenv
-import os
+import time
+from acceso_neo4j import BaseDatosNoDisponible, leer
+from buscador_difuso import BuscadorDifuso
+from intenciones_matcher import NIVEL_MAPA, extraer_intenciones, construir_clausulas_puntuacion
+from rag_funciones import anadir_relevancia_texto, buscar_recomendacion, recomendar_con_llama_stream
+from consultas_cypher import (
+    CONSULTA_DESTINOS, CONSULTA_INTENCIONES, CONSULTA_PERFILES_PAISES, CONSULTA_RECOMENDACION,
+    parametros_busqueda, parametros_recomendacion
+)
+from perfiles_categorias import PerfilesCategorias, mascara_de_categorias
+from perfiles_paises import PerfilesPaises
+import precarga
+import refinamiento
+from resultados import Candidato, Destino, PerfilPais
+from recursos import obtener_recursos
+from metricas import logger, span, exportar, configurar, TURNOS, FILAS
 
-load_dotenv()
 
-
-NIVEL_MAPA = {'A1': 1, 'A2': 2, 'B1': 3, 'B2': 4, 'C1': 5, 'C2': 6}
 def nivel_a_numero(nivel):
     return NIVEL_MAPA.get(nivel.upper(), 0)
 
-URI = "bolt://localhost:7687"
-USER = "neo4j"
-PASSWORD = "Contraseña1."
-DATABASE = "neo4j"
-
 
 CARRERAS_NEO4J = [
     "derecho", "ciencia de los alimentos", "veterinaria", "biología",
@@ -95,74 +96,99 @@ def normalizar_texto(texto):
         texto = texto.replace(old, new)
     return texto
 
+# Índice de carreras y alias, construido una sola vez al importar
+BUSCADOR_CARRERAS = BuscadorDifuso(CARRERAS_NEO4J, ALIAS_CARRERAS)
+
 def validar_carrera(texto_usuario):
-    """Valida y mapea la entrada del usuario a una carrera oficial"""
-    texto_limpio = texto_usuario.strip().lower()
-    texto_normalizado = normalizar_texto(texto_limpio)
-    
-   
-    for carrera in CARRERAS_NEO4J:
-        if texto_limpio == carrera or texto_normalizado == normalizar_texto(carrera):
-            return carrera, carrera.title()
+    """Valida y mapea la entrada del usuario a una carrera oficial (None si no hay una clara)"""
+    carrera = BUSCADOR_CARRERAS.mejor(texto_usuario)
+    if carrera is None:
+        return None, None
+    return carrera, carrera.title()
+
+def sugerir_carreras(texto_usuario, n=3):
+    """Carreras más parecidas al texto, con su puntuación, para proponerlas al usuario"""
+    return BUSCADOR_CARRERAS.buscar(texto_usuario, n=n, umbral=0.45)
+
+def extraer_certificados(texto):
+    """Extrae certificados del texto del usuario"""
+    texto_lower = texto.lower()
     
-  
-    if texto_normalizado in ALIAS_CARRERAS:
-        carrera_oficial = ALIAS_CARRERAS[texto_normalizado]
-        return carrera_oficial, carrera_oficial.title()
+    if "no" in texto_lower and ("tengo" in texto_lower or "certificado" in texto_lower):
+        return "NO"
+    if texto_lower.strip() == "no":
+        return "NO"
     
-  
-    for carrera in CARRERAS_NEO4J:
-        if texto_normalizado in normalizar_texto(carrera):
-            return carrera, carrera.title()
-        if normalizar_texto(carrera) in texto_normalizado:
-            return carrera, carrera.title()
+    certificados = []
+    idiomas = {
+        'ingles': 'ingles', 'inglés': 'ingles', 'english': 'ingles',
+        'frances': 'frances', 'francés': 'frances', 'french': 'frances',
+        'aleman': 'aleman', 'alemán': 'aleman', 'german': 'aleman',
+        'italiano': 'italiano', 'italian': 'italiano',
+        'portugues': 'portugues', 'português': 'portugues', 'portuguese': 'portugues'
+    }
     
-   
-    carreras_normalizadas = [normalizar_texto(c) for c in CARRERAS_NEO4J]
-    matches = get_close_matches(texto_normalizado, carreras_normalizadas, n=1, cutoff=0.7)
+    patron = r'([ABC][12])\s*(?:de\s+)?(\w+)'
+    matches = re.findall(patron, texto, re.IGNORECASE)
     
-    if matches:
-        idx = carreras_normalizadas.index(matches[0])
-        carrera_oficial = CARRERAS_NEO4J[idx]
-        return carrera_oficial, carrera_oficial.title()
+    for nivel, idioma in matches:
+        idioma_lower = idioma.lower()
+        if idioma_lower in idiomas:
+            certificados.append({
+                'idioma': idiomas[idioma_lower],
+                'nivel': nivel.upper()
+            })
     
-    return None, None
+    return certificados if certificados else None
+
+
+# Respuestas válidas del cuestionario -> valor interno
+TAMANOS_CIUDAD = {
+    'grande': 'grande', 'grandes': 'grande',
+    'pequeña': 'pequena', 'pequena': 'pequena', 'pequeñas': 'pequena',
+    'pequenas': 'pequena', 'pequeño': 'pequena', 'pequeno': 'pequena',
+}
 
-print("🔄 Conectando a Neo4j...")
-driver = GraphDatabase.driver(URI, auth=(USER, PASSWORD))
-print("✅ Driver de Neo4j inicializado.")
-print("🔄 Inicializando LLM (Groq Llama-3.1)...")
+REGIONES_VALIDAS = {
+    'norte': 'norte de europa',
+    'sur': 'sur de europa',
+    'este': 'este de europa',
+    'oeste': 'oeste de europa'
+}
 
+CLIMAS = {'frio': 'frio', 'frío': 'frio', 'calor': 'calor'}
 
-groq_client = Groq(api_key=os.getenv("GROQ_API_KEY"))
 
+def construir_preferencias(certificados, tamano_ciudad, region_europa, preferencia_clima):
+    """Preferencias del cuestionario tal como se muestran en el prompt final"""
+    return {
+        'Idioma': f"{certificados}" if certificados != "NO" else "Sin certificados",
+        'Clima': preferencia_clima.title() if preferencia_clima else "No especificado",
+        'Region': region_europa.replace('de europa', 'de Europa') if region_europa else "No especificada",
+        'TamanoCiudad': 'Grande (>150k hab.)' if tamano_ciudad == 'grande' else 'Pequeña (<150k hab.)' if tamano_ciudad else "No especificado"
+    }
 
-class GroqLLM:
-    def __init__(self, client, model="llama-3.1-8b-instant"):
-        self.client = client
-        self.model = model
-    
-    def complete(self, prompt):
-        completion = self.client.chat.completions.create(
-            model=self.model,
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.7,
-            max_tokens=1500
-        )
-        
-        class Response:
-            def __init__(self, text):
-                self.text = text
-        
-        return Response(completion.choices[0].message.content)
 
-llm = GroqLLM(groq_client, model="llama-3.1-8b-instant")
-print("✅ LLM (Groq Llama-3.1-8b-instant) listo.")
+MENSAJE_AJUSTES = (
+    "\n\n---\n\n"
+    "¿Quieres afinarla? Pídeme **otra opción**, descarta un país (**sin Italia**) o dale "
+    "**más peso** a algo (**más peso a la playa**). Para empezar de cero, pulsa "
+    "**'Reiniciar conversación'** en el menú lateral. ¡Mucha suerte! 🍀"
+)
+
+
+MENSAJE_BD_NO_DISPONIBLE = (
+    "⚠️ Ahora mismo no puedo consultar los destinos: la base de datos está saturada o no responde.\n\n"
+    "Vuelve a enviarme tu respuesta en unos segundos."
+)
+
 
 class CypherQueryEngine(BaseQueryEngine):
     def __init__(self, driver, database):
         self.driver = driver
         self.database = database
+        self.perfiles = PerfilesCategorias()
+        self.paises = PerfilesPaises()
         super().__init__(callback_manager=CallbackManager())
     
     def _get_prompt_modules(self):
@@ -171,130 +197,141 @@ class CypherQueryEngine(BaseQueryEngine):
     async def _aquery(self, query_bundle):
         return self._query(query_bundle)
     
-    def _query_data(self, cypher_query: str, params: dict):
-        with self.driver.session(database=self.database) as session:
-            result = session.run(cypher_query, params).data()
-        return result
+    def perfiles_categorias(self):
+        """Máscaras de categorías por país, cargadas de Neo4j en el primer uso"""
+        if not self.perfiles.cargado:
+            self.refrescar_perfiles()
+        return self.perfiles
+    
+    def perfiles_paises(self):
+        """Datos y atractivos destacados de cada país, cargados de Neo4j en el primer uso"""
+        if not self.paises.cargado:
+            self.refrescar_perfiles()
+        return self.paises
+
+    def refrescar_perfiles(self):
+        """Recalcula máscaras y perfiles de país con una sola consulta; llamar tras recargar los datos"""
+        filas = self._query_data(CONSULTA_PERFILES_PAISES, {}, nombre="perfiles_paises")
+        self.perfiles.refrescar({fila['Pais']: fila['Categorias'] for fila in filas})
+        self.paises.refrescar(PerfilPais.desde_fila(fila) for fila in filas)
+
+    def invalidar_perfiles(self):
+        """Los perfiles se vuelven a leer en el siguiente uso (los datos de Neo4j han cambiado)"""
+        self.perfiles.cargado = False
+        self.paises.invalidar()
+    
+    def _query_data(self, cypher_query: str, params: dict, nombre="consulta"):
+        return leer(self.driver, self.database, cypher_query, params, nombre=nombre)
+    
+    def _query_registros(self, cypher_query: str, params: dict, tipo, nombre="consulta"):
+        """Como _query_data, pero construye directamente los registros de resultados.py"""
+        return leer(self.driver, self.database, cypher_query, params, transformar=tipo.desde_fila, nombre=nombre)
     
     def _query(self, query_bundle):
+        """Adaptador JSON para LlamaIndex; el asistente usa buscar() directamente"""
         try:
             llm_params = json.loads(query_bundle.query)
         except json.JSONDecodeError:
             return json.dumps({"error": "JSON inválido"})
         
         carrera_input = llm_params.get("carrera", "").lower()
-        certificados_input = llm_params.get("certificados")
-        tamano_ciudad = llm_params.get("tamano_ciudad")
-        region_europa = llm_params.get("region_europa")
-        preferencia_clima = llm_params.get("preferencia_clima")
-        
         if not carrera_input:
             return json.dumps({"error": "Falta carrera"})
-    
-        params = {"carrera_input": carrera_input}
-        where_idioma_clause = []
-    
-        
-        if certificados_input == "NO":
-            where_idioma_clause.append("o.cert_obligatorio = 'NO'")
-    
         
-        elif isinstance(certificados_input, list) and certificados_input:
-            opciones = ["o.cert_obligatorio = 'NO'"]
-            for cert in certificados_input:
-                user_idioma = normalizar_texto(cert.get('idioma', ''))
-                if user_idioma:
-                    opciones.append(
-                        f"(o.cert_obligatorio = 'SI' AND toLower(o.nivel_requerido) CONTAINS '{user_idioma}')"
-                    )
-            where_idioma_clause.append('(' + ' OR '.join(opciones) + ')')
-    
-        filtro_idioma_final = " AND ".join(where_idioma_clause) if where_idioma_clause else "1=1"
-    
-    
-        if tamano_ciudad == 'grande':
-            puntos_ciudad = "CASE WHEN l.poblacion >= 156000 THEN 70 ELSE 0 END"
-        elif tamano_ciudad == 'pequena':
-            puntos_ciudad = "CASE WHEN l.poblacion < 156000 THEN 70 ELSE 0 END"
-        else:
-            puntos_ciudad = "0"
+        resultados = self.buscar(
+            carrera_input,
+            llm_params.get("certificados"),
+            llm_params.get("tamano_ciudad"),
+            llm_params.get("region_europa"),
+            llm_params.get("preferencia_clima")
+        )
+        return json.dumps([r.a_dict() for r in resultados], indent=2, ensure_ascii=False)
     
-       
-        if region_europa:
-            puntos_region = f"CASE WHEN p.localizacion = '{region_europa}' THEN 70 ELSE 0 END"
-        else:
-            puntos_region = "0"
-        
-       
-        if preferencia_clima == 'frio':
-            puntos_clima = "CASE WHEN p.temp_media_anual < 11.4 THEN 50 ELSE 0 END"
-        elif preferencia_clima == 'calor':
-            puntos_clima = "CASE WHEN p.temp_media_anual >= 11.4 THEN 50 ELSE 0 END"
-        else:
-            puntos_clima = "0"
+    def buscar(self, carrera, certificados, tamano_ciudad, region_europa, preferencia_clima):
+        """Etapa 1: destinos de la carrera filtrados y puntuados (list de Destino)"""
+        niveles = {}
+        if isinstance(certificados, list):
+            for cert in certificados:
+                idioma = normalizar_texto(cert.get('idioma', ''))
+                niveles[idioma] = max(niveles.get(idioma, 0), nivel_a_numero(cert.get('nivel', '')))
+        
+        params = parametros_busqueda(
+            carrera, certificados, niveles,
+            tamano_ciudad, region_europa, preferencia_clima
+        )
     
-        query = f"""
-            MATCH (c:Carrera {{nombre: $carrera_input}})
-                -[o:OFERTA]->(u:Universidad)
-            MATCH (u)-[:SITUADA_EN]->(l:Ciudad)-[:UBICADA_EN]->(p:Pais)
-            WHERE toInteger(o.numero_de_plazas) > 0
-              AND ({filtro_idioma_final})
-            WITH u, o, p, l,
-                ((toFloat(686 - u.ranking_uni)*0.1) + (u.exchange_score * 0.2) 
-                 + ({puntos_ciudad}) + ({puntos_region}) + ({puntos_clima})) AS PuntuacionCompuesta
-            RETURN DISTINCT u.nombre AS Universidad,
-                   p.nombre AS Pais,
-                   p.localizacion AS Localizacion_Pais,
-                   p.temp_media_anual AS Temperatura_Media,
-                   l.nombre AS Ciudad,
-                   l.poblacion AS Poblacion,
-                   o.numero_de_plazas AS Plazas_Disponibles,
-                   o.duracion_de_estancia AS Duracion_Meses,
-                   o.cert_obligatorio AS Certificado_Obligatorio,
-                   o.nivel_requerido AS Nivel_Requerido,
-                   PuntuacionCompuesta
-            ORDER BY PuntuacionCompuesta DESC
+        return self._query_registros(CONSULTA_DESTINOS, params, Destino, nombre="destinos")
+
+    def buscar_por_intenciones(self, universidades, intenciones):
+        """Etapa 2 por separado: candidatos de 'universidades' con los puntos de las intenciones (list de Candidato)"""
+        clausulas = construir_clausulas_puntuacion(intenciones)
+        params = {'universidades': universidades, **clausulas['parametros']}
+
+        resultados = self._query_registros(CONSULTA_INTENCIONES, params, Candidato, nombre="intenciones")
+        self.perfiles_paises().completar(resultados)
+
+        perfiles = self.perfiles_categorias()
+        mascara = mascara_de_categorias(clausulas['categorias_buscar'])
+        for candidato in resultados:
+            candidato.puntos_caracteristicas += perfiles.obtener(candidato.pais).puntos_presencia(mascara)
+        return resultados
+
+    def buscar_recomendacion(self, destinos, intenciones, k=5, precarga=None):
         """
-    
-        resultados = self._query_data(query, params)
-        
-        if isinstance(certificados_input, list) and certificados_input:
-            resultados_filtrados = []
-            for uni in resultados:
-                if uni.get('Certificado_Obligatorio') == 'NO':
-                    resultados_filtrados.append(uni)
-                    continue
-    
-                nivel_req = uni.get('Nivel_Requerido', '').strip().lower()
-                matches = re.findall(r'([abc][12])\s+([a-z]+)', nivel_req)
-    
-                acepta = False
-                for cert in certificados_input:
-                    user_idioma = normalizar_texto(cert.get('idioma', ''))
-                    user_nivel = cert.get('nivel', '').upper()
-                    user_nivel_num = NIVEL_MAPA.get(user_nivel, 0)
-                    for nivel_req_str, idioma_req in matches:
-                        nivel_req_num = NIVEL_MAPA.get(nivel_req_str.upper(), 0)
-                        if idioma_req == user_idioma and user_nivel_num >= nivel_req_num:
-                            acepta = True
-                            break
-                    if acepta:
-                        break
-                if acepta:
-                    resultados_filtrados.append(uni)
-            resultados = resultados_filtrados
-    
-        return json.dumps(resultados, indent=2, ensure_ascii=False)
+        Etapa 2 y TOP k con una sola consulta (CONSULTA_RECOMENDACION): las
+        universidades viajan por id de nodo junto a su puntuación base y los
+        puntos de categorías de cada país se calculan antes con las máscaras
 
+        Args:
+            precarga: PrecargaCandidatos de precargar_candidatos(destinos); si
+                está lista no se consulta la base de datos
+        """
+        clausulas = construir_clausulas_puntuacion(intenciones)
+        mascara = mascara_de_categorias(clausulas['categorias_buscar'])
+        puntos_categorias = self.perfiles_categorias().puntos_por_pais(mascara)
+        for pais, puntos in intenciones.get('puntos_texto', {}).items():
+            puntos_categorias[pais] = puntos_categorias.get(pais, 0) + puntos
+
+        if precarga is not None:
+            top = precarga.top_k(clausulas['parametros'], puntos_categorias, k)
+            if top is not None:
+                return top
+        params = parametros_recomendacion(destinos, clausulas['parametros'], puntos_categorias, k)
+        top = self._query_registros(CONSULTA_RECOMENDACION, params, Candidato, nombre="recomendacion")
+        self.perfiles_paises().completar(top)
+        return top
+
+    def precargar_candidatos(self, destinos):
+        """Pide en segundo plano los países y atractivos de 'destinos' para buscar_recomendacion"""
+        return precarga.PrecargaCandidatos(self, destinos)
+
+
+# Compatibilidad: 'from recomendadorErasmus import llm, cypher_engine, ...'
+# sigue funcionando, pero ya no se crean al importar sino en el primer acceso
+_RECURSOS_COMPARTIDOS = {
+    'driver': 'driver',
+    'llm': 'llm',
+    'cypher_engine': 'motor',
+    'cache_recomendaciones': 'cache',
+}
 
 
-cypher_engine = CypherQueryEngine(driver=driver, database=DATABASE)
-print("✅ Motor de búsqueda listo.\n")
+def __getattr__(nombre):
+    if nombre in _RECURSOS_COMPARTIDOS:
+        return getattr(obtener_recursos(), _RECURSOS_COMPARTIDOS[nombre])
+    raise AttributeError(f"module {__name__!r} has no attribute {nombre!r}")
 
 class ErasmAIAssistant:
-    def __init__(self, llm, cypher_engine):
+    # Respuestas del cuestionario y descripción: bastan para reconstruir toda la conversación
+    CAMPOS_INSTANTANEA = ('estado', 'carrera_neo4j', 'carrera_display', 'certificados',
+                          'tamano_ciudad', 'region_europa', 'preferencia_clima', 'descripcion')
+    VERSION_INSTANTANEA = 1
+
+    def __init__(self, llm, cypher_engine, cache=None, indice=None):
         self.llm = llm
         self.cypher_engine = cypher_engine
+        self.cache = cache
+        self.indice = indice
         self.estado = "INICIO"
         self.carrera_neo4j = None
         self.carrera_display = None
@@ -302,41 +339,62 @@ class ErasmAIAssistant:
         self.tamano_ciudad = None
         self.region_europa = None 
         self.preferencia_clima = None
+        self.descripcion = None
         self.destinos_filtrados = []
         self.preferencias = {} 
+        self.ultimo_ttft = None
+        # Consultas lanzadas en segundo plano mientras el usuario responde (precarga.py)
+        self._precarga_destinos = None
+        self._precarga_candidatos = None
+        # Candidatos de la recomendación y ajustes pedidos después (REFINAMIENTO)
+        self.refinamiento = None
+        self._ajustes = None  # ajustes de una instantánea, hasta recalcular los candidatos
+
+    def a_instantanea(self):
+        """
+        Estado de la conversación como dict serializable en JSON. Los destinos
+        no se incluyen: se recalculan con una consulta si hacen falta tras
+        restaurar (y así nunca quedan ids de nodos obsoletos en el almacén).
+        """
+        instantanea = {campo: getattr(self, campo) for campo in self.CAMPOS_INSTANTANEA}
+        instantanea['ajustes'] = self.refinamiento.a_dict() if self.refinamiento is not None else self._ajustes
+        instantanea['v'] = self.VERSION_INSTANTANEA
+        return instantanea
+
+    @classmethod
+    def desde_instantanea(cls, instantanea, llm, cypher_engine, cache=None, indice=None):
+        """
+        Asistente con el estado de a_instantanea(). Una instantánea de otra
+        versión se ignora y la conversación empieza de nuevo.
+        """
+        asistente = cls(llm, cypher_engine, cache, indice)
+        if not instantanea or instantanea.get('v') != cls.VERSION_INSTANTANEA:
+            return asistente
+        for campo in cls.CAMPOS_INSTANTANEA:
+            setattr(asistente, campo, instantanea.get(campo))
+        asistente._ajustes = instantanea.get('ajustes')
+        if asistente.estado in ("RAG_DESCRIPCION", "REFINAMIENTO", "FINALIZADO"):
+            asistente.preferencias = construir_preferencias(
+                asistente.certificados, asistente.tamano_ciudad,
+                asistente.region_europa, asistente.preferencia_clima
+            )
+            asistente.destinos_filtrados = None  # pendientes de recalcular
+        return asistente
         
     def extraer_certificados(self, texto):
         """Extrae certificados del texto del usuario"""
-        texto_lower = texto.lower()
-        
-        if "no" in texto_lower and ("tengo" in texto_lower or "certificado" in texto_lower):
-            return "NO"
-        if texto_lower.strip() == "no":
-            return "NO"
-        
-        certificados = []
-        idiomas = {
-            'ingles': 'ingles', 'inglés': 'ingles', 'english': 'ingles',
-            'frances': 'frances', 'francés': 'frances', 'french': 'frances',
-            'aleman': 'aleman', 'alemán': 'aleman', 'german': 'aleman',
-            'italiano': 'italiano', 'italian': 'italiano',
-            'portugues': 'portugues', 'português': 'portugues', 'portuguese': 'portugues'
-        }
-        
-        patron = r'([ABC][12])\s*(?:de\s+)?(\w+)'
-        matches = re.findall(patron, texto, re.IGNORECASE)
-        
-        for nivel, idioma in matches:
-            idioma_lower = idioma.lower()
-            if idioma_lower in idiomas:
-                certificados.append({
-                    'idioma': idiomas[idioma_lower],
-                    'nivel': nivel.upper()
-                })
-        
-        return certificados if certificados else None
+        return extraer_certificados(texto)
     
     def procesar_mensaje(self, user_input):
+        estado = self.estado
+        TURNOS.inc(estado=estado)
+        with span(f"turno.{estado}") as s:
+            respuesta = self._procesar_estado(user_input)
+            s.anotar(siguiente=self.estado)
+        exportar()
+        return respuesta
+    
+    def _procesar_estado(self, user_input):
         if self.estado == "INICIO":
             self.estado = "CARRERA"
             return (
@@ -361,6 +419,13 @@ class ErasmAIAssistant:
                     f"➡️ **Si tienes varios, usa 'y':** (Ejemplo: `B1 Inglés y A1 Italiano`).\n\n"
                     f"➡️ **Si no tienes ninguno, escribe:** `NO`."
                 )
+            sugerencias = sugerir_carreras(user_input)
+            if sugerencias:
+                opciones = ", ".join(f"**{carrera.title()}**" for carrera, _ in sugerencias)
+                return (
+                    f"No tengo claro a qué carrera te refieres. ¿Es alguna de estas? {opciones}\n\n"
+                    "Escríbeme el nombre completo de tu carrera 🎓"
+                )
             else:
                 return (
                     "Lo siento, no he podido identificar tu carrera.\n\n"
@@ -380,6 +445,7 @@ class ErasmAIAssistant:
             if certificados_detectados == "NO":
                 self.certificados = "NO"
                 self.estado = "PREF_CIUDAD"
+                self._precargar_destinos()
                 return (
                     f"Perfecto. Ya sé que estudias {self.carrera_display} y que no cuentas con certificados de idioma.\n"
                     "Con esta información ya puedo reducir la lista de destinos disponibles.\n\n"
@@ -399,6 +465,7 @@ class ErasmAIAssistant:
             elif certificados_detectados:
                 self.certificados = certificados_detectados
                 self.estado = "PREF_CIUDAD" 
+                self._precargar_destinos()
                 certs_texto = ", ".join([f"{cert['nivel']} de {cert['idioma'].title()}" 
                                  for cert in certificados_detectados])
                 return (
@@ -430,12 +497,11 @@ class ErasmAIAssistant:
         elif self.estado == "PREF_CIUDAD":
             tamano = user_input.lower().strip()
             
-            if tamano in ['grande', 'grandes']:
-                self.tamano_ciudad = 'grande'
-                self.estado = "PREF_REGION"
-            elif tamano in ['pequeña', 'pequena', 'pequeñas', 'pequenas', 'pequeño', 'pequeno']:
-                self.tamano_ciudad = 'pequena'
+            if tamano in TAMANOS_CIUDAD:
+                self.tamano_ciudad = TAMANOS_CIUDAD[tamano]
                 self.estado = "PREF_REGION"
+                if self._precarga_destinos is not None:
+                    self._precarga_destinos.aplicar(tamano_ciudad=self.tamano_ciudad)
             else:
                 return "Por favor responde: 'grande' o 'pequeña'"
             
@@ -453,16 +519,11 @@ class ErasmAIAssistant:
         elif self.estado == "PREF_REGION":
             region = user_input.lower().strip()
             
-            regiones_validas = {
-                'norte': 'norte de europa',
-                'sur': 'sur de europa',
-                'este': 'este de europa',
-                'oeste': 'oeste de europa'
-            }
-            
-            if region in regiones_validas:
-                self.region_europa = regiones_validas[region]
+            if region in REGIONES_VALIDAS:
+                self.region_europa = REGIONES_VALIDAS[region]
                 self.estado = "PREF_CLIMA"
+                if self._precarga_destinos is not None:
+                    self._precarga_destinos.aplicar(region_europa=self.region_europa)
                 return (
                     "¡Perfecto! Ya tengo clara la región que prefieres.\n\n"
                     "**Última pregunta antes de buscar:** ¿Eres más de frío o de calor?\n\n"
@@ -482,13 +543,8 @@ class ErasmAIAssistant:
         elif self.estado == "PREF_CLIMA":
             clima = user_input.lower().strip()
             
-            if clima in ['frio', 'frío']:
-                self.preferencia_clima = 'frio'
-                self.estado = "BUSQUEDA"
-                return self.realizar_busqueda()
-            
-            elif clima in ['calor']:
-                self.preferencia_clima = 'calor'
+            if clima in CLIMAS:
+                self.preferencia_clima = CLIMAS[clima]
                 self.estado = "BUSQUEDA"
                 return self.realizar_busqueda()
             
@@ -500,87 +556,191 @@ class ErasmAIAssistant:
         
 
         elif self.estado == "RAG_DESCRIPCION":
-            descripcion_usuario = user_input
-            
-            print("\n🤖 Analizando tu descripción...")
-            
+            return "".join(self._responder_descripcion(user_input))
+
+        elif self.estado == "REFINAMIENTO":
+            return "".join(self._responder_refinamiento(user_input))
+
+        return (
+            "La recomendación ya ha sido realizada. Si deseas explorar otras opciones, "
+            "puedes reiniciar la conversación pulsando el botón **'Reiniciar conversación'** en el menú lateral."
+        )
+    
+    def procesar_mensaje_stream(self, user_input):
+        """
+        Como procesar_mensaje, pero devuelve la respuesta por trozos. Solo la
+        recomendación y sus ajustes se generan en streaming; el resto de
+        turnos llegan en un único trozo.
+        """
+        if self.estado in ("RAG_DESCRIPCION", "REFINAMIENTO"):
+            TURNOS.inc(estado=self.estado)
+            with span(f"turno.{self.estado}"):
+                if self.estado == "RAG_DESCRIPCION":
+                    yield from self._responder_descripcion(user_input)
+                else:
+                    yield from self._responder_refinamiento(user_input)
+            exportar()
+        else:
+            yield self.procesar_mensaje(user_input)
     
+    def _candidatos(self, descripcion_usuario):
+        """
+        Todos los candidatos puntuados (hasta refinamiento.CANDIDATOS) y las
+        intenciones de la descripción
+
+        Raises:
+            BaseDatosNoDisponible: si Neo4j no responde
+        """
+        with span("intenciones") as s:
             intenciones = extraer_intenciones(descripcion_usuario)
-            categorias_texto = formatear_categorias_para_prompt(intenciones['categorias_atractivos'])
-            print(f"✅ Categorías: {categorias_texto}")
-            
+            anadir_relevancia_texto(intenciones, descripcion_usuario, self.indice)
+            s.anotar(categorias=len(intenciones['categorias_atractivos']),
+                     paises_texto=len(intenciones.get('puntos_texto', ())))
+        logger.info("Categorías detectadas: %s", intenciones['categorias_atractivos'])
+
+        if self.destinos_filtrados is None:
+            self.destinos_filtrados = self._buscar_destinos()
+        candidatos = buscar_recomendacion(
+            self.cypher_engine,
+            self.destinos_filtrados,
+            intenciones,
+            k=refinamiento.CANDIDATOS,
+            precarga=self._precarga_candidatos
+        )
+        return candidatos, intenciones
 
-            candidatos_neo4j = buscar_destinos_por_intenciones(
-                self.cypher_engine, 
-                self.destinos_filtrados, 
-                intenciones
-            )
-            
-            if not candidatos_neo4j:
-                self.estado = "FINALIZADO"
-                return (
-                    "😔 No encontré destinos que cumplan esas características.\n"
-                    "Intenta con una descripción más flexible.\n\n"
-                )
-            
-            candidatos_neo4j = ajustar_puntos_por_cantidad_atractivos(candidatos_neo4j, intenciones)
-            
-            candidatos_finales = enriquecer_con_puntuaciones(
-                candidatos_neo4j, 
-                self.destinos_filtrados
-            )
-            
-            recomendacion = recomendar_con_llama(
-               self.llm, 
-               descripcion_usuario, 
-               candidatos_finales, 
-               intenciones,
-               self.preferencias
-            )
-      
+    def _responder_descripcion(self, descripcion_usuario):
+        inicio = time.perf_counter()
+        try:
+            candidatos, intenciones = self._candidatos(descripcion_usuario)
+        except BaseDatosNoDisponible as e:
+            logger.warning("%s", e)
+            yield MENSAJE_BD_NO_DISPONIBLE
+            return
+        
+        if not candidatos:
             self.estado = "FINALIZADO"
-            return (
-                f"\n{recomendacion}\n\n{'='*70}\n\n"
-                f"🎉 ¡Recomendación Finalizada! 🎉\n\n"
-                f"---"
-                f"Espero que esta sugerencia se ajuste a lo que buscabas. Si deseas explorar otras opciones, "
-                f"puedes reiniciar la conversación pulsando el botón **'Reiniciar conversación'** en el menú lateral. ¡Mucha suerte! 🍀"
+            yield (
+                "😔 No encontré destinos que cumplan esas características.\n"
+                "Intenta con una descripción más flexible.\n\n"
             )
+            return
+        
+        self.descripcion = descripcion_usuario
+        self.refinamiento = refinamiento.Refinamiento(candidatos, intenciones, self.cypher_engine.perfiles_categorias())
+        yield "\n"
+        yield from self._recomendar(descripcion_usuario, inicio)
+        self.estado = "REFINAMIENTO"
+        yield (
+            f"\n\n{'='*70}\n\n"
+            f"🎉 ¡Recomendación Finalizada! 🎉"
+            f"{MENSAJE_AJUSTES}"
+        )
 
-        return (
-            "La recomendación ya ha sido realizada. Si deseas explorar otras opciones, "
-            "puedes reiniciar la conversación pulsando el botón **'Reiniciar conversación'** en el menú lateral."
+    def _responder_refinamiento(self, texto):
+        """
+        Ajusta la recomendación ("otra opción", "sin Italia", "más peso a la
+        playa") reordenando los candidatos guardados y vuelve a pedir solo la
+        explicación al LLM. Tras restaurar una instantánea, los candidatos se
+        recalculan una vez a partir de la descripción.
+        """
+        inicio = time.perf_counter()
+        if self.refinamiento is None:
+            try:
+                candidatos, intenciones = self._candidatos(self.descripcion or "")
+            except BaseDatosNoDisponible as e:
+                logger.warning("%s", e)
+                yield MENSAJE_BD_NO_DISPONIBLE
+                return
+            self.refinamiento = refinamiento.Refinamiento.desde_dict(
+                self._ajustes, candidatos, intenciones, self.cypher_engine.perfiles_categorias()
+            )
+            self._ajustes = None
+
+        with span("refinamiento") as s:
+            orden = self.refinamiento.interpretar(texto)
+            s.anotar(siguiente=orden.siguiente, excluir=len(orden.excluir), pesos=len(orden.pesos))
+        if not orden:
+            yield refinamiento.AYUDA
+            return
+        ajustado = self.refinamiento.con(orden)
+        if not ajustado.top():
+            yield (
+                "😔 Con ese ajuste no queda ningún destino de tu lista, así que lo dejo como estaba.\n\n"
+                + refinamiento.AYUDA
+            )
+            return
+
+        self.refinamiento = ajustado
+        yield "\n"
+        yield from self._recomendar(f"{self.descripcion}\n\nAjuste pedido tras la primera recomendación: {texto}",
+                                    inicio)
+        yield MENSAJE_AJUSTES
+
+    def _recomendar(self, descripcion, inicio):
+        """Explicación del LLM sobre el TOP actual del refinamiento; anota la universidad que elige"""
+        top = self.refinamiento.top()
+        trozos = []
+        self.ultimo_ttft = None
+        for trozo in recomendar_con_llama_stream(
+           self.llm, 
+           descripcion, 
+           top, 
+           self.refinamiento.intenciones_ajustadas(),
+           self.preferencias,
+           cache=self.cache
+        ):
+            if self.ultimo_ttft is None:
+                self.ultimo_ttft = time.perf_counter() - inicio
+                logger.info("Primer token de la recomendación a los %.2f s", self.ultimo_ttft)
+            trozos.append(trozo)
+            yield trozo
+        self.refinamiento = self.refinamiento.con(
+            recomendada=refinamiento.universidad_elegida("".join(trozos), top)
         )
     
+    def _precargar_destinos(self):
+        """Con la carrera y los certificados ya fijos, pide en segundo plano todos sus destinos"""
+        if precarga.ACTIVADA:
+            self._precarga_destinos = precarga.PrecargaDestinos(self.cypher_engine, self.carrera_neo4j, self.certificados)
+
+    def _precargar_candidatos(self):
+        """Mientras el usuario escribe su descripción, trae los países y atractivos de sus destinos"""
+        if precarga.ACTIVADA:
+            self._precarga_candidatos = self.cypher_engine.precargar_candidatos(self.destinos_filtrados)
+
+    def _buscar_destinos(self):
+        with span("destinos", carrera=self.carrera_neo4j) as s:
+            resultados = None
+            if self._precarga_destinos is not None:
+                resultados = self._precarga_destinos.destinos(
+                    self.tamano_ciudad, self.region_europa, self.preferencia_clima
+                )
+                s.anotar(precarga=resultados is not None)
+            if resultados is None:
+                resultados = self.cypher_engine.buscar(
+                    self.carrera_neo4j,
+                    self.certificados,
+                    self.tamano_ciudad,
+                    self.region_europa,
+                    self.preferencia_clima
+                )
+            s.anotar(filas=len(resultados))
+        FILAS.observar(len(resultados), consulta="destinos")
+        return resultados
+
     def realizar_busqueda(self):
-        print("\n🔍 Buscando destinos en la base de datos...")
-        
-        self.preferencias = {
-            'Idioma': f"{self.certificados}" if self.certificados != "NO" else "Sin certificados",
-            'Clima': self.preferencia_clima.title() if self.preferencia_clima else "No especificado",
-            'Region': self.region_europa.replace('de europa', 'de Europa') if self.region_europa else "No especificada",
-            'TamanoCiudad': 'Grande (>150k hab.)' if self.tamano_ciudad == 'grande' else 'Pequeña (<150k hab.)' if self.tamano_ciudad else "No especificado"
-        }
-        
-        query_json = {
-            "carrera": self.carrera_neo4j,
-            "certificados": self.certificados,
-            "tamano_ciudad": self.tamano_ciudad,
-            "region_europa": self.region_europa,
-            "preferencia_clima": self.preferencia_clima
-        }
-        
-        class FakeQueryBundle:
-            def __init__(self, query):
-                self.query = query
-        
-        query_bundle = FakeQueryBundle(json.dumps(query_json))
-        resultado_json = self.cypher_engine._query(query_bundle)
+        self.preferencias = construir_preferencias(
+            self.certificados, self.tamano_ciudad, self.region_europa, self.preferencia_clima
+        )
         
         try:
-            resultados = json.loads(resultado_json)
-        except Exception as e:
-            return f"❌ Error al procesar resultados: {str(e)}"
+            resultados = self._buscar_destinos()
+        except BaseDatosNoDisponible as e:
+            logger.warning("%s", e)
+            # se vuelve a la última pregunta para que el usuario pueda reenviar su respuesta
+            self.estado = "PREF_CLIMA"
+            return MENSAJE_BD_NO_DISPONIBLE
         
         if not resultados:
             return (
@@ -590,6 +750,7 @@ class ErasmAIAssistant:
             )
         
         self.destinos_filtrados = resultados
+        self._precargar_candidatos()
         
         num_total = len(resultados)
         mostrar = resultados[:5] if num_total > 5 else resultados
@@ -604,11 +765,11 @@ class ErasmAIAssistant:
         respuesta += "=" * 70 + "\n\n"
         
         for i, dest in enumerate(mostrar, 1):
-            pob = f"{dest['Poblacion']:,}".replace(',', '.')
-            temp = dest.get('Temperatura_Media', 'N/A')
-            respuesta += f"{i}. 🎓 **{dest['Universidad']}**\n\n"
-            respuesta += f"   📍 {dest['Ciudad']} ({pob} hab.), {dest['Pais']}\n\n"
-            respuesta += f"   🌍 Región: {dest.get('Localizacion_Pais', 'N/A').replace('de europa', 'de Europa')}\n\n"
+            pob = f"{dest.poblacion:,}".replace(',', '.') if dest.poblacion is not None else "N/A"
+            temp = dest.temperatura_media
+            respuesta += f"{i}. 🎓 **{dest.universidad}**\n\n"
+            respuesta += f"   📍 {dest.ciudad} ({pob} hab.), {dest.pais}\n\n"
+            respuesta += f"   🌍 Región: {(dest.localizacion_pais or 'N/A').replace('de europa', 'de Europa')}\n\n"
             respuesta += f"   🌡️ Temperatura media: {temp}°C\n"
         
         respuesta += "=" * 70 + "\n\n"
@@ -629,7 +790,10 @@ class ErasmAIAssistant:
 
 
 def cli_loop():
-    assistant = ErasmAIAssistant(llm, cypher_engine)
+    configurar()
+    recursos = obtener_recursos()
+    recursos.calentar()
+    assistant = ErasmAIAssistant(recursos.llm, recursos.motor, recursos.cache, recursos.indice)
     print("=" * 70)
     print("  🎓 ERASMAI - ASISTENTE DE RECOMENDACIÓN ERASMUS 🌍")
     print("     Universidad de León")
@@ -643,8 +807,10 @@ def cli_loop():
             user_input = input("👤 Tú: ").strip()
             if not user_input:
                 continue
-            respuesta = assistant.procesar_mensaje(user_input)
-            print(f"\n🤖 ErasmAI: {respuesta}\n")
+            print("\n🤖 ErasmAI: ", end="", flush=True)
+            for trozo in assistant.procesar_mensaje_stream(user_input):
+                print(trozo, end="", flush=True)
+            print("\n")
             print("-" * 70)
             print()
         except KeyboardInterrupt:
@@ -654,7 +820,7 @@ def cli_loop():
             print(f"\n❌ ERROR: {e}\n")
             import traceback
             traceback.print_exc()
-    driver.close()
+    recursos.cerrar()
     print("\n✅ Sesión cerrada. ¡Gracias por usar ErasmAI!\n")
 
 if __name__ == "__main__":
@@ -0,0 +1,213 @@
+"""
+Recursos compartidos del proceso (driver de Neo4j, LLM, motor de búsqueda, caché,
+almacén del estado de las conversaciones e índice de texto), creados de forma perezosa en el primer uso
+"""
+
+import os
+import threading
+
+from dotenv import load_dotenv
+
+from metricas import logger
+
+load_dotenv()
+
+
+URI = os.getenv("NEO4J_URI", "bolt://localhost:7687")
+USER = os.getenv("NEO4J_USER", "neo4j")
+PASSWORD = os.getenv("NEO4J_PASSWORD", "Contraseña1.")
+DATABASE = os.getenv("NEO4J_DATABASE", "neo4j")
+
+# "neo4j" (por defecto) o "memoria" para usar el catálogo cargado desde data/
+BACKEND = os.getenv("ERASMAI_BACKEND", "neo4j").lower()
+
+MODELO_LLM = os.getenv("ERASMAI_MODELO", "llama-3.1-8b-instant")
+
+
+class Recursos:
+    """
+    Fábrica perezosa de los recursos pesados. Cada uno se crea la primera vez
+    que se pide (bajo un lock, así que varias sesiones de Streamlit que
+    llegan a la vez comparten la misma instancia) y nada se conecta al
+    importar el módulo.
+    """
+
+    def __init__(self, backend=BACKEND, uri=URI, user=USER, password=PASSWORD,
+                 database=DATABASE, modelo=MODELO_LLM):
+        self.backend = backend
+        self.uri = uri
+        self.user = user
+        self.password = password
+        self.database = database
+        self.modelo = modelo
+        self._lock = threading.RLock()
+        self._driver = None
+        self._llm = None
+        self._motor = None
+        self._cache = None
+        self._cache_creada = False
+        self._almacen = None
+        self._indice = None
+        self._indice_creado = False
+        self._version_datos = None
+        self.calentado = False
+
+    @property
+    def driver(self):
+        """Driver de Neo4j (None con el backend en memoria)"""
+        if self.backend == "memoria":
+            return None
+        with self._lock:
+            if self._driver is None:
+                from neo4j import GraphDatabase
+                from acceso_neo4j import configuracion_driver
+                self._driver = GraphDatabase.driver(self.uri, auth=(self.user, self.password),
+                                                    **configuracion_driver())
+                logger.info("Driver de Neo4j inicializado (%s)", self.uri)
+            return self._driver
+
+    @property
+    def llm(self):
+        with self._lock:
+            if self._llm is None:
+                from cliente_llm import GroqLLM
+                self._llm = GroqLLM(model=self.modelo)
+                logger.info("LLM (Groq %s) listo", self.modelo)
+            return self._llm
+
+    @property
+    def motor(self):
+        """Motor de búsqueda: CypherQueryEngine o MemoriaQueryEngine según el backend"""
+        with self._lock:
+            if self._motor is None:
+                from cache_recomendaciones import version_datos
+                self._version_datos = version_datos()
+                if self.backend == "memoria":
+                    from catalogo_memoria import CatalogoMemoria, MemoriaQueryEngine
+                    self._motor = MemoriaQueryEngine(CatalogoMemoria.desde_directorio())
+                else:
+                    from recomendadorErasmus import CypherQueryEngine
+                    self._motor = CypherQueryEngine(driver=self.driver, database=self.database)
+                logger.info("Motor de búsqueda (%s) listo", self.backend)
+            return self._motor
+
+    @property
+    def cache(self):
+        """CacheRecomendaciones del proceso (None si ERASMAI_CACHE=off)"""
+        with self._lock:
+            if not self._cache_creada:
+                from cache_recomendaciones import CacheRecomendaciones
+                self._cache = CacheRecomendaciones.desde_entorno(modelo=self.modelo)
+                self._cache_creada = True
+            return self._cache
+
+    @property
+    def almacen(self):
+        """Almacén del estado de las conversaciones (ERASMAI_ESTADO_RUTA o en memoria)"""
+        with self._lock:
+            if self._almacen is None:
+                import almacen_estado
+                self._almacen = almacen_estado.desde_entorno()
+            return self._almacen
+
+    @property
+    def indice(self):
+        """Índice BM25 de los atractivos (None si no se puede abrir ni construir)"""
+        with self._lock:
+            if not self._indice_creado:
+                import indice_bm25
+                try:
+                    self._indice = indice_bm25.desde_directorio()
+                except Exception as e:
+                    logger.warning("Sin índice de texto de atractivos: %s", e)
+                self._indice_creado = True
+            return self._indice
+
+    def comprobar_datos(self):
+        """
+        Si los CSV de data/ han cambiado desde que se creó el motor (se han
+        recargado con carga_datos.py), descarta todo lo derivado de ellos: los
+        perfiles de país y de categorías, el índice de texto y la caché de
+        recomendaciones. Solo cuesta un hash de los CSV (~0.1 ms).
+
+        Returns:
+            True si había datos nuevos
+        """
+        from cache_recomendaciones import version_datos
+        version = version_datos()
+        with self._lock:
+            if self._motor is None or version == self._version_datos:
+                return False
+            self._version_datos = version
+            if self.backend == "memoria":
+                self._motor = None  # las sesiones nuevas cargan el catálogo nuevo
+            else:
+                self._motor.invalidar_perfiles()
+            self._indice = None
+            self._indice_creado = False
+            if self._cache is not None:
+                self._cache.invalidar(version)
+        logger.info("Datos recargados (versión %s): perfiles, índice y caché invalidados", version)
+        return True
+
+    def calentar(self):
+        """
+        Crea todos los recursos y precalienta lo que se pueda (planes Cypher,
+        máscaras de categorías) para que la primera petición no pague el
+        arranque. Es idempotente.
+        """
+        with self._lock:
+            if self.calentado:
+                return
+            motor = self.motor
+            self.llm
+            self.cache
+            self.indice
+            if self.driver is not None:
+                from consultas_cypher import calentar_planes
+                from migraciones import pendientes
+                try:
+                    faltan = pendientes(self.driver, self.database)
+                    if faltan:
+                        logger.warning("Hay %d migraciones del esquema sin aplicar "
+                                       "(python src/migraciones.py)", len(faltan))
+                    calentar_planes(self.driver, self.database)
+                    motor.perfiles_categorias()
+                    logger.info("Planes de consulta precalentados")
+                except Exception as e:
+                    logger.warning("No se pudieron precalentar los planes: %s", e)
+            self.calentado = True
+
+    def cerrar(self):
+        with self._lock:
+            if self._driver is not None:
+                self._driver.close()
+                self._driver = None
+            if self._llm is not None:
+                self._llm.cerrar()
+                self._llm = None
+            if self._cache is not None:
+                self._cache.cerrar()
+            if self._almacen is not None:
+                self._almacen.cerrar()
+                self._almacen = None
+            self._motor = None
+            self._indice = None
+            self._indice_creado = False
+            self._cache = None
+            self._cache_creada = False
+            self.calentado = False
+
+
+_recursos = None
+_lock_global = threading.Lock()
+
+
+def obtener_recursos():
+    """Instancia única de Recursos para todo el proceso"""
+    global _recursos
+    if _recursos is None:
+        with _lock_global:
+            if _recursos is None:
+                _recursos = Recursos()
+    return _recursos
@@ -0,0 +1,215 @@
+"""
+Ajustes de una recomendación ya hecha sin repetir el pipeline
+
+Tras la recomendación el asistente guarda todos los candidatos puntuados
+(hasta CANDIDATOS) y las intenciones. Las peticiones posteriores ("otra
+opción", "sin Italia", "más peso a la playa") solo reordenan esa lista en
+memoria con los perfiles de categorías ya cargados y se vuelve a generar la
+explicación del LLM: ni base de datos ni detector de palabras clave.
+"""
+
+import re
+
+from buscador_difuso import BuscadorDifuso, normalizar
+from indice_bm25 import raiz
+from intenciones_matcher import CARACTERISTICAS_PAIS, CATEGORIAS_ATRACTIVOS, KEYWORDS_PAIS, puntos_pais
+from perfiles_categorias import mascara_de_categorias
+
+
+# Candidatos que se guardan para los ajustes (la recomendación usa los 5 primeros)
+CANDIDATOS = 50
+TOP_K = 5
+
+# Umbral de BuscadorDifuso: el nombre aparece como palabra completa o con una errata leve
+UMBRAL_NOMBRE = 0.7
+
+_SIGUIENTE = re.compile(r'\b(otr[ao]s?|siguiente|alternativa|diferente|distint[ao])\b')
+_EXCLUIR = re.compile(r'\b(no quiero|no me gusta|sin|excluye|excluir|descarta|descartar|quita|quitar|'
+                      r'evita|evitar|menos|fuera)\b')
+_PESO = re.compile(r'\b(mas peso|mas importancia|prioriza|priorizar|prioridad|importa mas|mas)\b')
+_ESTE_PAIS = re.compile(r'\b(este|ese) pais\b')
+
+
+def _raices(texto):
+    """Texto con cada palabra reducida a su raíz ("museos" y "museo", "barata" y "barato" coinciden)"""
+    return " ".join(raiz(palabra) for palabra in normalizar(texto).split())
+
+
+# Categorías y características a las que se puede dar más peso, con sus palabras clave (en raíces) como alias
+BUSCADOR_PESOS = BuscadorDifuso(
+    [*CATEGORIAS_ATRACTIVOS, *CARACTERISTICAS_PAIS.values()],
+    {
+        **{_raices(kw): categoria for categoria, kws in CATEGORIAS_ATRACTIVOS.items() for kw in kws},
+        **{_raices(kw): CARACTERISTICAS_PAIS[clave] for clave in CARACTERISTICAS_PAIS for kw in KEYWORDS_PAIS[clave]},
+        _raices('parque tematico'): 'parque_tematico',
+    }
+)
+
+CARACTERISTICAS = frozenset(CARACTERISTICAS_PAIS.values())
+
+AYUDA = (
+    "Puedo ajustar la recomendación sin repetir el cuestionario. Prueba con:\n"
+    "- **otra opción**: te propongo un destino distinto\n"
+    "- **sin Italia** / **este país no**: descarto un país\n"
+    "- **más peso a la playa** / **prioriza que sea barato**: le doy más importancia a algo\n\n"
+    "Para empezar de cero, pulsa **'Reiniciar conversación'** en el menú lateral."
+)
+
+
+class Orden:
+    """Lo que pide un mensaje: otra opción, países a descartar y a qué dar más peso"""
+    __slots__ = ('siguiente', 'excluir', 'pesos')
+
+    def __init__(self, siguiente=False, excluir=(), pesos=()):
+        self.siguiente = siguiente
+        self.excluir = tuple(excluir)
+        self.pesos = tuple(pesos)
+
+    def __bool__(self):
+        return self.siguiente or bool(self.excluir) or bool(self.pesos)
+
+
+class Refinamiento:
+    """
+    Candidatos de una recomendación y los ajustes acumulados. Es inmutable:
+    con() devuelve otro Refinamiento, así un ajuste que deja la lista vacía
+    se descarta sin más.
+    """
+
+    def __init__(self, candidatos, intenciones, perfiles, excluidos=(), descartadas=(), pesos=None,
+                 recomendada=None):
+        """
+        Args:
+            candidatos: list de Candidato ordenada por puntuación total
+            intenciones: dict de extraer_intenciones de la descripción
+            perfiles: PerfilesCategorias ya cargados (los puntos por categoría)
+            excluidos: países descartados
+            descartadas: universidades ya recomendadas que no se vuelven a proponer
+            pesos: categoría o característica -> veces que se ha pedido más peso
+            recomendada: universidad de la última recomendación
+        """
+        self.candidatos = candidatos
+        self.intenciones = intenciones
+        self.perfiles = perfiles
+        self.excluidos = frozenset(excluidos)
+        self.descartadas = frozenset(descartadas)
+        self.pesos = dict(pesos or {})
+        self.recomendada = recomendada
+        self._paises = BuscadorDifuso(sorted({c.pais for c in candidatos if c.pais}))
+
+    # ---------- interpretación ----------
+
+    def interpretar(self, texto):
+        """
+        Returns:
+            Orden (falsa si el mensaje no pide ningún ajuste reconocible)
+        """
+        normalizado = normalizar(texto)
+        excluir = []
+        if _EXCLUIR.search(normalizado) or re.search(r'\bno\b', normalizado):
+            excluir = [pais for pais, _ in self._paises.buscar(normalizado, n=len(self._paises),
+                                                                umbral=UMBRAL_NOMBRE)]
+            if not excluir and _ESTE_PAIS.search(normalizado):
+                excluir = [self._pais_recomendado()]
+        pesos = []
+        if _PESO.search(normalizado):
+            pesos = [nombre for nombre, _ in BUSCADOR_PESOS.buscar(_raices(normalizado), n=3,
+                                                                      umbral=UMBRAL_NOMBRE)]
+        return Orden(bool(_SIGUIENTE.search(normalizado)), [p for p in excluir if p], pesos)
+
+    def _pais_recomendado(self):
+        for c in self.candidatos:
+            if c.universidad == self.recomendada:
+                return c.pais
+        return None
+
+    # ---------- ajustes ----------
+
+    def con(self, orden=None, recomendada=None):
+        """Nuevo Refinamiento con la orden aplicada (y la última universidad recomendada)"""
+        descartadas = set(self.descartadas)
+        pesos = dict(self.pesos)
+        if orden is not None:
+            if orden.siguiente and self.recomendada:
+                descartadas.add(self.recomendada)
+            for nombre in orden.pesos:
+                pesos[nombre] = pesos.get(nombre, 0) + 1
+        return Refinamiento(
+            self.candidatos, self.intenciones, self.perfiles,
+            self.excluidos | set(orden.excluir if orden is not None else ()),
+            descartadas, pesos, recomendada or self.recomendada
+        )
+
+    def _puntos_extra(self, candidato):
+        puntos = 0
+        for nombre, veces in self.pesos.items():
+            if nombre in CARACTERISTICAS:
+                caracteristicas = {c: c == nombre for c in CARACTERISTICAS}
+                puntos += veces * puntos_pais(candidato.coste_vida, candidato.ambiente_fiesta,
+                                              candidato.edad_media, caracteristicas)
+            else:
+                perfil = self.perfiles.obtener(candidato.pais)
+                mascara = mascara_de_categorias([nombre])
+                puntos += veces * (perfil.puntos_presencia(mascara) + perfil.puntos_apariciones(mascara))
+        return puntos
+
+    def ranking(self):
+        """Candidatos que quedan, con los puntos de los pesos sumados, de mayor a menor total"""
+        puntuados = []
+        for c in self.candidatos:
+            if c.pais in self.excluidos or c.universidad in self.descartadas:
+                continue
+            extra = self._puntos_extra(c)
+            if extra:
+                c = c.copia(puntos_caracteristicas=c.puntos_caracteristicas + extra,
+                            puntuacion_total=(c.puntuacion_total or 0) + extra)
+            puntuados.append(c)
+        puntuados.sort(key=lambda c: -(c.puntuacion_total or 0))
+        return puntuados
+
+    def top(self, k=TOP_K):
+        return self.ranking()[:k]
+
+    def intenciones_ajustadas(self):
+        """Intenciones para el prompt, con lo que ha recibido más peso marcado como deseado"""
+        categorias = list(self.intenciones['categorias_atractivos'])
+        caracteristicas = dict(self.intenciones['caracteristicas_pais'])
+        for nombre in self.pesos:
+            if nombre in CARACTERISTICAS:
+                caracteristicas[nombre] = True
+            elif nombre not in categorias:
+                categorias.append(nombre)
+        return {**self.intenciones, 'categorias_atractivos': categorias, 'caracteristicas_pais': caracteristicas}
+
+    # ---------- instantáneas ----------
+
+    def a_dict(self):
+        """Ajustes en JSON (los candidatos se recalculan al restaurar)"""
+        return {
+            'excluidos': sorted(self.excluidos),
+            'descartadas': sorted(self.descartadas),
+            'pesos': self.pesos,
+            'recomendada': self.recomendada,
+        }
+
+    @classmethod
+    def desde_dict(cls, ajustes, candidatos, intenciones, perfiles):
+        ajustes = ajustes or {}
+        return cls(candidatos, intenciones, perfiles, ajustes.get('excluidos', ()),
+                   ajustes.get('descartadas', ()), ajustes.get('pesos'), ajustes.get('recomendada'))
+
+
+def universidad_elegida(texto, candidatos):
+    """
+    Universidad que recomienda el texto del LLM: la primera de los candidatos
+    que aparece en él (la primera candidata si no aparece ninguna)
+    """
+    normalizado = normalizar(texto)
+    posiciones = []
+    for c in candidatos:
+        posicion = normalizado.find(normalizar(c.universidad))
+        if posicion >= 0:
+            posiciones.append((posicion, c.universidad))
+    if posiciones:
+        return min(posiciones)[1]
+    return candidatos[0].universidad if candidatos else None
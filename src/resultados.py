@@ -0,0 +1,139 @@
+"""
+Registros ligeros (__slots__) que devuelven los motores de búsqueda.
+
+Los campos se corresponden con las columnas de las consultas Cypher; desde_fila()
+y a_dict() traducen entre ambos y solo se usan en los adaptadores (registros de
+Neo4j y la salida JSON compatible con LlamaIndex).
+"""
+
+
+class _Registro:
+    __slots__ = ()
+
+    # nombre del atributo -> columna en las consultas Cypher / JSON
+    COLUMNAS = {}
+
+    def __init__(self, **campos):
+        for atributo in self.__slots__:
+            setattr(self, atributo, campos.get(atributo))
+
+    @classmethod
+    def desde_fila(cls, fila):
+        return cls(**{atributo: fila.get(columna) for atributo, columna in cls.COLUMNAS.items()})
+
+    def a_dict(self):
+        return {columna: getattr(self, atributo) for atributo, columna in self.COLUMNAS.items()}
+
+    def copia(self, **cambios):
+        """Copia superficial con los campos de 'cambios' sustituidos"""
+        return type(self)(**{**{a: getattr(self, a) for a in self.__slots__}, **cambios})
+
+    def __repr__(self):
+        campos = ", ".join(f"{a}={getattr(self, a)!r}" for a in self.__slots__[:3])
+        return f"{type(self).__name__}({campos}, ...)"
+
+
+class Atractivo(_Registro):
+    __slots__ = ('nombre', 'rating', 'categorias', 'descripcion', 'visitantes')
+    COLUMNAS = {a: a for a in __slots__}
+
+
+class Destino(_Registro):
+    """Etapa 1: una oferta de la carrera con su puntuación por preferencias"""
+    __slots__ = ('universidad', 'id_universidad', 'pais', 'localizacion_pais', 'temperatura_media',
+                 'ciudad', 'poblacion', 'plazas_disponibles', 'duracion_meses',
+                 'certificado_obligatorio', 'nivel_requerido', 'puntuacion_compuesta')
+    COLUMNAS = {
+        'universidad': 'Universidad',
+        'id_universidad': 'Id_Universidad',
+        'pais': 'Pais',
+        'localizacion_pais': 'Localizacion_Pais',
+        'temperatura_media': 'Temperatura_Media',
+        'ciudad': 'Ciudad',
+        'poblacion': 'Poblacion',
+        'plazas_disponibles': 'Plazas_Disponibles',
+        'duracion_meses': 'Duracion_Meses',
+        'certificado_obligatorio': 'Certificado_Obligatorio',
+        'nivel_requerido': 'Nivel_Requerido',
+        'puntuacion_compuesta': 'PuntuacionCompuesta',
+    }
+
+
+class PerfilPais(_Registro):
+    """
+    Datos de un país y sus atractivos destacados (TOP 10 por rating). Hay uno
+    por país en todo el proceso (perfiles_paises.py) y todos los candidatos
+    de ese país comparten su tupla de atractivos.
+    """
+    __slots__ = ('pais', 'localizacion', 'coste_vida', 'ambiente_fiesta', 'comidas_tipicas',
+                 'temperatura', 'edad_media', 'atractivos_destacados')
+    COLUMNAS = {
+        'pais': 'Pais',
+        'localizacion': 'Localizacion',
+        'coste_vida': 'Coste_Vida',
+        'ambiente_fiesta': 'Ambiente_Fiesta',
+        'comidas_tipicas': 'Comidas_Tipicas',
+        'temperatura': 'Temperatura',
+        'edad_media': 'Edad_Media',
+        'atractivos_destacados': 'Atractivos_Destacados',
+    }
+
+    @classmethod
+    def desde_fila(cls, fila):
+        perfil = super().desde_fila(fila)
+        perfil.atractivos_destacados = tuple(
+            Atractivo.desde_fila(a) for a in perfil.atractivos_destacados or ()
+        )
+        return perfil
+
+    def a_dict(self):
+        fila = super().a_dict()
+        fila['Atractivos_Destacados'] = [a.a_dict() for a in self.atractivos_destacados]
+        return fila
+
+
+class Candidato(_Registro):
+    """
+    Etapa 2: universidad con los datos de su país, los atractivos destacados
+    y las puntuaciones que se van acumulando en rag_funciones
+    """
+    __slots__ = ('universidad', 'pais', 'localizacion', 'ciudad', 'poblacion', 'coste_vida',
+                 'ambiente_fiesta', 'comidas_tipicas', 'temperatura', 'edad_media',
+                 'puntos_caracteristicas', 'atractivos_destacados',
+                 'puntuacion_base', 'puntuacion_total')
+    COLUMNAS = {
+        'universidad': 'Universidad',
+        'pais': 'Pais',
+        'localizacion': 'Localizacion',
+        'ciudad': 'Ciudad',
+        'poblacion': 'Poblacion',
+        'coste_vida': 'Coste_Vida',
+        'ambiente_fiesta': 'Ambiente_Fiesta',
+        'comidas_tipicas': 'Comidas_Tipicas',
+        'temperatura': 'Temperatura',
+        'edad_media': 'Edad_Media',
+        'puntos_caracteristicas': 'PuntosCaracteristicas',
+        'atractivos_destacados': 'Atractivos_Destacados',
+        'puntuacion_base': 'PuntuacionBase',
+        'puntuacion_total': 'PuntuacionTotal',
+    }
+
+    def __init__(self, **campos):
+        super().__init__(**campos)
+        if self.puntos_caracteristicas is None:
+            self.puntos_caracteristicas = 0
+        if self.atractivos_destacados is None:
+            self.atractivos_destacados = []
+
+    @classmethod
+    def desde_fila(cls, fila):
+        candidato = super().desde_fila(fila)
+        candidato.atractivos_destacados = [
+            Atractivo.desde_fila(a) for a in candidato.atractivos_destacados
+        ]
+        return candidato
+
+    def a_dict(self):
+        fila = super().a_dict()
+        fila['Atractivos_Destacados'] = [a.a_dict() for a in self.atractivos_destacados]
+        return fila
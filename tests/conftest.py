@@ -0,0 +1,35 @@
+"""
+Configuración común de los tests: los módulos de src/ se importan por su
+nombre, igual que al ejecutar la app desde esa carpeta.
+"""
+
+import os
+import sys
+
+import pytest
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+sys.path.insert(0, SRC)
+
+
+@pytest.fixture(scope="session")
+def motor_memoria():
+    from catalogo_memoria import CatalogoMemoria, MemoriaQueryEngine
+    return MemoriaQueryEngine(CatalogoMemoria.desde_directorio())
+
+
+@pytest.fixture(scope="session")
+def motor_cypher():
+    """
+    CypherQueryEngine contra el Neo4j de NEO4J_URI (cargado con
+    carga_datos.py desde los mismos CSV); el test se salta si no responde
+    """
+    from recursos import Recursos
+    recursos = Recursos(backend="neo4j")
+    try:
+        recursos.driver.verify_connectivity()
+    except Exception as e:
+        recursos.cerrar()
+        pytest.skip(f"Neo4j no disponible en {recursos.uri}: {e}")
+    yield recursos.motor
+    recursos.cerrar()
@@ -0,0 +1,103 @@
+"""
+Almacenes del estado y las instantáneas de ErasmAIAssistant: una
+conversación guardada en REFINAMIENTO se retoma en otro asistente con sus
+ajustes; una instantánea de otra versión se ignora
+"""
+
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import almacen_estado
+from almacen_estado import AlmacenMemoria, AlmacenSQLite
+from recomendadorErasmus import ErasmAIAssistant
+
+
+ESTADO = {'estado': 'PREF_REGION', 'carrera_neo4j': 'veterinaria', 'descripcion': 'fiordos y auroras',
+          'ajustes': {'excluidos': ['italia'], 'pesos': {'playa': 2}}, 'v': 1}
+
+CUESTIONARIO = ["hola", "derecho", "NO", "grande", "sur", "calor"]
+
+
+class LLMEco:
+    """Responde con el propio prompt: la universidad 'elegida' es la primera candidata"""
+
+    def stream_complete(self, prompt, sistema=None):
+        yield prompt
+
+
+@pytest.fixture(params=["memoria", "sqlite"])
+def almacen(request, tmp_path):
+    if request.param == "memoria":
+        almacen = AlmacenMemoria()
+    else:
+        almacen = AlmacenSQLite(str(tmp_path / "estado.db"))
+    yield almacen
+    almacen.cerrar()
+
+
+def test_guardar_cargar_y_borrar(almacen):
+    assert almacen.cargar("sesion") is None
+    assert almacen.guardar("sesion", ESTADO) > 0
+    assert almacen.cargar("sesion") == ESTADO
+    assert len(almacen) == 1
+    almacen.borrar("sesion")
+    assert almacen.cargar("sesion") is None
+
+
+def test_caduca_pasado_el_ttl(almacen, monkeypatch):
+    almacen.guardar("sesion", ESTADO)
+    despues = time.time() + almacen.ttl + 1
+    monkeypatch.setattr(almacen_estado, "time", SimpleNamespace(time=lambda: despues))
+    assert almacen.cargar("sesion") is None
+
+
+def test_sqlite_compartido_entre_conexiones(tmp_path):
+    ruta = str(tmp_path / "estado.db")
+    escritor, lector = AlmacenSQLite(ruta), AlmacenSQLite(ruta)
+    escritor.guardar("sesion", ESTADO)
+    assert lector.cargar("sesion") == ESTADO
+    escritor.cerrar()
+    lector.cerrar()
+    assert AlmacenSQLite(ruta).cargar("sesion") == ESTADO
+
+
+@pytest.fixture
+def conversacion(motor_memoria):
+    """Asistente en REFINAMIENTO tras descartar Portugal (derecho: Italia y Portugal)"""
+    asistente = ErasmAIAssistant(LLMEco(), motor_memoria)
+    for mensaje in CUESTIONARIO:
+        asistente.procesar_mensaje(mensaje)
+    assert asistente.estado == "RAG_DESCRIPCION"
+    asistente.procesar_mensaje("Quiero museos y fiesta")
+    asistente.procesar_mensaje("sin Portugal")
+    assert asistente.estado == "REFINAMIENTO"
+    assert asistente.refinamiento.excluidos == {"portugal"}
+    return asistente
+
+
+def test_instantanea_en_refinamiento_conserva_los_ajustes(conversacion, almacen, motor_memoria):
+    almacen.guardar("sesion", conversacion.a_instantanea())
+    restaurado = ErasmAIAssistant.desde_instantanea(almacen.cargar("sesion"), LLMEco(), motor_memoria)
+
+    assert restaurado.estado == "REFINAMIENTO"
+    assert restaurado.descripcion == "Quiero museos y fiesta"
+    assert restaurado.refinamiento is None                  # candidatos pendientes de recalcular
+    assert restaurado.a_instantanea() == conversacion.a_instantanea()
+
+    # el siguiente ajuste se suma a los restaurados
+    recomendada = conversacion.refinamiento.recomendada
+    restaurado.procesar_mensaje("dame otra opción")
+    assert restaurado.refinamiento.excluidos == {"portugal"}
+    assert recomendada in restaurado.refinamiento.descartadas
+    assert all(c.pais == "italia" for c in restaurado.refinamiento.ranking())
+
+
+def test_instantanea_de_otra_version_se_ignora(conversacion, motor_memoria):
+    instantanea = {**conversacion.a_instantanea(), 'v': ErasmAIAssistant.VERSION_INSTANTANEA + 1}
+    restaurado = ErasmAIAssistant.desde_instantanea(instantanea, LLMEco(), motor_memoria)
+    assert restaurado.estado == "INICIO"
+    assert restaurado.carrera_neo4j is None
+    assert restaurado.a_instantanea()['ajustes'] is None
+    assert ErasmAIAssistant.desde_instantanea(None, LLMEco(), motor_memoria).estado == "INICIO"
@@ -0,0 +1,52 @@
+"""
+BuscadorDifuso.mejor sobre las carreras: coincidencias exactas, alias y
+erratas se resuelven; prefijos ambiguos se dejan a sugerir_carreras
+"""
+
+import pytest
+
+from buscador_difuso import BuscadorDifuso
+from recomendadorErasmus import BUSCADOR_CARRERAS, sugerir_carreras, validar_carrera
+
+
+@pytest.mark.parametrize("texto, carrera", [
+    ("Enfermería", "enfermeria"),
+    ("veterinria", "veterinaria"),
+    ("grado en derecho", "derecho"),
+    ("ingenieria info", "ingenieria informatica"),
+])
+def test_mejor_resuelve(texto, carrera):
+    assert BUSCADOR_CARRERAS.mejor(texto) == carrera
+
+
+@pytest.mark.parametrize("texto", ["ing", "educacion"])
+def test_prefijo_ambiguo_no_elige(texto):
+    assert BUSCADOR_CARRERAS.mejor(texto) is None
+    assert validar_carrera(texto) == (None, None)
+    sugerencias = sugerir_carreras(texto)
+    assert len(sugerencias) == 3
+    puntuaciones = [p for _, p in sugerencias]
+    assert puntuaciones == sorted(puntuaciones, reverse=True)
+
+
+def test_sugerencias_de_ing_empiezan_por_ing():
+    assert all(carrera.startswith("ing") for carrera, _ in sugerir_carreras("ing"))
+
+
+def test_sin_parecido():
+    assert BUSCADOR_CARRERAS.mejor("xyzzy") is None
+    assert sugerir_carreras("xyzzy") == []
+    assert BUSCADOR_CARRERAS.mejor("") is None
+
+
+def test_empate_dentro_del_margen():
+    buscador = BuscadorDifuso(["fisica", "quimica"])
+    # 'fimica': fisica 0.57 y quimica 0.53, a menos de MARGEN
+    assert buscador.mejor("fimica", umbral=0.5) is None
+    assert buscador.mejor("fimica", umbral=0.5, margen=0.01) == "fisica"
+    assert buscador.mejor("quisica", umbral=0.5) == "quimica"
+
+
+def test_alias_devuelve_el_nombre_oficial():
+    buscador = BuscadorDifuso(["administracion y direccion de empresas"], {"ade": "administracion y direccion de empresas"})
+    assert buscador.mejor("ADE") == "administracion y direccion de empresas"
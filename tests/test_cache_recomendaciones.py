@@ -0,0 +1,137 @@
+"""
+CacheRecomendaciones: expulsión LRU, caducidad, niveles de clave,
+persistencia en SQLite e invalidación por versión de los datos
+"""
+
+import sqlite3
+from types import SimpleNamespace
+
+import pytest
+
+import cache_recomendaciones
+from cache_recomendaciones import CacheRecomendaciones
+
+
+INTENCIONES = {'categorias_atractivos': ['playa'], 'caracteristicas_pais': {'coste_bajo': True, 'fiesta_alta': False}}
+PREFERENCIAS = {'clima': 'calor'}
+
+
+def _candidatos(*universidades):
+    return [SimpleNamespace(universidad=u) for u in universidades]
+
+
+CANDIDATOS = _candidatos("universidad de bolonia", "universidad de granada")
+
+
+@pytest.fixture
+def reloj(monkeypatch):
+    """time.time() del módulo controlado por el test"""
+    ahora = [1000.0]
+    monkeypatch.setattr(cache_recomendaciones, "time", SimpleNamespace(time=lambda: ahora[0]))
+    return ahora
+
+
+def _guardar(cache, descripcion, texto, candidatos=CANDIDATOS, intenciones=INTENCIONES):
+    cache.guardar(descripcion, candidatos, intenciones, PREFERENCIAS, texto)
+
+
+def _obtener(cache, descripcion, candidatos=CANDIDATOS, intenciones=INTENCIONES):
+    return cache.obtener(descripcion, candidatos, intenciones, PREFERENCIAS)
+
+
+def test_expulsa_la_menos_usada_al_llenarse():
+    cache = CacheRecomendaciones(max_entradas=2, version="v1")
+    _guardar(cache, "playa", "A")
+    _guardar(cache, "fiesta", "B")
+    assert _obtener(cache, "playa") == "A"   # 'playa' pasa a ser la más reciente
+    _guardar(cache, "museos", "C")
+    assert _obtener(cache, "fiesta") is None
+    assert _obtener(cache, "playa") == "A"
+    assert _obtener(cache, "museos") == "C"
+    assert cache.estadisticas()['entradas'] == 2
+
+
+def test_caduca_pasado_el_ttl(reloj):
+    cache = CacheRecomendaciones(ttl=60, version="v1")
+    _guardar(cache, "playa", "A")
+    reloj[0] += 59
+    assert _obtener(cache, "playa") == "A"
+    reloj[0] += 2
+    assert _obtener(cache, "playa") is None
+    assert cache.estadisticas()['entradas'] == 0
+
+
+def test_clave_exacta_depende_de_la_descripcion():
+    cache = CacheRecomendaciones(version="v1")
+    _guardar(cache, "Quiero  PLAYA", "A")
+    assert _obtener(cache, "quiero playa") == "A"   # misma descripción normalizada
+    assert _obtener(cache, "quiero playa barata") is None
+
+
+def test_clave_de_intenciones_ignora_la_descripcion():
+    cache = CacheRecomendaciones(exacta=False, intenciones=True, version="v1")
+    _guardar(cache, "quiero playa", "A")
+    assert _obtener(cache, "me encanta el mar y la arena") == "A"
+    assert _obtener(cache, "quiero playa", candidatos=_candidatos("universidad de granada")) is None
+    otras = {**INTENCIONES, 'categorias_atractivos': ['museos']}
+    assert _obtener(cache, "quiero playa", intenciones=otras) is None
+
+
+def test_con_ambos_niveles_gana_la_exacta():
+    cache = CacheRecomendaciones(exacta=True, intenciones=True, version="v1")
+    _guardar(cache, "quiero playa", "A")
+    _guardar(cache, "playa y sol", "B")
+    assert _obtener(cache, "quiero playa") == "A"
+    assert _obtener(cache, "otra descripción cualquiera") == "B"
+
+
+def test_sqlite_sobrevive_a_reabrir(tmp_path):
+    ruta = str(tmp_path / "cache.db")
+    cache = CacheRecomendaciones(ruta=ruta, version="v1")
+    _guardar(cache, "playa", "A")
+    cache.cerrar()
+
+    reabierta = CacheRecomendaciones(ruta=ruta, version="v1")
+    assert _obtener(reabierta, "playa") == "A"
+    reabierta.cerrar()
+
+
+def test_otra_version_descarta_lo_guardado(tmp_path):
+    ruta = str(tmp_path / "cache.db")
+    cache = CacheRecomendaciones(ruta=ruta, version="v1")
+    _guardar(cache, "playa", "A")
+    cache.cerrar()
+
+    nueva = CacheRecomendaciones(ruta=ruta, version="v2")
+    assert _obtener(nueva, "playa") is None
+    nueva.cerrar()
+    with sqlite3.connect(ruta) as db:
+        assert db.execute("SELECT COUNT(*) FROM recomendaciones").fetchone()[0] == 0
+
+
+def test_comprobar_version_invalida_al_cambiar_los_datos(tmp_path):
+    datos = tmp_path / "data"
+    datos.mkdir()
+    (datos / "datasetSibi.csv").write_text("carrera\nderecho\n", encoding="utf-8")
+    cache = CacheRecomendaciones(version=cache_recomendaciones.version_datos(str(datos)))
+    _guardar(cache, "playa", "A")
+    assert not cache.comprobar_version(str(datos))
+    assert _obtener(cache, "playa") == "A"
+
+    (datos / "datasetSibi.csv").write_text("carrera\nderecho\nade\n", encoding="utf-8")
+    assert cache.comprobar_version(str(datos))
+    assert _obtener(cache, "playa") is None
+
+
+def test_caducar_al_leer_confirma_el_borrado(tmp_path, reloj):
+    ruta = str(tmp_path / "cache.db")
+    cache = CacheRecomendaciones(ttl=60, ruta=ruta, version="v1")
+    _guardar(cache, "playa", "A")
+    reloj[0] += 120
+    assert _obtener(cache, "playa") is None
+
+    # otra conexión ve el borrado y puede escribir sin esperar a la transacción de 'cache'
+    with sqlite3.connect(ruta, timeout=0.1) as db:
+        assert db.execute("SELECT COUNT(*) FROM recomendaciones").fetchone()[0] == 0
+        db.execute("INSERT INTO recomendaciones VALUES ('x', 'v1', 0, 'x')")
+    cache.cerrar()
@@ -0,0 +1,99 @@
+"""
+Carga incremental: planificar() solo escribe las filas cuyo hash ha cambiado
+y el informe da el ritmo de las filas escritas, no de todas las leídas
+"""
+
+import pytest
+
+from carga_datos import TIPOS, cargar, imprimir_informe, leer_filas, planificar
+
+
+@pytest.fixture(scope="module")
+def filas():
+    return leer_filas()
+
+
+def _cargadas(filas, campos):
+    """Hashes tal como quedan en el grafo tras cargar esas filas"""
+    return {tuple(fila[c] for c in campos): fila['hash'] for fila in filas}
+
+
+@pytest.mark.parametrize("tipo", list(TIPOS))
+def test_sin_cambios_no_escribe_nada(filas, tipo):
+    campos = TIPOS[tipo]['campos']
+    assert planificar(filas[tipo], {}, campos)[0] == filas[tipo]
+    assert planificar(filas[tipo], _cargadas(filas[tipo], campos), campos) == ([], [])
+
+
+def test_solo_escribe_las_filas_modificadas(filas):
+    campos = TIPOS['Universidad']['campos']
+    existentes = _cargadas(filas['Universidad'], campos)
+    modificada = filas['Universidad'][3]
+    existentes[tuple(modificada[c] for c in campos)] = "hash-anterior"
+
+    cambiadas, sobrantes = planificar(filas['Universidad'], existentes, campos)
+    assert cambiadas == [modificada]
+    assert sobrantes == []
+    assert planificar(filas['Universidad'], existentes, campos, forzar=True)[0] == filas['Universidad']
+
+
+def test_sobrantes_solo_con_hash(filas):
+    campos = TIPOS['Pais']['campos']
+    existentes = _cargadas(filas['Pais'], campos)
+    existentes[("atlantida",)] = "hash-de-una-carga-anterior"
+    existentes[("narnia",)] = None   # creado a mano, sin hash
+    assert planificar(filas['Pais'], existentes, campos) == ([], [["atlantida"]])
+
+
+class DriverGrafo:
+    """Driver falso cuyo grafo ya tiene cargadas 'cargadas' (tipo -> filas)"""
+
+    def __init__(self, cargadas):
+        self.cargadas = cargadas
+        self.escritas = {}
+
+    def session(self, database=None):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute_read(self, funcion):
+        return funcion(self)
+
+    def execute_write(self, funcion):
+        return funcion(self)
+
+    def run(self, consulta, filas=None, claves=None):
+        tipo = next(t for t, plantilla in TIPOS.items() if consulta in plantilla.values())
+        if consulta == TIPOS[tipo]['leer']:
+            campos = TIPOS[tipo]['campos']
+            return [{'clave': list(clave), 'hash': huella}
+                    for clave, huella in _cargadas(self.cargadas.get(tipo, []), campos).items()]
+        self.escritas[tipo] = self.escritas.get(tipo, 0) + len(filas or claves)
+        return self
+
+    def consume(self):
+        return None
+
+
+def test_recarga_escribe_solo_lo_cambiado_y_el_ritmo_cuenta_escritas(filas, capsys):
+    grafo = DriverGrafo({tipo: filas[tipo] for tipo in TIPOS if tipo != 'Atractivo'})
+    informe = cargar(grafo, "neo4j", filas, lote=50)
+    assert grafo.escritas == {'Atractivo': len(filas['Atractivo'])}
+    assert informe['Universidad']['escritas'] == 0
+    assert informe['Universidad']['filas'] == len(filas['Universidad'])
+
+    # cada tipo tarda 2 s: solo Atractivo tiene filas escritas por segundo
+    for datos in informe.values():
+        datos['segundos'] = 2.0
+    imprimir_informe(informe, segundos=60.0)
+    salida = capsys.readouterr().out.splitlines()
+    ritmos = {linea.split()[0]: linea.split()[-1] for linea in salida[1:len(informe) + 1]}
+    assert ritmos['Universidad'] == "0"
+    assert ritmos['Atractivo'] == f"{len(filas['Atractivo']) / 2:.0f}"
+    carga = 2.0 * len(informe)
+    assert f"{len(filas['Atractivo']) / carga:.0f} filas escritas/s" in salida[-1]
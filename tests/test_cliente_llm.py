@@ -0,0 +1,120 @@
+"""
+GroqLLM contra el servidor falso compatible con OpenAI de benchmarks.py
+(local, sin red ni clave real)
+"""
+
+import asyncio
+import time
+
+import pytest
+
+import cliente_llm
+from benchmarks import ServidorLLMFalso
+from cliente_llm import GroqLLM
+
+
+RESPUESTA = "Te recomiendo la Universidad de Bolonia por su ambiente estudiantil."
+
+
+@pytest.fixture
+def servidor():
+    with ServidorLLMFalso(latencia=0.0, respuesta=RESPUESTA, trozos=6) as servidor:
+        yield servidor
+
+
+@pytest.fixture
+def servidor_lento():
+    """Stream de 100 trozos a 20 ms: tarda 2 s en terminar"""
+    with ServidorLLMFalso(latencia=0.0, respuesta="x" * 100, trozos=100, pausa_trozo=0.02) as servidor:
+        yield servidor
+
+
+@pytest.fixture
+def llm_de():
+    clientes = []
+
+    def crear(servidor, **opciones):
+        llm = GroqLLM(api_key="falsa", base_url=servidor.url, **opciones)
+        clientes.append(llm)
+        return llm
+
+    yield crear
+    for llm in clientes:
+        llm.cerrar()
+
+
+def test_complete(servidor, llm_de):
+    llm = llm_de(servidor)
+    assert llm.complete("hola", sistema="eres un asistente").text == RESPUESTA
+    assert servidor.peticiones == 1
+
+
+def test_stream_complete_por_trozos(servidor, llm_de):
+    trozos = list(llm_de(servidor).stream_complete("hola"))
+    assert len(trozos) > 1
+    assert "".join(trozos) == RESPUESTA
+
+
+def test_astream_complete_por_trozos(servidor, llm_de):
+    llm = llm_de(servidor)
+
+    async def leer():
+        return [trozo async for trozo in llm.astream_complete("hola")]
+
+    trozos = asyncio.run(leer())
+    assert len(trozos) > 1
+    assert "".join(trozos) == RESPUESTA
+
+
+def test_peticiones_concurrentes_comparten_cliente(servidor, llm_de):
+    llm = llm_de(servidor, max_concurrencia=4)
+
+    async def varias():
+        return await asyncio.gather(*(llm.acomplete(f"hola {i}") for i in range(8)))
+
+    assert [r.text for r in asyncio.run(varias())] == [RESPUESTA] * 8
+    assert servidor.peticiones == 8
+
+
+def test_limite_de_concurrencia_configurable(servidor, llm_de, monkeypatch):
+    # ERASMAI_LLM_CONCURRENCIA fija el valor por defecto; el argumento manda sobre él
+    assert llm_de(servidor).max_concurrencia == cliente_llm.MAX_CONCURRENCIA
+    monkeypatch.setattr(cliente_llm, "MAX_CONCURRENCIA", 7)
+    assert llm_de(servidor).max_concurrencia == 7
+    assert llm_de(servidor, max_concurrencia=3).max_concurrencia == 3
+
+
+def _libre_en(llm):
+    """Segundos hasta que una petición nueva consigue el semáforo (max_concurrencia=1) y termina"""
+    inicio = time.perf_counter()
+    llm.complete("otra")
+    return time.perf_counter() - inicio
+
+
+def test_cerrar_stream_cancela_la_generacion(servidor_lento, llm_de):
+    llm = llm_de(servidor_lento, max_concurrencia=1)
+    stream = llm.stream_complete("hola")
+    assert next(stream) == "x"
+    stream.close()  # como un rerun de Streamlit que abandona la respuesta
+
+    # el semáforo queda libre en seguida, sin esperar a los 2 s del stream
+    assert _libre_en(llm) < 1.0
+    time.sleep(0.2)
+    assert servidor_lento.trozos_enviados < 100
+
+
+def test_cerrar_astream_cancela_la_generacion(servidor_lento, llm_de):
+    llm = llm_de(servidor_lento, max_concurrencia=1)
+
+    async def cortar_y_pedir_otra():
+        stream = llm.astream_complete("hola")
+        assert await stream.__anext__() == "x"
+        await stream.aclose()
+        # en el mismo bucle, sin que asyncio.run haya cancelado nada al salir
+        inicio = time.perf_counter()
+        await llm.acomplete("otra")
+        return time.perf_counter() - inicio
+
+    assert asyncio.run(cortar_y_pedir_otra()) < 1.0
+    time.sleep(0.2)
+    assert servidor_lento.trozos_enviados < 100
@@ -0,0 +1,69 @@
+"""
+Reanudar una cohorte interrumpida deja un solo registro por estudiante: los
+que fallaron en el LLM se reintentan y sustituyen al registro del fallo
+"""
+
+import asyncio
+import csv
+import json
+from types import SimpleNamespace
+
+import pytest
+
+import cohorte
+
+
+PERFILES = [
+    {'id': 'a', 'carrera': 'derecho', 'certificados': 'no', 'tamano_ciudad': 'grande',
+     'region': 'sur', 'clima': 'calor', 'descripcion': 'playa y fiesta'},
+    {'id': 'b', 'carrera': 'ade', 'certificados': 'B2 de inglés', 'tamano_ciudad': 'pequeña',
+     'region': 'oeste', 'clima': 'frio', 'descripcion': 'museos e historia'},
+    {'id': 'c', 'carrera': 'turismo', 'certificados': 'no', 'tamano_ciudad': '',
+     'region': '', 'clima': '', 'descripcion': ''},
+]
+
+
+class LLMCaido:
+    async def acomplete(self, *args, **kwargs):
+        raise ConnectionError("LLM caído")
+
+
+@pytest.fixture
+def entrada(tmp_path):
+    ruta = tmp_path / "perfiles.csv"
+    with open(ruta, 'w', encoding='utf-8', newline='') as f:
+        escritor = csv.DictWriter(f, fieldnames=list(PERFILES[0]))
+        escritor.writeheader()
+        escritor.writerows(PERFILES)
+    return str(ruta)
+
+
+def _registros(ruta):
+    with open(ruta, encoding='utf-8') as f:
+        return [json.loads(linea) for linea in f]
+
+
+def test_reanudar_deja_un_registro_por_id(entrada, tmp_path, capsys):
+    salida = str(tmp_path / "recomendaciones.jsonl")
+    perfiles = cohorte.leer_perfiles(entrada)
+
+    # 'a' termina; 'b' y 'c' fallan en el LLM y la ejecución se corta a mitad de línea
+    asyncio.run(cohorte.procesar_cohorte(perfiles[:1], salida, procesos=1))
+    caido = SimpleNamespace(llm=LLMCaido(), cache=None)
+    asyncio.run(cohorte.procesar_cohorte(perfiles[1:], salida, procesos=1, recursos=caido))
+    assert [r['estado'] for r in _registros(salida)] == ['ok', 'error_llm', 'error_llm']
+    with open(salida, 'a', encoding='utf-8') as f:
+        f.write('{"id": "c", "esta')
+
+    cohorte.main([entrada, salida, '--sin-llm', '--procesos', '1'])
+    registros = _registros(salida)
+    assert sorted(r['id'] for r in registros) == ['a', 'b', 'c']
+    assert all(r['estado'] == 'ok' for r in registros)
+
+    # sin nada pendiente, relanzar no toca el fichero
+    with open(salida, 'rb') as f:
+        antes = f.read()
+    cohorte.main([entrada, salida, '--sin-llm', '--procesos', '1'])
+    with open(salida, 'rb') as f:
+        assert f.read() == antes
+    assert "0 pendientes" in capsys.readouterr().out
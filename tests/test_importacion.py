@@ -0,0 +1,68 @@
+"""
+Importar los módulos de la app no abre conexiones ni crea el driver de Neo4j
+ni el cliente del LLM: todo eso se crea en el primer uso (recursos.py).
+
+Cada importación se hace en un intérprete nuevo, con socket.connect, el
+driver de Neo4j y los clientes de Groq vigilados antes de importar.
+"""
+
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from conftest import SRC
+
+
+_SCRIPT = """
+import json, socket, sys, threading
+
+conexiones = []
+_connect = socket.socket.connect
+def _contar(self, direccion):
+    conexiones.append(repr(direccion))
+    return _connect(self, direccion)
+socket.socket.connect = _contar
+
+import groq, neo4j
+creados = []
+_driver = neo4j.GraphDatabase.driver
+def _crear_driver(*args, **kwargs):
+    creados.append('driver de Neo4j')
+    return _driver(*args, **kwargs)
+neo4j.GraphDatabase.driver = staticmethod(_crear_driver)
+for clase in (groq.Groq, groq.AsyncGroq):
+    def _vigilar(original, nombre=clase.__name__):
+        def __init__(self, *args, **kwargs):
+            creados.append(nombre)
+            return original(self, *args, **kwargs)
+        return __init__
+    clase.__init__ = _vigilar(clase.__init__)
+
+hilos = threading.active_count()
+__import__(sys.argv[1])
+print(json.dumps({'conexiones': conexiones, 'creados': creados,
+                  'hilos': threading.active_count() - hilos}))
+"""
+
+
+def _importar(modulo, backend):
+    entorno = {clave: valor for clave, valor in os.environ.items() if clave != 'GROQ_API_KEY'}
+    entorno.update(ERASMAI_BACKEND=backend, ERASMAI_METRICAS_PUERTO="", ERASMAI_TRAZAS="")
+    salida = subprocess.run(
+        [sys.executable, '-c', _SCRIPT, modulo], cwd=SRC, env=entorno,
+        capture_output=True, text=True, timeout=120
+    )
+    assert salida.returncode == 0, salida.stderr
+    return json.loads(salida.stdout.strip().splitlines()[-1])
+
+
+@pytest.mark.parametrize("backend", ["neo4j", "memoria"])
+@pytest.mark.parametrize("modulo", ["app", "recomendadorErasmus", "recursos", "rag_funciones", "cohorte"])
+def test_importar_no_conecta_nada(modulo, backend):
+    resultado = _importar(modulo, backend)
+    assert resultado['conexiones'] == []
+    assert resultado['creados'] == []
+    assert resultado['hilos'] == 0
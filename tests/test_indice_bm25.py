@@ -0,0 +1,86 @@
+"""
+Índice BM25 de atractivos: fichero mmap reabierto tal cual, reconstrucción
+cuando cambia la versión de los datos y relevancia por país
+"""
+
+import mmap
+
+import pytest
+
+import carga_datos
+import indice_bm25
+from cache_recomendaciones import DATA_DIR, version_datos
+from indice_bm25 import IndiceBM25, construir, desde_directorio, guardar
+
+
+DOCUMENTOS = [
+    ("noruega", "Geirangerfjord fiordos naturaleza Fiordo rodeado de montañas y cascadas"),
+    ("noruega", "Museo vikingo museos historia Barcos vikingos"),
+    ("italia", "Coliseo historia monumentos Anfiteatro romano"),
+    ("italia", "Playa de Amalfi playa costa"),
+    ("portugal", "Torre de Belém monumentos historia"),
+]
+
+
+@pytest.fixture(scope="module")
+def indice(tmp_path_factory):
+    """Índice de los CSV de data/, guardado fuera del repositorio"""
+    return desde_directorio(ruta=str(tmp_path_factory.mktemp("bm25") / "indice.bm25"))
+
+
+def test_guardar_y_reabrir_con_mmap(tmp_path):
+    datos = construir(DOCUMENTOS, version="v1")
+    ruta = str(tmp_path / "indice.bm25")
+    guardar(datos, ruta)
+
+    abierto = IndiceBM25.abrir(ruta)
+    en_memoria = IndiceBM25(datos)
+    assert isinstance(abierto._buffer, mmap.mmap)
+    assert abierto.version == "v1"
+    assert len(abierto) == len(DOCUMENTOS)
+    assert abierto.paises == ["italia", "noruega", "portugal"]
+    for texto in ["fiordos", "historia y monumentos", "playa", "vikingos"]:
+        assert abierto.puntuaciones(texto).tolist() == en_memoria.puntuaciones(texto).tolist()
+        assert abierto.relevancia_por_pais(texto) == en_memoria.relevancia_por_pais(texto)
+    assert set(abierto.relevancia_por_pais("historia")) == {"italia", "noruega", "portugal"}
+    assert list(abierto.relevancia_por_pais("fiordos")) == ["noruega"]
+
+
+def test_cabecera_ajena_se_rechaza():
+    with pytest.raises(ValueError):
+        IndiceBM25(b"\0" * 64)
+
+
+def test_desde_directorio_reutiliza_solo_la_misma_version(tmp_path, monkeypatch):
+    ruta = str(tmp_path / "indice.bm25")
+    guardar(construir(DOCUMENTOS, version="otra"), ruta)
+
+    reconstruido = desde_directorio(ruta=ruta)
+    assert reconstruido.version == version_datos(DATA_DIR)
+    assert len(reconstruido) > len(DOCUMENTOS)
+
+    def sin_csv(*args, **kwargs):
+        raise AssertionError("con la misma versión no se leen los CSV")
+
+    monkeypatch.setattr(carga_datos, "leer_filas", sin_csv)
+    reabierto = desde_directorio(ruta=ruta)
+    assert reabierto.version == reconstruido.version
+    assert len(reabierto) == len(reconstruido)
+
+
+def test_desde_directorio_reconstruye_un_fichero_ilegible(tmp_path):
+    ruta = tmp_path / "indice.bm25"
+    ruta.write_bytes(b"basura" * 20)
+    assert desde_directorio(ruta=str(ruta)).version == version_datos(DATA_DIR)
+
+
+def test_fiordos_puntua_noruega(indice):
+    puntos = indice.puntos_por_pais("Me encantaría ver los fiordos")
+    assert puntos.get("noruega", 0) > 0
+    assert max(puntos, key=puntos.get) == "noruega"
+    assert all(0 < p <= indice_bm25.PUNTOS_TEXTO for p in puntos.values())
+
+
+def test_solo_palabras_vacias_no_puntua(indice):
+    assert indice.relevancia_por_pais("quiero un sitio donde hacer algo con mucho de todo") == {}
+    assert indice.puntos_por_pais("") == {}
@@ -0,0 +1,56 @@
+"""
+PROFILE de migraciones.py: suma de db hits y operadores de acceso de un plan
+grabado, y la comparación antes/después que imprime --perfilar
+"""
+
+from migraciones import imprimir_comparacion, perfilar
+
+
+# Plan de CONSULTA_DESTINOS tal como lo devuelve el driver (resumido)
+PLAN = {
+    'operatorType': 'ProduceResults@neo4j', 'dbHits': 0, 'rows': 12,
+    'children': [{
+        'operatorType': 'Filter@neo4j', 'dbHits': 240,
+        'children': [{
+            'operatorType': 'Expand(All)@neo4j', 'dbHits': 180,
+            'children': [{'operatorType': 'NodeUniqueIndexSeek@neo4j', 'dbHits': 2, 'children': []}],
+        }, {
+            'operatorType': 'NodeByLabelScan@neo4j', 'dbHits': 61,
+        }],
+    }],
+}
+
+
+class SesionGrabada:
+    def __init__(self, plan):
+        self.plan = plan
+        self.consultas = []
+
+    def run(self, consulta, parametros):
+        self.consultas.append(consulta)
+        return self
+
+    def consume(self):
+        return self
+
+    @property
+    def profile(self):
+        return self.plan
+
+
+def test_perfilar_suma_db_hits_y_operadores():
+    sesion = SesionGrabada(PLAN)
+    assert perfilar(sesion, "MATCH (n) RETURN n", {}) == {
+        'db_hits': 483,
+        'filas': 12,
+        'operadores': ['NodeByLabelScan', 'NodeUniqueIndexSeek'],
+    }
+    assert sesion.consultas == ["PROFILE MATCH (n) RETURN n"]
+
+
+def test_comparacion_muestra_el_cambio_de_db_hits(capsys):
+    antes = {'destinos': {'db_hits': 400, 'operadores': ['NodeByLabelScan']}}
+    despues = {'destinos': {'db_hits': 100, 'operadores': ['NodeIndexSeek']}}
+    imprimir_comparacion(antes, despues)
+    fila = capsys.readouterr().out.splitlines()[1].split()
+    assert fila == ['destinos', '400', '100', '-75%', 'NodeIndexSeek']
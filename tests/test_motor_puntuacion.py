@@ -0,0 +1,43 @@
+"""
+MotorPuntuacion (NumPy) reproduce la puntuación con bucles Python de
+benchmarks.recomendar_python: mismo TOP 5 y mismas puntuaciones totales
+"""
+
+import pytest
+
+from benchmarks import perfiles_aleatorios, recomendar_python
+from catalogo_memoria import CatalogoMemoria
+from motor_puntuacion import MotorPuntuacion
+
+
+@pytest.fixture(scope="module")
+def catalogo():
+    return CatalogoMemoria.desde_directorio()
+
+
+@pytest.fixture(scope="module")
+def motor(catalogo):
+    return MotorPuntuacion.desde_catalogo(catalogo)
+
+
+def _por_total(filas):
+    """total redondeado -> ubicaciones (uni, ciudad, país) con ese total"""
+    grupos = {}
+    for ubicacion, total in filas:
+        grupos.setdefault(round(total, 6), set()).add(ubicacion)
+    return grupos
+
+
+@pytest.mark.parametrize("semilla", range(5))
+def test_mismo_top5_que_los_bucles_python(catalogo, motor, semilla):
+    for perfil in perfiles_aleatorios(catalogo, semilla):
+        esperado = recomendar_python(catalogo, *perfil)
+        obtenido = [(motor.ubicaciones[u], total) for u, _, _, total in motor.recomendar(*perfil)]
+        assert [t for _, t in obtenido] == pytest.approx([t for _, t in esperado]), perfil
+        if not esperado:
+            continue
+        # las mismas ubicaciones salvo en el empate del corte del TOP 5, que se puede resolver distinto
+        corte = round(esperado[-1][1], 6)
+        grupos_esperados, grupos_obtenidos = _por_total(esperado), _por_total(obtenido)
+        grupos_esperados.pop(corte), grupos_obtenidos.pop(corte)
+        assert grupos_obtenidos == grupos_esperados, perfil
@@ -0,0 +1,98 @@
+"""
+Paridad entre MemoriaQueryEngine y el camino Cypher: mismas filas y mismas
+puntuaciones en las dos etapas para una batería de perfiles.
+
+Salvo el de la interfaz, necesitan un Neo4j cargado con carga_datos.py
+desde data/ (NEO4J_URI, NEO4J_USER, NEO4J_PASSWORD); sin él se saltan.
+"""
+
+import inspect
+
+import pytest
+
+from catalogo_memoria import MemoriaQueryEngine
+from intenciones_matcher import extraer_intenciones
+from precarga import SIN_LIMITE
+from rag_funciones import anadir_relevancia_texto, buscar_recomendacion
+from recomendadorErasmus import CLIMAS, REGIONES_VALIDAS, TAMANOS_CIUDAD, CypherQueryEngine, extraer_certificados
+
+
+PERFILES = [
+    ("derecho", "NO", "grande", "sur", "calor"),
+    ("ade", "B2 de inglés", "pequeña", "oeste", "frio"),
+    ("ingenieria informatica", "C1 inglés y B1 italiano", "grande", "este", "calor"),
+    ("veterinaria", "B1 de francés", "pequeña", "norte", "frio"),
+    ("turismo", "B2 alemán y A2 inglés", "grande", "norte", "calor"),
+    ("enfermeria", "C2 inglés", "pequeña", "sur", "frio"),
+]
+
+DESCRIPCIONES = [
+    "Quiero playa, fiesta y buena gastronomía, y que sea barato",
+    "Me interesan los museos, la historia y la arquitectura, ambiente joven",
+    "Naturaleza, montaña, lagos y auroras boreales",
+    "",
+]
+
+
+def _argumentos(carrera, certificados, tamano, region, clima):
+    return (carrera, extraer_certificados(certificados), TAMANOS_CIUDAD[tamano],
+            REGIONES_VALIDAS[region], CLIMAS[clima])
+
+
+def _filas_destinos(destinos):
+    """Destinos sin el id de nodo, ordenados (el orden entre empates no está fijado en Cypher)"""
+    return sorted(
+        (d.universidad, d.ciudad, d.pais, d.plazas_disponibles, d.duracion_meses,
+         d.nivel_requerido, None if d.puntuacion_compuesta is None else round(d.puntuacion_compuesta, 6))
+        for d in destinos
+    )
+
+
+def _filas_candidatos(candidatos):
+    return sorted(
+        (c.universidad, c.ciudad, c.pais, c.coste_vida, c.ambiente_fiesta, c.edad_media,
+         round(c.puntos_caracteristicas or 0, 6), round(c.puntuacion_base or 0, 6), round(c.puntuacion_total or 0, 6),
+         tuple(a.nombre for a in c.atractivos_destacados or ()))
+        for c in candidatos
+    )
+
+
+@pytest.mark.parametrize("metodo", ["buscar", "buscar_por_intenciones", "buscar_recomendacion",
+                                    "precargar_candidatos", "perfiles_categorias", "perfiles_paises"])
+def test_motores_misma_interfaz(metodo):
+    """Sin Neo4j: los dos motores se usan indistintamente, con los mismos métodos y argumentos"""
+    memoria = inspect.signature(getattr(MemoriaQueryEngine, metodo))
+    cypher = inspect.signature(getattr(CypherQueryEngine, metodo))
+    assert memoria == cypher
+
+
+@pytest.fixture(scope="module")
+def indice():
+    import indice_bm25
+    return indice_bm25.desde_directorio()
+
+
+@pytest.mark.parametrize("perfil", PERFILES, ids=[p[0] for p in PERFILES])
+def test_buscar_mismas_filas_y_puntuaciones(motor_memoria, motor_cypher, perfil):
+    memoria = motor_memoria.buscar(*_argumentos(*perfil))
+    cypher = motor_cypher.buscar(*_argumentos(*perfil))
+    assert memoria, "el perfil debería tener destinos"
+    assert _filas_destinos(memoria) == _filas_destinos(cypher)
+    assert [d.puntuacion_compuesta for d in memoria] == pytest.approx([d.puntuacion_compuesta for d in cypher])
+
+
+@pytest.mark.parametrize("descripcion", DESCRIPCIONES)
+@pytest.mark.parametrize("perfil", PERFILES, ids=[p[0] for p in PERFILES])
+def test_buscar_recomendacion_mismas_filas_y_puntuaciones(motor_memoria, motor_cypher, indice, perfil, descripcion):
+    intenciones = anadir_relevancia_texto(extraer_intenciones(descripcion), descripcion, indice)
+    destinos_memoria = motor_memoria.buscar(*_argumentos(*perfil))
+    destinos_cypher = motor_cypher.buscar(*_argumentos(*perfil))
+
+    todos_memoria = buscar_recomendacion(motor_memoria, destinos_memoria, intenciones, k=SIN_LIMITE)
+    todos_cypher = buscar_recomendacion(motor_cypher, destinos_cypher, intenciones, k=SIN_LIMITE)
+    assert _filas_candidatos(todos_memoria) == _filas_candidatos(todos_cypher)
+
+    # el TOP 5 tiene las mismas puntuaciones (las universidades empatadas pueden cambiar de orden)
+    top_memoria = buscar_recomendacion(motor_memoria, destinos_memoria, intenciones)
+    top_cypher = buscar_recomendacion(motor_cypher, destinos_cypher, intenciones)
+    assert [c.puntuacion_total for c in top_memoria] == pytest.approx([c.puntuacion_total for c in top_cypher])
@@ -0,0 +1,115 @@
+"""
+Las consultas del motor Cypher son plantillas fijas: perfiles distintos
+envían el mismo texto y solo cambian los parámetros, así que Neo4j reutiliza
+el plan en caché.
+"""
+
+import re
+
+import pytest
+
+from consultas_cypher import CONSULTA_DESTINOS, CONSULTA_RECOMENDACION, PLANTILLAS
+from intenciones_matcher import extraer_intenciones
+from rag_funciones import buscar_recomendacion
+from recomendadorErasmus import CypherQueryEngine, extraer_certificados
+
+
+PERFILES = [
+    ("derecho", "NO", "grande", "sur de europa", "calor"),
+    ("ade", "B2 de inglés", "pequena", "oeste de europa", "frio"),
+    ("ingenieria informatica", "C1 inglés y B1 italiano", None, None, None),
+    ("veterinaria", "B1 de francés", "pequena", "norte de europa", "frio"),
+    ("turismo", None, "grande", "este de europa", None),
+]
+
+DESCRIPCIONES = [
+    "Quiero playa, fiesta y que sea barato",
+    "Museos, historia y ambiente joven",
+    "Montaña y naturaleza",
+]
+
+
+class DriverGrabador:
+    """Driver que no se conecta a nada: anota cada (consulta, parámetros) y devuelve cero filas"""
+
+    def __init__(self):
+        self.consultas = []
+
+    def session(self, database=None):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute_read(self, transaccion):
+        return transaccion(self)
+
+    def run(self, consulta, parametros):
+        self.consultas.append((consulta, parametros))
+        return []
+
+
+def _buscar(motor, carrera, certificados, tamano, region, clima):
+    certificados = extraer_certificados(certificados) if certificados else certificados
+    return motor.buscar(carrera, certificados, tamano, region, clima)
+
+
+def test_destinos_mismo_texto_y_solo_cambian_los_parametros():
+    driver = DriverGrabador()
+    motor = CypherQueryEngine(driver=driver, database="neo4j")
+    for perfil in PERFILES:
+        _buscar(motor, *perfil)
+
+    textos = {consulta for consulta, _ in driver.consultas}
+    assert textos == {CONSULTA_DESTINOS}
+    parametros = [p for _, p in driver.consultas]
+    assert len({repr(sorted(p.items())) for p in parametros}) == len(PERFILES)
+    # el perfil viaja en los parámetros, nunca en el texto
+    assert [p['carrera_input'] for p in parametros] == [carrera for carrera, *_ in PERFILES]
+    assert not any(carrera in CONSULTA_DESTINOS for carrera, *_ in PERFILES)
+
+
+def test_recomendacion_mismo_texto_y_solo_cambian_los_parametros(motor_memoria):
+    driver = DriverGrabador()
+    motor = CypherQueryEngine(driver=driver, database="neo4j")
+    destinos = _buscar(motor_memoria, *PERFILES[0])
+    for descripcion in DESCRIPCIONES:
+        buscar_recomendacion(motor, destinos, extraer_intenciones(descripcion))
+
+    recomendaciones = [(c, p) for c, p in driver.consultas if c == CONSULTA_RECOMENDACION]
+    assert len(recomendaciones) == len(DESCRIPCIONES)
+    # además de la recomendación solo se lee una vez la consulta de perfiles
+    assert len(driver.consultas) == len(DESCRIPCIONES) + 1
+    parametros = [p for _, p in recomendaciones]
+    assert len({repr(sorted(p.items())) for p in parametros}) == len(DESCRIPCIONES)
+
+
+@pytest.mark.parametrize("nombre", sorted(PLANTILLAS))
+def test_plantillas_sin_valores_interpolados(nombre):
+    consulta, parametros = PLANTILLAS[nombre]
+    usados = set(re.findall(r'\$(\w+)', consulta))
+    # todo lo que usa la plantilla llega como parámetro y nada sobra
+    assert usados == set(parametros)
+
+
+def test_perfiles_distintos_reutilizan_el_plan(motor_cypher):
+    """
+    Con Neo4j: tras vaciar la caché de consultas, cinco perfiles distintos
+    dejan una sola entrada de CONSULTA_DESTINOS (db.clearQueryCaches informa
+    de cuántas había)
+    """
+    from acceso_neo4j import leer
+
+    def vaciar():
+        fila = leer(motor_cypher.driver, motor_cypher.database, "CALL db.clearQueryCaches()", nombre="test")[0]
+        mensaje = next(iter(fila.values()))
+        encontrado = re.search(r'(\d+)', mensaje)
+        return int(encontrado.group(1)) if encontrado else 0
+
+    vaciar()
+    for perfil in PERFILES:
+        _buscar(motor_cypher, *perfil)
+    assert vaciar() < len(PERFILES)
@@ -0,0 +1,78 @@
+"""
+Precargas compartiendo EJECUTOR: la que sigue en cola al necesitarse se
+cancela y el llamante consulta directamente; la que ya corre se espera
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import precarga
+
+
+@pytest.fixture
+def ejecutor_ocupado(monkeypatch):
+    """EJECUTOR de un hilo bloqueado por la precarga de otra sesión"""
+    ejecutor = ThreadPoolExecutor(max_workers=1)
+    liberar = threading.Event()
+    empezada = threading.Event()
+
+    def otra_sesion():
+        empezada.set()
+        liberar.wait()
+
+    ejecutor.submit(otra_sesion)
+    empezada.wait()
+    monkeypatch.setattr(precarga, "EJECUTOR", ejecutor)
+    yield liberar
+    liberar.set()
+    ejecutor.shutdown()
+
+
+class MotorFijo:
+    def __init__(self, destinos):
+        self.destinos = destinos
+
+    def buscar(self, *args):
+        return self.destinos
+
+
+def test_en_cola_se_cancela_y_cuenta(ejecutor_ocupado):
+    antes = precarga.PRECARGAS.valor(tipo="destinos", resultado="cancelada")
+    pendiente = precarga.PrecargaDestinos(MotorFijo([]), "derecho", "no")
+    assert pendiente.destinos('grande', 'sur', 'calor') is None
+    assert pendiente._futuro.cancelled()
+    assert precarga.PRECARGAS.valor(tipo="destinos", resultado="cancelada") == antes + 1
+    pendiente.aplicar(tamano_ciudad='pequena')   # una respuesta tardía no falla
+
+
+def test_en_marcha_se_espera():
+    ejecutor = ThreadPoolExecutor(max_workers=1)
+    empezada, liberar = threading.Event(), threading.Event()
+
+    def consulta():
+        empezada.set()
+        liberar.wait()
+        return ["destino"]
+
+    futuro = ejecutor.submit(consulta)
+    empezada.wait()
+    threading.Timer(0.05, liberar.set).start()
+    antes = precarga.PRECARGAS.valor(tipo="destinos", resultado="espera")
+    assert precarga._resultado(futuro, "destinos") == ["destino"]
+    assert precarga.PRECARGAS.valor(tipo="destinos", resultado="espera") == antes + 1
+    ejecutor.shutdown()
+
+
+def test_fallida_devuelve_none():
+    ejecutor = ThreadPoolExecutor(max_workers=1)
+
+    def consulta():
+        raise ConnectionError("Neo4j caído")
+
+    futuro = ejecutor.submit(consulta)
+    ejecutor.shutdown()
+    antes = precarga.PRECARGAS.valor(tipo="candidatos", resultado="error")
+    assert precarga._resultado(futuro, "candidatos") is None
+    assert precarga.PRECARGAS.valor(tipo="candidatos", resultado="error") == antes + 1
@@ -0,0 +1,91 @@
+"""
+Refinamiento: interpretación de los ajustes tras una recomendación y el
+ranking que resulta, sobre los candidatos del catálogo en memoria
+"""
+
+import pytest
+
+from intenciones_matcher import extraer_intenciones
+from rag_funciones import buscar_recomendacion
+from recomendadorErasmus import CLIMAS, REGIONES_VALIDAS, TAMANOS_CIUDAD, extraer_certificados
+from refinamiento import CANDIDATOS, Refinamiento
+
+
+@pytest.fixture(scope="module")
+def base(motor_memoria):
+    """Recomendación de derecho (destinos en Italia y Portugal), con la primera ya recomendada"""
+    destinos = motor_memoria.buscar("derecho", extraer_certificados("NO"), TAMANOS_CIUDAD["grande"],
+                                    REGIONES_VALIDAS["sur"], CLIMAS["calor"])
+    intenciones = extraer_intenciones("Quiero museos y fiesta")
+    candidatos = buscar_recomendacion(motor_memoria, destinos, intenciones, k=CANDIDATOS)
+    refinamiento = Refinamiento(candidatos, intenciones, motor_memoria.perfiles_categorias())
+    assert {c.pais for c in candidatos} == {"italia", "portugal"}
+    return refinamiento.con(recomendada=candidatos[0].universidad)
+
+
+def _totales(candidatos):
+    return {(c.universidad, c.ciudad, c.pais): c.puntuacion_total for c in candidatos}
+
+
+def test_mensaje_sin_ajuste(base):
+    assert not base.interpretar("hola, ¿qué tal?")
+
+
+def test_otra_opcion_descarta_la_recomendada(base):
+    orden = base.interpretar("Dame otra opción")
+    assert orden.siguiente and not orden.excluir and not orden.pesos
+    ajustado = base.con(orden)
+    assert base.recomendada not in {c.universidad for c in ajustado.ranking()}
+    assert len(ajustado.ranking()) == len(base.ranking()) - 1
+
+
+def test_sin_italia(base):
+    orden = base.interpretar("sin Italia, por favor")
+    assert orden.excluir == ("italia",)
+    ranking = base.con(orden).ranking()
+    assert ranking and all(c.pais == "portugal" for c in ranking)
+
+
+def test_este_pais_no_excluye_el_de_la_recomendada(base):
+    assert base.interpretar("este país no").excluir == ("italia",)
+    # sin recomendación previa no hay país al que referirse
+    assert not Refinamiento(base.candidatos, base.intenciones, base.perfiles).interpretar("este país no")
+
+
+def test_mas_peso_a_la_playa_suma_por_pais(base):
+    orden = base.interpretar("más peso a la playa")
+    assert orden.pesos == ("playa",)
+    antes = _totales(base.ranking())
+    una, dos = base.con(orden), base.con(orden).con(orden)
+    assert dos.pesos == {"playa": 2}
+
+    extra = {}
+    for clave, total in _totales(una.ranking()).items():
+        extra.setdefault(clave[2], set()).add(round(total - antes[clave], 6))
+    # los mismos puntos para todas las universidades de un país, y alguno gana
+    assert all(len(puntos) == 1 for puntos in extra.values())
+    assert max(p for puntos in extra.values() for p in puntos) > 0
+    for clave, total in _totales(dos.ranking()).items():
+        assert total - antes[clave] == pytest.approx(2 * next(iter(extra[clave[2]])))
+
+    totales = [c.puntuacion_total for c in una.ranking()]
+    assert totales == sorted(totales, reverse=True)
+    assert "playa" in una.intenciones_ajustadas()['categorias_atractivos']
+
+
+def test_ajuste_que_vacia_la_lista_no_toca_el_original(base):
+    sin_italia = base.con(base.interpretar("sin Italia"))
+    vacio = sin_italia.con(sin_italia.interpretar("tampoco Portugal, no"))
+    assert vacio.top() == []
+    assert sin_italia.top() and base.top()
+
+
+def test_a_dict_y_desde_dict(base):
+    ajustado = (base.con(base.interpretar("otra opción"))
+                    .con(base.interpretar("sin Portugal"))
+                    .con(base.interpretar("más peso a la playa")))
+    ajustes = ajustado.a_dict()
+    restaurado = Refinamiento.desde_dict(ajustes, base.candidatos, base.intenciones, base.perfiles)
+    assert restaurado.a_dict() == ajustes
+    assert _totales(restaurado.ranking()) == _totales(ajustado.ranking())
+    assert [c.universidad for c in restaurado.top()] == [c.universidad for c in ajustado.top()]